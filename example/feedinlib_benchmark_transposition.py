@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+# -*- coding: utf-8
+"""
+Benchmark of the transposition models of the PvlibBased model.
+
+Compares the throughput of the available sky diffuse models and their
+deviation from the Perez model, which is the default of the feedinlib. Use a
+cheaper model for screening runs and keep Perez for the final runs.
+"""
+
+import logging
+import timeit
+
+import numpy as np
+
+from feedinlib import powerplants as plants
+from feedinlib import weather
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Feel free to change the number of repetitions
+repeat = 3
+
+yingli210 = {
+    'module_name': 'Yingli_YL210__2008__E__',
+    'azimuth': 180,
+    'tilt': 30,
+    'albedo': 0.2}
+
+my_weather = weather.FeedinWeather()
+my_weather.read_feedinlib_csv(filename='weather_wittenberg.csv')
+
+pv_plant = plants.Photovoltaic(**yingli210)
+
+# Fetch the module data once, so that the download is not measured.
+pv_plant.model.fetch_module_data(module_name=yingli210['module_name'])
+
+transposition_models = ['perez', 'haydavies', 'reindl', 'klucher', 'king',
+                        'isotropic']
+
+results = {}
+for model in transposition_models:
+    def run():
+        return pv_plant.feedin(weather=my_weather, transposition_model=model)
+    seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+    results[model] = (seconds, run())
+
+reference_time, reference = results['perez']
+hours = len(reference)
+
+print('{0:>10} {1:>10} {2:>10} {3:>12} {4:>12}'.format(
+    'model', 'time [s]', 'h per s', 'energy [%]', 'rmse [W]'))
+for model in transposition_models:
+    seconds, feedin = results[model]
+    energy = (feedin.sum() / reference.sum() - 1) * 100
+    rmse = np.sqrt(((feedin - reference) ** 2).mean())
+    print('{0:>10} {1:>10.3f} {2:>10.0f} {3:>12.2f} {4:>12.3f}'.format(
+        model, seconds, hours / seconds, energy, rmse))
+
+logging.info('Done!')
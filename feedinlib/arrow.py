@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Apache Arrow interchange of weather data and feedin results.
+
+Numeric columns are handed over between Arrow and pandas without copying
+them, so weather data coming from Arrow-based pipelines can be used directly
+and feedin results can be passed on to Arrow-based storage.
+
+The meta data of a weather object is kept in the schema meta data of the
+Arrow table under the key ``feedinlib``.
+
+pyarrow is an optional dependency of the feedinlib. It is only needed for
+the functions of this module.
+"""
+
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from . import weather as fweather
+
+META_KEY = b'feedinlib'
+
+
+def _check_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "The Arrow interchange requires pyarrow. Install it with " +
+            "'pip install pyarrow'.")
+
+
+def _to_table(table):
+    if isinstance(table, pa.RecordBatch):
+        return pa.Table.from_batches([table])
+    return table
+
+
+def _from_frame(data, time_column, metadata):
+    columns = {time_column: pa.array(data.index)}
+    for column in data.columns:
+        # Arrow arrays share the memory of contiguous numpy arrays
+        columns[str(column)] = pa.array(data[column].values)
+    table = pa.table(columns)
+    return table.replace_schema_metadata(
+        {META_KEY: json.dumps(metadata, default=float).encode()})
+
+
+def weather_to_arrow(weather, time_column='time'):
+    r"""
+    Convert a weather object to an Arrow table.
+
+    Parameters
+    ----------
+    weather : feedinlib.weather.FeedinWeather object
+    time_column : string, optional
+        Name of the column holding the time index (default: 'time').
+
+    Returns
+    -------
+    pyarrow.Table
+        The table contains the time index and all columns of the weather
+        data. The meta data is stored in the schema meta data.
+    """
+    _check_pyarrow()
+    geometry = weather.geometry
+    if geometry is not None:
+        geometry = geometry.wkt
+    metadata = {
+        'timezone': (str(weather.timezone)
+                     if weather.timezone is not None else None),
+        'longitude': weather.longitude,
+        'latitude': weather.latitude,
+        'geometry': geometry,
+        'data_height': weather.data_height,
+        'name': weather.name}
+    return _from_frame(weather.data, time_column, metadata)
+
+
+def weather_from_arrow(table, time_column='time'):
+    r"""
+    Create a weather object from an Arrow table or record batch.
+
+    The numeric columns are not copied. The weather data refers to the
+    memory of the Arrow table as long as it is not modified.
+
+    Parameters
+    ----------
+    table : pyarrow.Table or pyarrow.RecordBatch
+        Containing a timestamp column and the time series of the weather
+        parameters. The meta data of the weather object is taken from the
+        schema meta data (see :py:func:`weather_to_arrow
+        <feedinlib.arrow.weather_to_arrow>`).
+    time_column : string, optional
+        Name of the column holding the time index (default: 'time').
+
+    Returns
+    -------
+    feedinlib.weather.FeedinWeather object
+    """
+    _check_pyarrow()
+    table = _to_table(table)
+    metadata = json.loads(
+        (table.schema.metadata or {}).get(META_KEY, b'{}').decode())
+
+    columns = [name for name in table.column_names if name != time_column]
+    # One block per column makes the conversion zero-copy
+    data = table.select(columns).to_pandas(split_blocks=True)
+    data.index = pd.DatetimeIndex(table.column(time_column).to_pandas())
+    timezone = metadata.get('timezone')
+    if timezone is not None:
+        if data.index.tz is None:
+            data.index = data.index.tz_localize('UTC')
+        data.index = data.index.tz_convert(timezone)
+
+    geometry = metadata.get('geometry')
+    if geometry is not None:
+        try:
+            from shapely import wkt
+            geometry = wkt.loads(geometry)
+        except ImportError:
+            pass
+
+    return fweather.FeedinWeather(
+        data=data, timezone=timezone, longitude=metadata.get('longitude'),
+        latitude=metadata.get('latitude'), geometry=geometry,
+        data_height=metadata.get('data_height'), name=metadata.get('name'))
+
+
+def feedin_to_arrow(feedin, time_column='time'):
+    r"""
+    Convert feedin results to an Arrow table.
+
+    Parameters
+    ----------
+    feedin : pandas.DataFrame or pandas.Series
+        The feedin of one or more powerplants, e.g. a block of a chunked run
+        (see :py:func:`ChunkedFeedin.iter_results
+        <feedinlib.chunked.ChunkedFeedin.iter_results>`), with the time
+        steps as index and the ids of the powerplants as columns.
+    time_column : string, optional
+        Name of the column holding the time index (default: 'time').
+
+    Returns
+    -------
+    pyarrow.Table
+        One column with the time index and one column per powerplant.
+    """
+    _check_pyarrow()
+    if isinstance(feedin, pd.Series):
+        feedin = feedin.to_frame()
+    return _from_frame(feedin, time_column, {'type': 'feedin'})
+
+
+class ArrowWriter:
+    r"""
+    Write the results of a chunked run to Arrow IPC files.
+
+    Each block is written zero-copy to its own file in the given directory.
+    The directory can be read as a whole with `pyarrow.dataset`.
+
+    Parameters
+    ----------
+    path : string
+        Directory of the files. It is created if it does not exist.
+
+    See Also
+    --------
+    feedinlib.chunked.ChunkedFeedin.run
+    """
+
+    def __init__(self, path):
+        _check_pyarrow()
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.n_blocks = 0
+
+    def write(self, result):
+        table = feedin_to_arrow(result)
+        filename = os.path.join(
+            self.path, 'block_{0:06d}.arrow'.format(self.n_blocks))
+        with pa.OSFile(filename, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self.n_blocks += 1
+
+    def close(self):
+        pass
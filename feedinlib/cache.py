@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Content-addressed on-disk cache of feedin time series.
+
+The key of a cached feedin is a hash of everything the result depends on: the
+weather data and its meta data, the model class, its settings and the
+feedinlib version as well as the parameters of the powerplant and the keyword
+arguments of the feedin call. Unchanged powerplants are therefore served from
+disk, while any change leads to a new key.
+
+The cache is opt-in, pass a :class:`FeedinCache` object to
+:py:func:`Base.feedin <feedinlib.powerplants.Base.feedin>`:
+
+>>> from feedinlib import cache
+>>> my_cache = cache.FeedinCache('/tmp/feedin_cache')  # doctest: +SKIP
+>>> my_plant.feedin(weather=my_weather, cache=my_cache)  # doctest: +SKIP
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import feedinlib
+from .chunked import parse_memory
+
+
+def weather_digest(weather):
+    r"""
+    Hash of the data and the meta data of a weather object.
+
+    Parameters
+    ----------
+    weather : feedinlib.weather.FeedinWeather object
+
+    Returns
+    -------
+    string
+        Hexadecimal sha1 digest.
+    """
+    digest = hashlib.sha1()
+    data = weather.data
+    digest.update(pd.util.hash_pandas_object(data.index).values.tobytes())
+    for column in data.columns:
+        digest.update(str(column).encode())
+        digest.update(np.ascontiguousarray(
+            data[column].values, dtype=float).tobytes())
+    height = weather.data_height or {}
+    digest.update(repr((
+        str(weather.timezone), weather.latitude, weather.longitude,
+        sorted(height.items()))).encode())
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    # Structure of json types with the same value in every process.
+    # Objects without such a representation (e.g. whose repr contains a
+    # memory address) are rejected.
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    if isinstance(value, (datetime.datetime, datetime.date,
+                          datetime.timedelta, np.datetime64,
+                          np.timedelta64)):
+        return [type(value).__name__, str(value)]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {'dict': sorted([str(k), _canonical(v)]
+                               for k, v in value.items())}
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        return ['pandas', hashlib.sha1(pd.util.hash_pandas_object(
+            value).values.tobytes()).hexdigest()]
+    if isinstance(value, np.ndarray):
+        return ['array', str(value.dtype), list(value.shape), hashlib.sha1(
+            np.ascontiguousarray(value).tobytes()).hexdigest()]
+    raise TypeError(
+        "The feedin cache can not build a stable key from {0!r} "
+        "(type {1}).".format(value, type(value).__name__))
+
+
+def _index_arrays(index):
+    # Arrays of the levels of an index (e.g. the (member, time) MultiIndex of
+    # an ensemble) that can be stored without pickle.
+    arrays = {'names': json.dumps(list(index.names))}
+    for number in range(index.nlevels):
+        level = index.get_level_values(number)
+        if isinstance(level, pd.DatetimeIndex):
+            arrays['index_{0}'.format(number)] = level.asi8
+            arrays['timezone_{0}'.format(number)] = str(level.tz)
+            continue
+        values = np.asarray(level.tolist())
+        if values.dtype == object:
+            raise ValueError(
+                "The feedin cache can not store the index level {0!r} of "
+                "type {1}.".format(level.name, level.dtype))
+        arrays['index_{0}'.format(number)] = values
+    return arrays
+
+
+def _index_from_arrays(entry):
+    names = json.loads(str(entry['names']))
+    levels = []
+    for number, name in enumerate(names):
+        values = entry['index_{0}'.format(number)]
+        timezone = 'timezone_{0}'.format(number)
+        if timezone not in entry.files:
+            levels.append(pd.Index(values, name=name))
+            continue
+        level = pd.DatetimeIndex(values, tz='UTC', name=name)
+        if str(entry[timezone]) != 'None':
+            levels.append(level.tz_convert(str(entry[timezone])))
+        else:
+            levels.append(level.tz_localize(None))
+    if len(levels) == 1:
+        return levels[0]
+    return pd.MultiIndex.from_arrays(levels, names=names)
+
+
+class FeedinCache:
+    r"""
+    Local directory holding feedin time series.
+
+    Entries are stored as uncompressed numpy archives, which can be loaded
+    in milliseconds. If the size of the directory exceeds `max_size` the
+    least recently used entries are removed.
+
+    Parameters
+    ----------
+    path : string, optional
+        Directory of the cache (default: ~/.oemof/feedin_cache). It is
+        created if it does not exist.
+    max_size : int or string, optional
+        Upper limit of the size of the cache (default: '10GB'). See
+        :py:func:`parse_memory <feedinlib.chunked.parse_memory>`.
+    """
+
+    def __init__(self, path=None, max_size='10GB'):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), '.oemof',
+                                'feedin_cache')
+        self.path = path
+        self.max_size = parse_memory(max_size)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self._size = None
+
+    def key(self, powerplant, **kwargs):
+        r"""
+        Key of the feedin of the given powerplant.
+
+        Parameters
+        ----------
+        powerplant : feedinlib.powerplants.Base object
+        \**kwargs :
+            The keyword arguments of the feedin call including the weather
+            object.
+
+        Returns
+        -------
+        string
+            Hexadecimal sha1 digest.
+
+        Raises
+        ------
+        TypeError
+            If a setting of the model or a parameter is of a type without a
+            stable representation across processes (e.g. an arbitrary
+            object).
+        """
+        model = powerplant.model
+        parameters = {k: getattr(powerplant, k) for k in model.required}
+        parameters.update(
+            {k: v for k, v in kwargs.items() if k != 'weather'})
+        digest = hashlib.sha1()
+        digest.update(weather_digest(kwargs['weather']).encode())
+        digest.update(json.dumps(_canonical([
+            type(model).__module__, type(model).__name__,
+            feedinlib.__version__, getattr(model, 'settings', {}),
+            parameters])).encode())
+        return digest.hexdigest()
+
+    def filename(self, key):
+        r"""Full path of the entry with the given key."""
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        r"""
+        Load a cached feedin.
+
+        Parameters
+        ----------
+        key : string
+            See :py:func:`key <feedinlib.cache.FeedinCache.key>`.
+
+        Returns
+        -------
+        pandas.Series or None
+            The cached feedin or None if there is no entry with this key.
+        """
+        filename = self.filename(key)
+        try:
+            with np.load(filename) as entry:
+                name = str(entry['name'])
+                feedin = pd.Series(entry['values'],
+                                   index=_index_from_arrays(entry),
+                                   name=None if name == 'None' else name)
+        except (IOError, OSError, KeyError):
+            # Missing entries and entries of an older layout
+            return None
+        # Mark the entry as recently used
+        os.utime(filename, None)
+        return feedin
+
+    def set(self, key, feedin):
+        r"""
+        Store a feedin and remove the least recently used entries if the
+        cache is too large.
+
+        Parameters
+        ----------
+        key : string
+            See :py:func:`key <feedinlib.cache.FeedinCache.key>`.
+        feedin : pandas.Series
+            With a time index or a MultiIndex (e.g. (member, time) of an
+            :py:class:`EnsembleWeather
+            <feedinlib.ensemble.EnsembleWeather>`).
+
+        Raises
+        ------
+        ValueError
+            If a level of the index has values that can not be stored
+            without pickle (e.g. mixed types).
+        """
+        arrays = _index_arrays(feedin.index)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, values=np.asarray(feedin.values, dtype=float),
+                     name=str(feedin.name), **arrays)
+        filename = self.filename(key)
+        try:
+            replaced = os.path.getsize(filename)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, filename)
+        if self._size is not None:
+            self._size += os.path.getsize(filename) - replaced
+        if self.size() > self.max_size:
+            self.evict()
+
+    def entries(self):
+        r"""
+        List of (last access, size, filename) of all entries.
+        """
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.npz'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        r"""Size of all entries in bytes."""
+        if self._size is None:
+            self._size = sum(entry[1] for entry in self.entries())
+        return self._size
+
+    def evict(self):
+        r"""
+        Remove the least recently used entries until the size of the cache
+        is below `max_size`.
+        """
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, filename in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        r"""Remove all entries."""
+        for mtime, entry_size, filename in self.entries():
+            os.remove(filename)
+        self._size = 0
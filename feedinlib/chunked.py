@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Out-of-core execution of feedin calculations.
+
+Thousands of weather cells times several decades of hourly weather data do
+not fit into memory as pandas objects. The :class:`ChunkedFeedin` scheduler
+splits such a workload into blocks of (time chunk x cell chunk), loads the
+weather of each block on demand, runs the models of all powerplants of the
+block and hands the results to a writer before the next block is loaded. The
+size of the blocks is chosen to stay below a configurable memory ceiling.
+
+The scheduler runs in a single process on a single machine and does not need
+any additional services.
+"""
+
+import os
+import re
+
+import pandas as pd
+
+from . import powerplants
+from . import statistics
+from . import weather as fweather
+
+
+def parse_memory(memory):
+    r"""
+    Convert a memory size to bytes.
+
+    Parameters
+    ----------
+    memory : int or string
+        Number of bytes or a string with a number and one of the units
+        B, KB, MB, GB or TB (e.g. '512MB'). Units are powers of 1024.
+
+    Returns
+    -------
+    int
+        Number of bytes.
+
+    Examples
+    --------
+    >>> from feedinlib import chunked
+    >>> chunked.parse_memory('2GB')
+    2147483648
+    """
+    if isinstance(memory, str):
+        units = {'B': 0, 'KB': 1, 'MB': 2, 'GB': 3, 'TB': 4}
+        match = re.match(r'^\s*([\d.]+)\s*([KMGT]?B)\s*$', memory.upper())
+        if match is None:
+            raise ValueError("Cannot parse memory size: {0}".format(memory))
+        return int(float(match.group(1)) * 1024 ** units[match.group(2)])
+    return int(memory)
+
+
+def load_weather(source, start, end):
+    r"""
+    Load the weather data of one cell for the given time window.
+
+    Parameters
+    ----------
+    source : FeedinWeather object or callable
+        A :py:class:`FeedinWeather <feedinlib.weather.FeedinWeather>` object
+        holding its data in memory or a callable with the signature
+        ``source(start, end)`` returning a FeedinWeather object that only
+        contains the data of the given window (e.g. read from disk).
+    start, end : pandas.Timestamp
+        First and last time step of the window (both inclusive).
+
+    Returns
+    -------
+    FeedinWeather object
+    """
+    if isinstance(source, fweather.FeedinWeather):
+        return fweather.FeedinWeather(
+            data=source.data.loc[start:end], timezone=source.timezone,
+            longitude=source.longitude, latitude=source.latitude,
+            geometry=source.geometry, data_height=source.data_height,
+            name=source.name)
+    return source(start, end)
+
+
+class ChunkedFeedin:
+    r"""
+    Scheduler to calculate the feedin of many powerplants in blocks.
+
+    Parameters
+    ----------
+    plants : dictionary
+        The keys are the ids of the weather cells, the values are
+        dictionaries with the ids of the powerplants as keys and the
+        powerplant objects (see :mod:`feedinlib.powerplants`) as values or
+        :class:`PlantTable <feedinlib.powerplants.PlantTable>` objects (see
+        :py:func:`PlantTable.split
+        <feedinlib.powerplants.PlantTable.split>`).
+    weather : dictionary
+        The keys are the ids of the weather cells, the values are weather
+        sources as accepted by :py:func:`load_weather
+        <feedinlib.chunked.load_weather>`.
+    index : pandas.DatetimeIndex, optional
+        Time index of the weather data of all cells. It is taken from the
+        first in-memory weather object if not given and is mandatory if all
+        weather sources are loaded on demand.
+    memory_limit : int or string, optional
+        Upper limit of the memory used by one block (default: '1GB'). See
+        :py:func:`parse_memory <feedinlib.chunked.parse_memory>`.
+    time_chunk : int, optional
+        Number of time steps of one block. By default the largest number of
+        time steps fitting into the memory limit is used.
+    weather_row_bytes : int, optional
+        Memory of one time step of the weather data of one cell in bytes
+        (default: 64, eight float columns).
+    model_row_bytes : int, optional
+        Memory a model needs for one time step of one plant while it is
+        calculated, including intermediate results (default: 1024, the
+        PvlibBased model with its sub-hourly solar position).
+
+    Notes
+    -----
+    The memory of a block is estimated as
+
+    .. math:: rows\cdot\left(cells\cdot weather\_row\_bytes + plants\cdot 8
+        + model\_row\_bytes\right)
+
+    with the number of time steps, weather cells and powerplants of the
+    block. The estimate does not include the constant memory of the
+    powerplant and model objects.
+
+    Examples
+    --------
+    >>> from feedinlib import chunked
+    >>> runner = chunked.ChunkedFeedin(
+    ...     plants, weather, memory_limit='256MB')  # doctest: +SKIP
+    >>> runner.run(chunked.CsvWriter('results'))  # doctest: +SKIP
+    """
+
+    def __init__(self, plants, weather, **kwargs):
+        self.plants = plants
+        self.weather = weather
+        self.index = kwargs.get('index')
+        if self.index is None:
+            for source in weather.values():
+                if isinstance(source, fweather.FeedinWeather):
+                    self.index = source.data.index
+                    break
+            else:
+                raise ValueError(
+                    "The time index cannot be taken from the weather " +
+                    "sources. Pass it with the index argument.")
+        self.memory_limit = parse_memory(kwargs.get('memory_limit', '1GB'))
+        self.time_chunk = kwargs.get('time_chunk')
+        self.weather_row_bytes = kwargs.get('weather_row_bytes', 64)
+        self.model_row_bytes = kwargs.get('model_row_bytes', 1024)
+
+    def row_bytes(self, cells):
+        r"""
+        Estimated memory of one time step of a block with the given cells.
+        """
+        n_plants = sum(len(self.plants.get(cell, {})) for cell in cells)
+        return (len(cells) * self.weather_row_bytes + n_plants * 8 +
+                self.model_row_bytes)
+
+    def blocks(self):
+        r"""
+        Split the workload into blocks fitting into the memory limit.
+
+        Returns
+        -------
+        list of tuples
+            Each tuple contains the first and the last time step of the time
+            chunk and a list with the ids of the weather cells of the block.
+            The blocks are ordered by time, so that the results of one
+            powerplant are written in chronological order.
+
+        Raises
+        ------
+        ValueError
+            If a single time step of a single weather cell does not fit into
+            the memory limit.
+        """
+        cells = [cell for cell in self.weather if self.plants.get(cell)]
+        largest = max([self.row_bytes([cell]) for cell in cells] or [0])
+        if largest > self.memory_limit:
+            raise ValueError(
+                "The memory limit of {0} bytes is too small ".format(
+                    self.memory_limit) +
+                "for a single weather cell ({0} bytes).".format(largest))
+
+        time_chunk = self.time_chunk
+        if time_chunk is None:
+            time_chunk = self.memory_limit // max(largest, 1)
+        time_chunk = max(1, min(int(time_chunk), len(self.index)))
+
+        # Pack as many cells into one block as fit into the memory limit
+        cell_chunks = []
+        chunk = []
+        for cell in cells:
+            if chunk and (self.row_bytes(chunk + [cell]) * time_chunk >
+                          self.memory_limit):
+                cell_chunks.append(chunk)
+                chunk = []
+            chunk.append(cell)
+        if chunk:
+            cell_chunks.append(chunk)
+
+        blocks = []
+        for first in range(0, len(self.index), time_chunk):
+            last = min(first + time_chunk, len(self.index)) - 1
+            for chunk in cell_chunks:
+                blocks.append((self.index[first], self.index[last], chunk))
+        return blocks
+
+    def iter_results(self, **kwargs):
+        r"""
+        Calculate the feedin block by block.
+
+        Parameters
+        ----------
+        \**kwargs :
+            Passed to the feedin method of every powerplant (see
+            :py:func:`Base.feedin <feedinlib.powerplants.Base.feedin>`).
+
+        Returns
+        -------
+        generator
+            Yields a pandas.DataFrame per block with the time steps of the
+            block as index and the ids of the powerplants as columns.
+        """
+        for start, end, cells in self.blocks():
+            results = {}
+            for cell in cells:
+                cell_weather = load_weather(self.weather[cell], start, end)
+                plants = self.plants[cell]
+                if isinstance(plants, powerplants.PlantTable):
+                    results.update(plants.feedin(cell_weather, **kwargs))
+                    continue
+                for plant_id, plant in plants.items():
+                    results[plant_id] = plant.feedin(weather=cell_weather,
+                                                     **kwargs)
+            yield pd.DataFrame(results)
+
+    def run(self, writer, **kwargs):
+        r"""
+        Calculate the feedin of all powerplants and write it block by block.
+
+        Parameters
+        ----------
+        writer : object
+            An object with a `write` method accepting the DataFrame of one
+            block (see :py:func:`iter_results
+            <feedinlib.chunked.ChunkedFeedin.iter_results>`) and a `close`
+            method, e.g. :class:`CsvWriter`.
+        \**kwargs :
+            See :py:func:`iter_results
+            <feedinlib.chunked.ChunkedFeedin.iter_results>`.
+
+        Returns
+        -------
+        The writer object.
+        """
+        try:
+            for result in self.iter_results(**kwargs):
+                writer.write(result)
+        finally:
+            writer.close()
+        return writer
+
+    def plant_ids(self):
+        r"""
+        Ids of all powerplants of the run in the order of the cells.
+        """
+        ids = []
+        for cell in self.weather:
+            plants = self.plants.get(cell, {})
+            if isinstance(plants, powerplants.PlantTable):
+                ids.extend(plants.ids)
+            else:
+                ids.extend(plants)
+        return ids
+
+    def statistics(self, capacity=None, interval=None, bins=100, path=None,
+                   **kwargs):
+        r"""
+        Run with streaming reducers instead of storing the feedin.
+
+        The statistics of each powerplant (annual energy, full load hours,
+        monthly capacity factors, P50/P90, duration curve) are accumulated
+        block by block while the feedin is calculated (see
+        :class:`FeedinStatistics <feedinlib.statistics.FeedinStatistics>`).
+
+        Parameters
+        ----------
+        capacity : array-like or dictionary, optional
+            Capacity of each powerplant in the order of :py:func:`plant_ids
+            <feedinlib.chunked.ChunkedFeedin.plant_ids>` or by id.
+        interval : float, optional
+            Length of a time step in hours. By default it is taken from the
+            first two time steps of the index (one hour for a single time
+            step).
+        bins : int, optional
+            Number of bins of the duration curve and the quantiles
+            (default: 100).
+        path : string, optional
+            Directory the results are saved to after the run.
+        \**kwargs :
+            See :py:func:`iter_results
+            <feedinlib.chunked.ChunkedFeedin.iter_results>`.
+
+        Returns
+        -------
+        FeedinStatistics object
+        """
+        if interval is None:
+            times = self.index.get_level_values(-1)
+            interval = 1.
+            if len(times) > 1:
+                interval = (times[1] - times[0]) / pd.Timedelta(hours=1)
+        reducer = statistics.FeedinStatistics(
+            self.plant_ids(), capacity=capacity, interval=interval,
+            bins=bins, path=path)
+        return self.run(reducer, **kwargs)
+
+
+class CsvWriter:
+    r"""
+    Write the results of a chunked run to one csv-file per powerplant.
+
+    The results of each block are appended to the files, so that the memory
+    of a block is released as soon as it is written.
+
+    Parameters
+    ----------
+    path : string
+        Directory of the csv-files. It is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self._started = set()
+
+    def filename(self, plant_id):
+        r"""Full path of the csv-file of the given powerplant."""
+        return os.path.join(self.path, '{0}.csv'.format(plant_id))
+
+    def write(self, result):
+        for plant_id in result.columns:
+            header = plant_id not in self._started
+            result[plant_id].to_csv(self.filename(plant_id),
+                                    mode='w' if header else 'a',
+                                    header=header)
+            self._started.add(plant_id)
+
+    def close(self):
+        pass
@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Command line batch runner.
+
+The ``feedinlib`` command calculates the feedin of plant tables (see
+:class:`PlantTable <feedinlib.powerplants.PlantTable>`) with the weather of a
+directory of feedinlib csv-files or of a gridded NetCDF/HDF5 file and writes
+the results in a binary format. The run is described by a json config file:
+
+.. code:: json
+
+    {
+        "plants": [
+            {"path": "pv_plants.csv", "technology": "pv",
+             "id_column": "id", "cell_column": "cell"},
+            {"path": "wind_plants.parquet", "technology": "wind",
+             "id_column": "id", "cell_column": "cell",
+             "model": {"power_curve_step": 0.01}}
+        ],
+        "weather": {"type": "directory", "path": "weather",
+                    "pattern": "{cell}.csv"},
+        "output": {"path": "results", "format": "matrix",
+                   "dtype": "float32"},
+        "run": {"threads": 4, "memory_limit": "2GB"}
+    }
+
+Plants:
+    One entry per plant table (csv- or parquet-file) with the technology
+    ('pv' or 'wind'), the column of the plant ids, the column of the weather
+    cells and optional settings of the model. With gridded weather the cell
+    column holds the flat index of the grid cell. If the cell column is
+    missing the plants are assigned to the nearest grid cell using the
+    columns longitude and latitude.
+
+Weather:
+    'directory': one feedinlib csv-file per weather cell, the pattern
+    contains the cell id. 'netcdf': a gridded file (see
+    :class:`GriddedWeather <feedinlib.gridded.GriddedWeather>`); all further
+    keys are passed to the reader (e.g. variables, data_height).
+
+Output:
+    'matrix' (default, see :class:`ResultMatrix
+    <feedinlib.matrix.ResultMatrix>`), 'arrow' (see :class:`ArrowWriter
+    <feedinlib.arrow.ArrowWriter>`), 'csv' or 'statistics' (see
+    :class:`FeedinStatistics <feedinlib.statistics.FeedinStatistics>`). The
+    statistics only keep the annual energy, capacity factors and duration
+    curves instead of the time series. The capacity of the plants is taken
+    from the column capacity_column (default: installed_capacity or
+    peak_power), the number of bins of the duration curve from bins.
+
+Run:
+    threads, memory_limit and time_chunk (see :class:`ChunkedFeedin
+    <feedinlib.chunked.ChunkedFeedin>`). With shards the weather cells are
+    partitioned into this number of shards and the output path is the
+    directory of a resumable run (see :class:`ShardedRun
+    <feedinlib.sharded.ShardedRun>`): each shard is written to a
+    subdirectory in the output format, completed shards are skipped when the
+    run is started again and several processes can share the shards. They
+    can be overwritten on the command line.
+
+Example::
+
+    feedinlib run.json --threads 8
+    feedinlib run.json --shards 64 --shard 0 --shard 1
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from . import chunked
+from . import models
+from . import powerplants
+from . import weather as fweather
+
+MODELS = {'pv': models.PvlibBased, 'wind': models.SimpleWindTurbine}
+
+
+def load_config(filename):
+    r"""Read a json config file (see :mod:`feedinlib.cli`)."""
+    with open(filename) as f:
+        return json.load(f)
+
+
+def load_plants(config):
+    r"""
+    Load the plant tables of a config.
+
+    Returns
+    -------
+    list of tuples
+        The PlantTable and the name of its cell column (None if the plants
+        have to be assigned to the weather cells) of each entry.
+    """
+    tables = []
+    for entry in config['plants']:
+        if entry['technology'] not in MODELS:
+            raise ValueError("Unknown technology: {0}. Use one of {1}.".format(
+                entry['technology'], sorted(MODELS)))
+        model = MODELS[entry['technology']](**entry.get('model', {}))
+        if entry['path'].endswith('.parquet'):
+            table = powerplants.PlantTable.from_parquet(
+                entry['path'], model=model, ids=entry.get('id_column'))
+        else:
+            table = powerplants.PlantTable.from_csv(
+                entry['path'], model=model, ids=entry.get('id_column'))
+        cell_column = entry.get('cell_column', 'cell')
+        if cell_column not in table.columns:
+            cell_column = None
+        tables.append((table, cell_column))
+
+    ids = np.concatenate([table.ids for table, cell_column in tables])
+    if len(np.unique(ids.astype(str))) < len(ids):
+        raise ValueError("The ids of the powerplants are not unique.")
+    return tables
+
+
+class DirectoryWeather:
+    r"""
+    Weather source with one feedinlib csv-file per weather cell.
+
+    Parameters
+    ----------
+    path : string
+        Directory of the files.
+    pattern : string, optional
+        Filename of a cell with the placeholder {cell} (default:
+        '{cell}.csv').
+    """
+
+    def __init__(self, path, pattern='{cell}.csv'):
+        self.path = path
+        self.pattern = pattern
+
+    def read(self, cell, start=None, end=None):
+        r"""
+        Weather object of a cell, see :py:func:`read_feedinlib_csv
+        <feedinlib.weather.FeedinWeather.read_feedinlib_csv>`. With start or
+        end only the rows of the window are read.
+        """
+        my_weather = fweather.FeedinWeather()
+        my_weather.read_feedinlib_csv(os.path.join(
+            self.path, self.pattern.format(cell=cell)), start=start, end=end)
+        return my_weather
+
+    def source(self, cell):
+        r"""Weather source of a cell for :class:`ChunkedFeedin
+        <feedinlib.chunked.ChunkedFeedin>`."""
+        return lambda start, end: self.read(cell, start, end)
+
+    def sources(self, table, cell_column):
+        r"""
+        Split a plant table by weather cell.
+
+        Returns
+        -------
+        tuple
+            Dictionaries with the cell ids as keys and the plant tables
+            respectively the weather sources as values.
+        """
+        if cell_column is None:
+            raise ValueError(
+                "Weather directories need a cell column in the plant table.")
+        # The cell ids are parts of the filenames
+        table = table.assign(**{cell_column: np.asarray(
+            table.columns[cell_column]).astype(str)})
+        plants = table.split(cell_column)
+        return plants, {cell: self.source(cell) for cell in plants}
+
+    def time_index(self, cells):
+        r"""Time index of the weather data (read from the first cell)."""
+        return self.read(next(iter(cells))).data.index
+
+
+class NetcdfWeather:
+    r"""
+    Weather source of a gridded file, see :class:`GriddedWeather
+    <feedinlib.gridded.GriddedWeather>` for the parameters.
+    """
+
+    def __init__(self, path, **kwargs):
+        from . import gridded
+        self.reader = gridded.GriddedWeather(path, **kwargs)
+
+    def sources(self, table, cell_column):
+        r"""
+        Split a plant table by grid cell.
+
+        See :py:func:`DirectoryWeather.sources
+        <feedinlib.cli.DirectoryWeather.sources>`.
+        """
+        if cell_column is None:
+            from . import spatial
+            cells = self.reader.select()
+            index = spatial.WeatherIndex(
+                [self.reader.weather(cell) for cell in cells])
+            positions = index.query(table.columns['longitude'],
+                                    table.columns['latitude'])
+            flat = np.ravel_multi_index(np.array(cells).T, self.reader.shape)
+            table = table.assign(cell=flat[positions])
+            cell_column = 'cell'
+        plants = table.split(cell_column)
+        cells = self.reader.select(index=list(plants))
+        return plants, {key: self.reader.source(cell)
+                        for key, cell in zip(plants, cells)}
+
+    def time_index(self, cells):
+        r"""Time index of the gridded file."""
+        return self.reader.time_index()
+
+
+def weather_source(config):
+    r"""Weather source of a config (see :mod:`feedinlib.cli`)."""
+    options = dict(config['weather'])
+    kind = options.pop('type', 'directory')
+    path = options.pop('path')
+    if kind == 'directory':
+        return DirectoryWeather(path, **options)
+    if kind == 'netcdf':
+        return NetcdfWeather(path, **options)
+    raise ValueError("Unknown weather type: {0}".format(kind))
+
+
+CAPACITY_COLUMNS = ('installed_capacity', 'peak_power')
+
+
+def plant_capacity(table, column=None):
+    r"""
+    Capacity of the plants of a PlantTable.
+
+    Parameters
+    ----------
+    table : PlantTable
+    column : string, optional
+        Column of the capacity. By default the first existing column of
+        installed_capacity and peak_power is used.
+
+    Returns
+    -------
+    numpy.array
+        The capacity of each plant, NaN if the table has no such column.
+    """
+    columns = CAPACITY_COLUMNS if column is None else (column,)
+    for name in columns:
+        if name in table.columns:
+            return np.asarray(table.columns[name], dtype=float)
+    return np.full(len(table.ids), np.nan)
+
+
+def make_writer(config, index, plant_ids, capacity=None):
+    r"""Writer of the results of a config (see :mod:`feedinlib.cli`)."""
+    options = dict(config['output'])
+    kind = options.pop('format', 'matrix')
+    if kind == 'statistics':
+        from . import statistics
+        interval = 1.
+        if len(index) > 1:
+            interval = (index[1] - index[0]) / np.timedelta64(1, 'h')
+        return statistics.FeedinStatistics(
+            plant_ids, capacity=capacity,
+            interval=options.get('interval', interval),
+            bins=options.get('bins', 100), path=options['path'])
+    if kind == 'matrix':
+        from . import matrix
+        return matrix.ResultMatrix.create(
+            options['path'], index=index, plants=plant_ids,
+            dtype=options.get('dtype', 'float64'),
+            order=options.get('order', 'C'))
+    if kind == 'arrow':
+        from . import arrow
+        return arrow.ArrowWriter(options['path'])
+    if kind == 'csv':
+        return chunked.CsvWriter(options['path'])
+    raise ValueError("Unknown output format: {0}".format(kind))
+
+
+def _calculate(runners, index, writer, options, label=''):
+    # Calculate the plant tables block by block and write the results
+    n_values = 0
+    start = time.time()
+    try:
+        for table_number, (plants, sources) in enumerate(runners, 1):
+            runner = chunked.ChunkedFeedin(
+                plants, sources, index=index,
+                memory_limit=options.get('memory_limit', '1GB'),
+                time_chunk=options.get('time_chunk'))
+            n_blocks = len(runner.blocks())
+            results = runner.iter_results(threads=options.get('threads'))
+            for number, result in enumerate(results, 1):
+                writer.write(result)
+                n_values += result.size
+                seconds = max(time.time() - start, 1e-9)
+                logging.info(
+                    label + "Table {0}/{1}, block {2}/{3}: ".format(
+                        table_number, len(runners), number, n_blocks) +
+                    "{0} values in {1:.1f} s ({2:.0f} values/s)".format(
+                        n_values, seconds, n_values / seconds))
+    finally:
+        writer.close()
+    return writer
+
+
+def _writer(config, index, runners, path=None):
+    # Writer of all plants of the runners
+    output = dict(config['output'])
+    if path is not None:
+        output['path'] = path
+    plant_ids = [plant_id for plants, sources in runners
+                 for cell_table in plants.values() for plant_id in
+                 cell_table.ids]
+    capacity = np.concatenate([
+        plant_capacity(cell_table, output.get('capacity_column'))
+        for plants, sources in runners for cell_table in plants.values()] or
+        [np.zeros(0)])
+    return make_writer(dict(config, output=output), index, plant_ids,
+                       capacity=capacity)
+
+
+def run(config, **kwargs):
+    r"""
+    Run the batch calculation of a config.
+
+    Parameters
+    ----------
+    config : dictionary
+        See :mod:`feedinlib.cli`.
+    threads, memory_limit, time_chunk, shards : optional
+        Overwrite the values of the run section of the config.
+    shard : list of ints, optional
+        Only calculate these shards of a sharded run (default: all).
+
+    Returns
+    -------
+    The writer object or the :class:`ShardedRun
+    <feedinlib.sharded.ShardedRun>` of a sharded run.
+    """
+    options = dict(config.get('run', {}))
+    options.update({k: v for k, v in kwargs.items() if v is not None})
+    source = weather_source(config)
+
+    runners = []
+    for table, cell_column in load_plants(config):
+        plants, sources = source.sources(table, cell_column)
+        runners.append((plants, sources))
+    index = source.time_index(runners[0][1])
+
+    if not options.get('shards'):
+        return _calculate(runners, index, _writer(config, index, runners),
+                          options)
+
+    from . import sharded
+    n_shards = int(options['shards'])
+    sharded_run = sharded.ShardedRun(config['output']['path'], n_shards)
+    partitions = [sharded.partition(plants, n_shards)
+                  for plants, sources in runners]
+    for shard in options.get('shard') or range(n_shards):
+        if sharded_run.done(shard):
+            logging.info("Shard {0} is complete.".format(shard))
+            continue
+        shard_runners = [(parts[shard], sources) for parts, (plants, sources)
+                         in zip(partitions, runners) if parts[shard]]
+        plant_ids = [plant_id for plants, sources in shard_runners
+                     for cell_table in plants.values()
+                     for plant_id in cell_table.ids]
+
+        def calculate(path):
+            if plant_ids:
+                writer = _writer(config, index, shard_runners, path)
+                _calculate(shard_runners, index, writer, options,
+                           label='Shard {0}/{1}, '.format(shard, n_shards))
+
+        if not sharded_run.run(shard, calculate, plants=plant_ids):
+            logging.info("Shard {0} is locked by another process.".format(
+                shard))
+    return sharded_run
+
+
+def main(argv=None):
+    r"""Entry point of the ``feedinlib`` command."""
+    parser = argparse.ArgumentParser(
+        prog='feedinlib',
+        description='Calculate the feedin of plant tables in a batch run.')
+    parser.add_argument('config', help='json config file of the run')
+    parser.add_argument('--threads', type=int,
+                        help='number of threads per plant table')
+    parser.add_argument('--memory-limit',
+                        help="memory limit of one block, e.g. '2GB'")
+    parser.add_argument('--time-chunk', type=int,
+                        help='number of time steps of one block')
+    parser.add_argument('--shards', type=int,
+                        help='number of shards of a resumable run')
+    parser.add_argument('--shard', type=int, action='append',
+                        help='only calculate this shard (repeatable)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='do not show the progress')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s %(message)s')
+    logging.getLogger().setLevel(
+        logging.WARNING if args.quiet else logging.INFO)
+    run(load_config(args.config), threads=args.threads,
+        memory_limit=args.memory_limit, time_chunk=args.time_chunk,
+        shards=args.shards, shard=args.shard)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Feedin of ensemble weather forecasts.
+
+An ensemble forecast consists of several members (realisations) of the
+weather of the same cell and time steps. The :class:`EnsembleWeather` object
+holds all members in one weather object with a (member, time) row index, so
+the models calculate the feedin of all members in one vectorized call.
+Quantities that depend only on the time, like the position of the sun, are
+calculated once for all members.
+
+The feedin of a powerplant is returned as a (time x member) DataFrame by
+:py:func:`feedin <feedinlib.ensemble.feedin>` and can be reduced to
+quantiles with :py:func:`quantiles <feedinlib.ensemble.quantiles>`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import weather as fweather
+
+MEMBER = 'member'
+TIME = 'time'
+
+
+class EnsembleWeather(fweather.FeedinWeather):
+    r"""
+    Weather object with several members of an ensemble forecast.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Containing the time series of the different parameters as columns
+        and a MultiIndex with the levels 'member' and 'time' as index. Use
+        :py:func:`from_members
+        <feedinlib.ensemble.EnsembleWeather.from_members>` or
+        :py:func:`from_arrays
+        <feedinlib.ensemble.EnsembleWeather.from_arrays>` to create it.
+    \**kwargs :
+        The meta data of the weather object, see
+        :class:`FeedinWeather <feedinlib.weather.FeedinWeather>`. The meta
+        data is shared by all members.
+
+    Examples
+    --------
+    >>> from feedinlib import ensemble
+    >>> forecast = ensemble.EnsembleWeather.from_members(
+    ...     member_weather_objects)  # doctest: +SKIP
+    >>> feedin = ensemble.feedin(my_pv_plant, forecast)  # doctest: +SKIP
+    >>> p10, p50, p90 = ensemble.quantiles(feedin).T.values  # doctest: +SKIP
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if kwargs.get('timezone') is None:
+            self.timezone = self.times.tz
+
+    @classmethod
+    def from_members(cls, members, **kwargs):
+        r"""
+        Create an ensemble from the weather of the single members.
+
+        Parameters
+        ----------
+        members : dictionary or list
+            The names of the members as keys and their weather data as values
+            or a list of weather data (named 0, 1, ...). The weather data are
+            FeedinWeather objects or pandas.DataFrames with the same time
+            index and columns.
+        \**kwargs :
+            The meta data of the ensemble. By default the meta data of the
+            first FeedinWeather object is used.
+
+        Returns
+        -------
+        EnsembleWeather object
+        """
+        if not isinstance(members, dict):
+            members = dict(enumerate(members))
+        first = next(iter(members.values()))
+        if isinstance(first, fweather.FeedinWeather):
+            for name in ('timezone', 'longitude', 'latitude', 'geometry',
+                         'data_height', 'name'):
+                kwargs.setdefault(name, getattr(first, name))
+        frames = [getattr(member, 'data', member)
+                  for member in members.values()]
+        data = pd.concat(frames, keys=list(members), names=[MEMBER, TIME])
+        return cls(data=data, **kwargs)
+
+    @classmethod
+    def from_arrays(cls, index, members=None, **kwargs):
+        r"""
+        Create an ensemble from (time x member) arrays.
+
+        Parameters
+        ----------
+        index : pandas.DatetimeIndex
+            The time steps of the forecast.
+        members : list, optional
+            The names of the members. By default the members are numbered.
+        \**kwargs :
+            Two dimensional arrays (time x member) of the weather parameters
+            (e.g. v_wind, temp_air, dhi, dirhi) with the names of the
+            parameters as keys. All other keyword arguments are the meta data
+            of the ensemble (see :class:`FeedinWeather
+            <feedinlib.weather.FeedinWeather>`).
+
+        Returns
+        -------
+        EnsembleWeather object
+        """
+        meta = ('timezone', 'longitude', 'latitude', 'geometry',
+                'data_height', 'name')
+        arrays = {key: np.asarray(value) for key, value in kwargs.items()
+                  if key not in meta}
+        meta = {key: value for key, value in kwargs.items() if key in meta}
+        n_members = next(iter(arrays.values())).shape[1]
+        if members is None:
+            members = list(range(n_members))
+        rows = pd.MultiIndex.from_product([members, index],
+                                          names=[MEMBER, TIME])
+        # Member-major order: all time steps of the first member first
+        data = pd.DataFrame({key: value.T.ravel()
+                             for key, value in arrays.items()}, index=rows)
+        return cls(data=data, **meta)
+
+    @property
+    def members(self):
+        r"""The names of the members."""
+        return self.data.index.unique(level=MEMBER)
+
+    @property
+    def times(self):
+        r"""The time steps of the forecast."""
+        return pd.DatetimeIndex(self.data.index.unique(level=TIME))
+
+    def expand(self, data):
+        r"""
+        Repeat data indexed by time for all members (see
+        :py:func:`FeedinWeather.expand
+        <feedinlib.weather.FeedinWeather.expand>`).
+        """
+        expanded = data.reindex(self.data.index.get_level_values(TIME))
+        expanded.index = self.data.index
+        return expanded
+
+    def member(self, name):
+        r"""
+        Weather of a single member.
+
+        Returns
+        -------
+        feedinlib.weather.FeedinWeather object
+        """
+        return fweather.FeedinWeather(
+            data=self.data.xs(name, level=MEMBER), timezone=self.timezone,
+            longitude=self.longitude, latitude=self.latitude,
+            geometry=self.geometry, data_height=self.data_height,
+            name=self.name)
+
+    def unstack(self, feedin):
+        r"""
+        Reshape a feedin time series of the ensemble to (time x member).
+
+        Parameters
+        ----------
+        feedin : pandas.Series
+            The feedin of a powerplant calculated with this weather object.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The time steps as index and the members as columns.
+        """
+        result = feedin.unstack(MEMBER)
+        result.columns.name = MEMBER
+        return result.reindex(index=self.times, columns=self.members)
+
+
+def feedin(powerplant, weather, **kwargs):
+    r"""
+    Feedin of a powerplant for all members of an ensemble.
+
+    Parameters
+    ----------
+    powerplant : powerplant object
+        See :mod:`feedinlib.powerplants`.
+    weather : EnsembleWeather object
+    \**kwargs :
+        Passed to the feedin method of the powerplant.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The feedin with the time steps as index and the members as columns.
+    """
+    return weather.unstack(powerplant.feedin(weather=weather, **kwargs))
+
+
+def quantiles(feedin, q=(0.1, 0.5, 0.9)):
+    r"""
+    Quantiles of the feedin over the members for each time step.
+
+    Parameters
+    ----------
+    feedin : pandas.DataFrame
+        The feedin with the time steps as index and the members as columns
+        (see :py:func:`feedin <feedinlib.ensemble.feedin>`).
+    q : list of floats, optional
+        The quantiles between 0 and 1 (default: 0.1, 0.5, 0.9).
+
+    Returns
+    -------
+    pandas.DataFrame
+        The time steps as index and the quantiles as columns.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> from feedinlib import ensemble
+    >>> feedin = pd.DataFrame([[0., 1., 2.], [3., 4., 5.]])
+    >>> ensemble.quantiles(feedin, q=[0.5])[0.5].tolist()
+    [1.0, 4.0]
+    """
+    return pd.DataFrame(np.quantile(feedin.values, q, axis=1).T,
+                        index=feedin.index, columns=list(q))
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Lazy reader for gridded weather data sets in NetCDF or HDF5 files.
+
+Reanalysis data sets such as coastDat2 or ERA5 come as gridded NetCDF files.
+Instead of exploding them into one csv-file per weather cell, the
+:class:`GriddedWeather` reader opens the file lazily and only reads the cells
+and time windows a calculation needs. The weather objects it returns load
+their data on first access.
+
+The reader uses xarray, which is an optional dependency of the feedinlib.
+Depending on the file format a backend such as netCDF4 or h5netcdf is needed
+as well.
+
+The time series in the file are expected in the units of the feedinlib
+(temperature in K, pressure in Pa, wind speed in m/s, irradiation in W/m²)
+and with the time in UTC.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xarray as xr
+except ImportError:
+    xr = None
+
+from . import weather as fweather
+
+
+class GriddedFeedinWeather(fweather.FeedinWeather):
+    r"""
+    Weather object of one grid cell whose data is read on first access.
+
+    Parameters
+    ----------
+    loader : callable
+        Called without arguments to read the data (a pandas.DataFrame).
+    \**kwargs :
+        The meta data of the weather object, see
+        :class:`FeedinWeather <feedinlib.weather.FeedinWeather>`. The data
+        parameter is ignored.
+    """
+
+    def __init__(self, loader, **kwargs):
+        # The base class would read the data to determine the time zone.
+        self._loader = loader
+        self._data = None
+        self._derived = {}
+        self.timezone = kwargs.get('timezone', None)
+        self.longitude = kwargs.get('longitude', None)
+        self.latitude = kwargs.get('latitude', None)
+        self.geometry = kwargs.get('geometry', None)
+        self.data_height = kwargs.get('data_height', None)
+        self.name = kwargs.get('name', None)
+
+    @property
+    def data(self):
+        if self._data is None and self._loader is not None:
+            self._data = self._loader()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._loader = None
+        self.clear_derived()
+
+    @property
+    def loaded(self):
+        r"""True if the data has been read from the file."""
+        return self._data is not None
+
+
+class GriddedWeather:
+    r"""
+    Lazily opened gridded weather data set.
+
+    Parameters
+    ----------
+    filename : string
+        NetCDF or HDF5 file with the weather data.
+    variables : dictionary
+        Mapping the names of the feedinlib weather parameters (e.g. 'v_wind',
+        'temp_air', 'pressure', 'dhi', 'dirhi', 'z0') to the names of the
+        variables in the file.
+    data_height : dictionary, optional
+        Heights of the weather parameters in meters with the feedinlib names
+        as keys. For parameters missing in this dictionary the height is
+        taken from a scalar 'height' coordinate or attribute of the variable
+        in the file and is 0 otherwise.
+    timezone : string, optional
+        Time zone of the weather objects (default: 'UTC'). The time in the
+        file is converted from UTC into this time zone.
+    latitude, longitude, time : string, optional
+        Names of the latitude, longitude and time coordinates in the file
+        (default: 'lat', 'lon', 'time'). Latitude and longitude can be one
+        dimensional (regular grid) or two dimensional (e.g. rotated grids).
+    engine : string, optional
+        Backend used by xarray to read the file, e.g. 'netcdf4' or
+        'h5netcdf'. By default xarray chooses the engine.
+
+    Examples
+    --------
+    >>> from feedinlib import gridded
+    >>> era = gridded.GriddedWeather(
+    ...     'era5_2010.nc', variables={'v_wind': 'ws10', 'temp_air': 't2m',
+    ...     'pressure': 'sp', 'z0': 'fsr', 'dhi': 'dhi', 'dirhi': 'dirhi'},
+    ...     data_height={'v_wind': 10, 'temp_air': 2},
+    ...     latitude='latitude', longitude='longitude')  # doctest: +SKIP
+    >>> cells = era.select(bbox=(12, 51, 14, 53))  # doctest: +SKIP
+    >>> my_weather = era.weather(cells[0], start='2010-06-01',
+    ...                          end='2010-06-30 23:00')  # doctest: +SKIP
+    """
+
+    def __init__(self, filename, variables, **kwargs):
+        if xr is None:
+            raise ImportError(
+                "Reading gridded weather data requires xarray. Install it " +
+                "with 'pip install xarray netCDF4'.")
+        self.filename = filename
+        self.variables = variables
+        self.timezone = kwargs.get('timezone', 'UTC')
+        self.lat_name = kwargs.get('latitude', 'lat')
+        self.lon_name = kwargs.get('longitude', 'lon')
+        self.time_name = kwargs.get('time', 'time')
+
+        # Opening the data set only reads the meta data and the coordinates.
+        open_kwargs = {}
+        if kwargs.get('engine') is not None:
+            open_kwargs['engine'] = kwargs['engine']
+        self.dataset = xr.open_dataset(filename, **open_kwargs)
+
+        lat = self.dataset[self.lat_name]
+        lon = self.dataset[self.lon_name]
+        if lat.ndim == 1 and lon.ndim == 1:
+            self.dims = (lat.dims[0], lon.dims[0])
+            self.lon_grid, self.lat_grid = np.meshgrid(lon.values, lat.values)
+        else:
+            self.dims = lat.dims
+            self.lat_grid = lat.values
+            self.lon_grid = lon.transpose(*self.dims).values
+
+        self.data_height = {}
+        for name, var in variables.items():
+            height = kwargs.get('data_height', {}).get(name)
+            if height is None:
+                height = self._height(self.dataset[var])
+            self.data_height[name] = float(height)
+
+    @staticmethod
+    def _height(variable):
+        if 'height' in variable.coords and variable.coords['height'].size == 1:
+            return variable.coords['height'].values.item()
+        return variable.attrs.get('height', 0)
+
+    @property
+    def shape(self):
+        r"""Shape of the grid (number of cells per grid dimension)."""
+        return self.lat_grid.shape
+
+    def close(self):
+        r"""Close the file."""
+        self.dataset.close()
+
+    def select(self, index=None, bbox=None):
+        r"""
+        Select grid cells.
+
+        Parameters
+        ----------
+        index : list, optional
+            Flat indices of the cells (row-major order of the grid) or tuples
+            with the index of the cell in each grid dimension.
+        bbox : tuple, optional
+            Bounding box (lon_min, lat_min, lon_max, lat_max) in degrees. All
+            cells whose center lies within the box (borders included) are
+            selected.
+
+        Returns
+        -------
+        list of tuples
+            The index of each selected cell in each grid dimension. If
+            neither index nor bbox is given, all cells are returned.
+        """
+        if index is not None:
+            return [tuple(int(j) for j in (
+                np.unravel_index(i, self.shape) if np.ndim(i) == 0 else i))
+                for i in index]
+        mask = np.ones(self.shape, dtype=bool)
+        if bbox is not None:
+            lon_min, lat_min, lon_max, lat_max = bbox
+            mask = ((self.lon_grid >= lon_min) & (self.lon_grid <= lon_max) &
+                    (self.lat_grid >= lat_min) & (self.lat_grid <= lat_max))
+        return [tuple(int(i) for i in cell) for cell in np.argwhere(mask)]
+
+    def read(self, cell, start=None, end=None):
+        r"""
+        Read the time series of one cell.
+
+        Parameters
+        ----------
+        cell : tuple
+            Index of the cell in each grid dimension (see :py:func:`select
+            <feedinlib.gridded.GriddedWeather.select>`).
+        start, end : string or datetime-like, optional
+            First and last time step to read (both inclusive). Times without
+            time zone refer to the time zone of the reader. By default the
+            whole time series is read.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Containing one column per weather parameter.
+        """
+        position = dict(zip(self.dims, cell))
+        window = slice(self._to_utc(start), self._to_utc(end))
+        data = {}
+        index = None
+        for name, var in self.variables.items():
+            series = self.dataset[var].isel(**position).sel(
+                **{self.time_name: window})
+            # Remaining dimensions of length one (e.g. a single level), but
+            # never the time, which may hold a single time step
+            series = series.squeeze(
+                [d for d in series.dims if d != self.time_name
+                 and series.sizes[d] == 1], drop=True)
+            data[name] = series.values
+            if index is None:
+                index = pd.DatetimeIndex(
+                    series[self.time_name].values).tz_localize('UTC')
+        return pd.DataFrame(data, index=index.tz_convert(self.timezone))
+
+    def weather(self, cell, start=None, end=None):
+        r"""
+        Weather object of one cell.
+
+        The data is read from the file on first access of the data attribute
+        of the returned object.
+
+        Parameters
+        ----------
+        cell, start, end :
+            See :py:func:`read <feedinlib.gridded.GriddedWeather.read>`.
+
+        Returns
+        -------
+        GriddedFeedinWeather object
+        """
+        return GriddedFeedinWeather(
+            loader=lambda: self.read(cell, start, end),
+            timezone=self.timezone,
+            latitude=float(self.lat_grid[cell]),
+            longitude=float(self.lon_grid[cell]),
+            data_height=dict(self.data_height),
+            name='{0}{1}'.format(self.filename, list(cell)))
+
+    def source(self, cell):
+        r"""
+        Weather source of one cell for a chunked run (see
+        :class:`ChunkedFeedin <feedinlib.chunked.ChunkedFeedin>`).
+
+        Returns
+        -------
+        callable
+            Returns the weather object of the cell for the window
+            ``(start, end)``.
+        """
+        return lambda start, end: self.weather(cell, start, end)
+
+    def time_index(self):
+        r"""Time index of the data set in the time zone of the reader."""
+        return pd.DatetimeIndex(
+            self.dataset[self.time_name].values).tz_localize('UTC').tz_convert(
+            self.timezone)
+
+    def _to_utc(self, time):
+        # The time coordinate of the file is in UTC without time zone.
+        if time is None:
+            return None
+        time = pd.Timestamp(time)
+        if time.tzinfo is None:
+            time = time.tz_localize(self.timezone)
+        return time.tz_convert('UTC').tz_localize(None)
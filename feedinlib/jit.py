@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Optional compiled backend of the pv and wind models.
+
+The numpy implementation of a pv module evaluates the angle of incidence,
+the Perez transposition, the cell temperature and the Sandia PV Array
+Performance Model (SAPM) as a long chain of elementwise operations, each one
+allocating a temporary array of the full length. If numba [1]_ is installed
+the functions of this module fuse the whole chain into one compiled loop over
+the time steps. The same applies to the power curve of a wind turbine.
+
+The backend is chosen with the option `backend` of :class:`PvlibBased
+<feedinlib.models.PvlibBased>` and :class:`SimpleWindTurbine
+<feedinlib.models.SimpleWindTurbine>`:
+
+* 'auto' (default): the compiled loops are used if numba can be imported,
+  otherwise the numpy implementation
+* 'numba': always use the compiled loops (ImportError without numba)
+* 'numpy': always use the numpy implementation
+
+The compiled loops follow the equations of pvlib and the windpowerlib step by
+step, so the results agree with the numpy implementation up to rounding.
+They are compiled on first use and the compiled code is cached on disk.
+
+References
+----------
+.. [1] `numba <http://numba.pydata.org>`_.
+"""
+
+import math
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ('auto', 'numba', 'numpy')
+
+# Order of the module parameters in the coefficient vector of a module
+SAPM_PARAMETERS = (
+    'A0', 'A1', 'A2', 'A3', 'A4', 'B0', 'B1', 'B2', 'B3', 'B4', 'B5', 'FD',
+    'Impo', 'C0', 'C1', 'Aimp', 'Vmpo', 'C2', 'C3', 'Cells_in_Series', 'N',
+    'Bvmpo', 'Mbvmp')
+
+# Coefficients F11, F12, F13, F21, F22, F23 of the Perez model for the eight
+# bins of the sky clearness (Perez et al. 1990, Solar Energy 44(5)) as used
+# by pvlib.irradiance.perez
+PEREZ_COEFFICIENTS = {
+    'allsitescomposite1990': (
+        (-0.0080, 0.5880, -0.0620, -0.0600, 0.0720, -0.0220),
+        (0.1300, 0.6830, -0.1510, -0.0190, 0.0660, -0.0290),
+        (0.3300, 0.4870, -0.2210, 0.0550, -0.0640, -0.0260),
+        (0.5680, 0.1870, -0.2950, 0.1090, -0.1520, -0.0140),
+        (0.8730, -0.3920, -0.3620, 0.2260, -0.4620, 0.0010),
+        (1.1320, -1.2370, -0.4120, 0.2880, -0.8230, 0.0560),
+        (1.0600, -1.6000, -0.3590, 0.2640, -1.1270, 0.1310),
+        (0.6780, -0.3270, -0.2500, 0.1560, -1.3770, 0.2510)),
+}
+
+# Cell temperature model 'Open_rack_cell_polymerback' of
+# pvlib.pvsystem.sapm_celltemp
+CELLTEMP = (-3.56, -.0750, 3.)
+
+
+def use(backend):
+    r"""
+    Whether the compiled loops are used for the given backend.
+
+    Parameters
+    ----------
+    backend : string
+        One of 'auto', 'numba' or 'numpy'.
+
+    Returns
+    -------
+    boolean
+
+    Raises
+    ------
+    ImportError
+        If the backend 'numba' is requested but numba is not installed.
+    ValueError
+        If the backend is unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend: {0}. Use one of {1}.".format(
+            backend, BACKENDS))
+    if backend == 'numba' and numba is None:
+        raise ImportError(
+            "The backend 'numba' needs numba. Install it with "
+            "'pip install numba' or use the backend 'numpy'.")
+    return backend != 'numpy' and numba is not None
+
+
+def module_coefficients(module):
+    r"""
+    Parameters of a pv module as a float vector in the order of
+    `SAPM_PARAMETERS`.
+
+    Parameters
+    ----------
+    module : dictionary or pandas.Series
+        See :py:func:`PvlibBased.fetch_module_data
+        <feedinlib.models.PvlibBased.fetch_module_data>`.
+
+    Returns
+    -------
+    numpy.array
+    """
+    return np.array([module[name] for name in SAPM_PARAMETERS], dtype=float)
+
+
+def perez_coefficients(model='allsitescomposite1990'):
+    r"""
+    Coefficients F1 and F2 of the Perez model (8 x 3 arrays each).
+
+    Only the model 'allsitescomposite1990' used by
+    :py:func:`pvlib.irradiance.perez` by default is available (see
+    `PEREZ_COEFFICIENTS`).
+    """
+    if model == '1990':
+        model = 'allsitescomposite1990'
+    if model not in PEREZ_COEFFICIENTS:
+        raise ValueError(
+            "Unknown Perez model: {0}. Use one of {1}.".format(
+                model, sorted(PEREZ_COEFFICIENTS)))
+    table = np.array(PEREZ_COEFFICIENTS[model], dtype=float)
+    return (np.ascontiguousarray(table[:, :3]),
+            np.ascontiguousarray(table[:, 3:]))
+
+
+def _jit(function):
+    if numba is None:
+        return None
+    # error_model='numpy': divisions by zero give inf or nan like numpy
+    return numba.njit(cache=True, nogil=True, error_model='numpy')(function)
+
+
+def _maximum(a, b):
+    # Like numpy.maximum, nan if one of the values is nan
+    if a != a or b != b:
+        return math.nan
+    return a if a > b else b
+
+
+def _minimum(a, b):
+    # Like numpy.minimum, nan if one of the values is nan
+    if a != a or b != b:
+        return math.nan
+    return a if a < b else b
+
+
+def _polyval(coefficients, x):
+    # Horner scheme in the same order as numpy.polyval (highest power first)
+    y = 0.
+    for c in coefficients:
+        y = y * x + c
+    return y
+
+
+_maximum = _jit(_maximum) or _maximum
+_minimum = _jit(_minimum) or _minimum
+_polyval = _jit(_polyval) or _polyval
+
+
+def _pv_power(zenith, solar_azimuth, dhi, dni, ghi, dni_extra, airmass,
+              temp_air, v_wind, tilt, azimuth, albedo, f1c, f2c, module, out):
+    kappa = 1.041
+    cos_tilt = math.cos(math.radians(tilt))
+    sin_tilt = math.sin(math.radians(tilt))
+    cos_85 = math.cos(math.radians(85))
+    spectral = np.empty(5)
+    for i in range(5):
+        spectral[i] = module[4 - i]
+    angular = np.empty(6)
+    for i in range(6):
+        angular[i] = module[10 - i]
+
+    for t in range(zenith.shape[0]):
+        # Rows without daylight (see PvlibBased.daylight)
+        if not (zenith[t] < 90 or ghi[t] > 0):
+            out[t] = 0.
+            continue
+
+        # Angle of incidence (pvlib.irradiance.aoi)
+        cos_zenith = math.cos(math.radians(zenith[t]))
+        projection = (cos_tilt * cos_zenith +
+                      sin_tilt * math.sin(math.radians(zenith[t])) *
+                      math.cos(math.radians(solar_azimuth[t] - azimuth)))
+        # Limited to [-1, 1] like pvlib, rounding errors of parallel
+        # vectors must not give nan
+        projection = min(max(projection, -1.), 1.)
+        aoi = math.degrees(math.acos(projection))
+
+        # Sky diffuse irradiation (pvlib.irradiance.perez)
+        z = math.radians(zenith[t])
+        delta = dhi[t] * airmass[t] / dni_extra[t]
+        eps = ((dhi[t] + dni[t]) / dhi[t] + kappa * z ** 3) / (
+            1 + kappa * z ** 3)
+        if eps < 1.065:
+            ebin = 0
+        elif eps < 1.23:
+            ebin = 1
+        elif eps < 1.5:
+            ebin = 2
+        elif eps < 1.95:
+            ebin = 3
+        elif eps < 2.8:
+            ebin = 4
+        elif eps < 4.5:
+            ebin = 5
+        elif eps < 6.2:
+            ebin = 6
+        elif eps >= 6.2:
+            ebin = 7
+        else:
+            ebin = -1
+        if ebin < 0 or airmass[t] != airmass[t]:
+            sky_diffuse = 0.
+        else:
+            f1 = _maximum(f1c[ebin, 0] + f1c[ebin, 1] * delta +
+                          f1c[ebin, 2] * z, 0.)
+            f2 = _maximum(f2c[ebin, 0] + f2c[ebin, 1] * delta +
+                          f2c[ebin, 2] * z, 0.)
+            a = _maximum(projection, 0.)
+            b = _maximum(cos_zenith, cos_85)
+            sky_diffuse = _maximum(dhi[t] * (
+                0.5 * (1 - f1) * (1 + cos_tilt) + f1 * a / b +
+                f2 * sin_tilt), 0.)
+            if sky_diffuse != sky_diffuse:
+                sky_diffuse = 0.
+
+        # Irradiation in plane (pvlib.irradiance.globalinplane)
+        ground_diffuse = ghi[t] * albedo * (1 - cos_tilt) * 0.5
+        poa_direct = _maximum(dni[t] * math.cos(math.radians(aoi)), 0.)
+        poa_global = poa_direct + sky_diffuse + ground_diffuse
+        poa_diffuse = sky_diffuse + ground_diffuse
+
+        # Cell temperature (pvlib.pvsystem.sapm_celltemp)
+        temp_cell = (poa_global * math.exp(CELLTEMP[0] + CELLTEMP[1] *
+                                           v_wind[t]) +
+                     (temp_air[t] - 273.15) + poa_global / 1000. *
+                     CELLTEMP[2])
+
+        out[t] = _sapm_power(poa_direct, poa_diffuse, aoi, airmass[t],
+                             temp_cell, spectral, angular, module)
+    return out
+
+
+def _sapm_power(poa_direct, poa_diffuse, aoi, airmass, temp_cell, spectral,
+                angular, module):
+    # Output of a module at one time step, zero instead of nan
+    fd = module[11]
+    impo, c0, c1, aimp = module[12], module[13], module[14], module[15]
+    vmpo, c2, c3 = module[16], module[17], module[18]
+    cells, n, bvmpo, mbvmp = module[19], module[20], module[21], module[22]
+
+    # Effective irradiance (pvlib.pvsystem.sapm_effective_irradiance)
+    f1 = _maximum(0., _polyval(spectral, airmass))
+    if f1 != f1:
+        f1 = 0.
+    f2 = _polyval(angular, aoi)
+    if f2 < 0:
+        f2 = 0.
+    if aoi < 0:
+        f2 = math.nan
+    ee = f1 * (poa_direct * f2 + fd * poa_diffuse) / 1000.
+
+    # Maximum power point (pvlib.pvsystem.sapm)
+    dt = temp_cell - 25
+    delta = n * 1.38066e-23 * (temp_cell + 273.15) / 1.60218e-19
+    log_ee = math.log(ee) if ee > 0 else (
+        -math.inf if ee == 0 else math.nan)
+    i_mp = impo * (c0 * ee + c1 * ee ** 2) * (1 + aimp * dt)
+    v_mp = _maximum(0., (
+        vmpo + c2 * cells * delta * log_ee +
+        c3 * cells * (delta * log_ee) ** 2 +
+        (bvmpo + mbvmp * (1 - ee)) * dt))
+    p_mp = i_mp * v_mp
+    return 0. if p_mp != p_mp else p_mp
+
+
+def _sapm_matrix(poa_direct, poa_diffuse, aoi, airmass, temp_cell,
+                 coefficients, out):
+    spectral = np.empty((coefficients.shape[0], 5))
+    angular = np.empty((coefficients.shape[0], 6))
+    for j in range(coefficients.shape[0]):
+        for i in range(5):
+            spectral[j, i] = coefficients[j, 4 - i]
+        for i in range(6):
+            angular[j, i] = coefficients[j, 10 - i]
+    for t in range(out.shape[0]):
+        for j in range(out.shape[1]):
+            out[t, j] = _sapm_power(
+                poa_direct[t, j], poa_diffuse[t, j], aoi[t, j],
+                airmass[t, j], temp_cell[t, j], spectral[j], angular[j],
+                coefficients[j])
+    return out
+
+
+def _wind_power(v_wind_hub, rho_hub, d_rotor, cp_wind_speed, cp,
+                nominal_power, out):
+    area = ((d_rotor / 2) ** 2) * math.pi
+    last = cp_wind_speed.shape[0] - 1
+    for t in range(v_wind_hub.shape[0]):
+        v = v_wind_hub[t]
+        if v != v:
+            out[t] = math.nan
+            continue
+        # Power coefficient (numpy.interp limited to the power curve)
+        v_cp = min(v, cp_wind_speed[last])
+        if v_cp <= cp_wind_speed[0]:
+            cp_v = cp[0]
+        elif v_cp >= cp_wind_speed[last]:
+            cp_v = cp[last]
+        else:
+            j = np.searchsorted(cp_wind_speed, v_cp, side='right') - 1
+            cp_v = ((cp[j + 1] - cp[j]) /
+                    (cp_wind_speed[j + 1] - cp_wind_speed[j]) *
+                    (v_cp - cp_wind_speed[j]) + cp[j])
+        out[t] = _minimum((rho_hub[t] / 2) * area * v ** 3 * cp_v,
+                          nominal_power)
+    return out
+
+
+_sapm_power = _jit(_sapm_power) or _sapm_power
+_pv_power = _jit(_pv_power)
+_sapm_matrix = _jit(_sapm_matrix)
+_wind_power = _jit(_wind_power)
+
+
+def pv_power(zenith, solar_azimuth, dhi, dni, ghi, dni_extra, airmass,
+             temp_air, v_wind, tilt, azimuth, albedo, module):
+    r"""
+    Output of a pv module [W] in one compiled loop.
+
+    Fuses the angle of incidence, the Perez transposition, the irradiation
+    in plane, the cell temperature and the SAPM (see
+    :py:func:`PvlibBased.get_pv_power_output
+    <feedinlib.models.PvlibBased.get_pv_power_output>`).
+
+    Parameters
+    ----------
+    zenith, solar_azimuth : numpy.array
+        Position of the sun in degrees (zenith limited to 90°).
+    dhi, dni, ghi, dni_extra, airmass : numpy.array
+        See :py:func:`irradiation_kernel
+        <feedinlib.models.irradiation_kernel>`.
+    temp_air : numpy.array
+        Air temperature [K].
+    v_wind : numpy.array
+        Wind speed [m/s].
+    tilt, azimuth, albedo : float
+        Orientation of the module in degrees and albedo.
+    module : dictionary or pandas.Series
+        Parameters of the module.
+
+    Returns
+    -------
+    numpy.array
+        Output of the module, zero for rows without daylight.
+    """
+    f1c, f2c = perez_coefficients()
+    arrays = [np.ascontiguousarray(a, dtype=float) for a in (
+        zenith, solar_azimuth, dhi, dni, ghi, dni_extra, airmass, temp_air,
+        v_wind)]
+    return _pv_power(*arrays, float(tilt), float(azimuth), float(albedo),
+                     f1c, f2c, module_coefficients(module),
+                     np.empty(len(arrays[0])))
+
+
+def sapm_matrix(poa_direct, poa_diffuse, aoi, airmass, temp_cell,
+                coefficients):
+    r"""
+    Output of many pv modules [W] in one compiled loop, see
+    :py:func:`sapm_matrix_kernel <feedinlib.models.sapm_matrix_kernel>`.
+
+    All inputs are broadcast to the shape (time x module) of the result.
+    """
+    coefficients = np.ascontiguousarray(coefficients, dtype=float)
+    shape = np.broadcast(poa_direct, poa_diffuse, aoi, airmass, temp_cell,
+                         coefficients[:, 0]).shape
+    arrays = [np.ascontiguousarray(np.broadcast_to(a, shape), dtype=float)
+              for a in (poa_direct, poa_diffuse, aoi, airmass, temp_cell)]
+    return _sapm_matrix(*arrays, coefficients, np.empty(shape))
+
+
+def wind_power(v_wind_hub, rho_hub, d_rotor, cp_wind_speed, cp,
+               nominal_power):
+    r"""
+    Output of a wind turbine [W] in one compiled loop, see
+    :py:func:`wind_power_kernel <feedinlib.models.wind_power_kernel>`.
+
+    The power coefficient is interpolated from the power curve (cp at the
+    wind speeds cp_wind_speed) and is constant above the last wind speed of
+    the curve.
+    """
+    v_wind_hub = np.ascontiguousarray(v_wind_hub, dtype=float)
+    return _wind_power(
+        v_wind_hub, np.ascontiguousarray(rho_hub, dtype=float),
+        float(d_rotor), np.ascontiguousarray(cp_wind_speed, dtype=float),
+        np.ascontiguousarray(cp, dtype=float), float(nominal_power),
+        np.empty(len(v_wind_hub)))
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Memory-mapped (time x plant) matrix of feedin results.
+
+Collecting the results of many powerplants as pandas objects and
+concatenating them needs the memory of all results twice. A
+:class:`ResultMatrix` is preallocated on disk with one shared time index and
+one index of the powerplant ids. The results are written directly into the
+memory-mapped array, so they can be larger than the memory. Readers open the
+files with numpy memory mapping and do not need to parse anything.
+
+A matrix is a directory with the following files:
+
+* values.npy: the feedin as a (time x plant) float array in the numpy
+  format
+* index.npy: the time steps as nanoseconds since 1970-01-01 UTC (int64)
+* meta.json: the time zone, the powerplant ids and the memory order
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib import format as npformat
+
+
+class ResultMatrix:
+    r"""
+    Feedin of many powerplants in a memory-mapped (time x plant) array.
+
+    Use :py:func:`create <feedinlib.matrix.ResultMatrix.create>` to
+    preallocate a new matrix and the constructor to open an existing one.
+
+    Parameters
+    ----------
+    path : string
+        Directory of the matrix.
+    mode : string, optional
+        'r' to open the matrix read-only (default), 'r+' to write into it.
+
+    Attributes
+    ----------
+    values : numpy.memmap
+        The feedin (time x plant).
+    index : pandas.DatetimeIndex
+        The time steps.
+    plants : pandas.Index
+        The ids of the powerplants.
+
+    Examples
+    --------
+    >>> from feedinlib import chunked, matrix
+    >>> results = matrix.ResultMatrix.create(
+    ...     'results', index=my_weather.data.index,
+    ...     plants=plant_ids)  # doctest: +SKIP
+    >>> chunked.ChunkedFeedin(plants, weather).run(results)  # doctest: +SKIP
+    >>> feedin = matrix.ResultMatrix('results')['plant_1']  # doctest: +SKIP
+    """
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.values = np.load(os.path.join(path, 'values.npy'),
+                              mmap_mode=mode)
+        index = np.load(os.path.join(path, 'index.npy'), mmap_mode='r')
+        self.index = pd.DatetimeIndex(np.asarray(index).view('M8[ns]'))
+        if meta.get('timezone') is not None:
+            self.index = self.index.tz_localize('UTC').tz_convert(
+                meta['timezone'])
+        self.plants = pd.Index(meta['plants'])
+
+    @classmethod
+    def create(cls, path, index, plants, dtype='float64', order='C'):
+        r"""
+        Preallocate a matrix on disk.
+
+        All values are NaN until they are written.
+
+        Parameters
+        ----------
+        path : string
+            Directory of the matrix. It is created if it does not exist.
+        index : pandas.DatetimeIndex
+            The time steps of the results.
+        plants : list
+            The ids of the powerplants. The ids must be serializable by json
+            (strings or integers).
+        dtype : string or numpy.dtype, optional
+            Float type of the values (default: 'float64'). 'float32' halves
+            the size of the file.
+        order : string, optional
+            Memory order of the values, 'C' (default) to store the time
+            steps of all powerplants next to each other (fast writing of time
+            blocks) or 'F' to store the time series of each powerplant in one
+            piece (fast reading of single powerplants).
+
+        Returns
+        -------
+        ResultMatrix
+            Opened for writing.
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        index = pd.DatetimeIndex(index)
+        timezone = None if index.tz is None else str(index.tz)
+        nanoseconds = (index.tz_convert('UTC').tz_localize(None)
+                       if index.tz is not None else index).asi8
+        np.save(os.path.join(path, 'index.npy'), nanoseconds)
+        values = npformat.open_memmap(
+            os.path.join(path, 'values.npy'), mode='w+', dtype=dtype,
+            shape=(len(index), len(plants)), fortran_order=(order == 'F'))
+        values.fill(np.nan)
+        values.flush()
+        del values
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'timezone': timezone, 'order': order,
+                       'plants': [_json_id(plant) for plant in plants]}, f)
+        return cls(path, mode='r+')
+
+    def __len__(self):
+        return len(self.plants)
+
+    def __getitem__(self, plant_id):
+        return self.plant(plant_id)
+
+    def positions(self, plant_ids):
+        r"""
+        Columns of the given powerplants.
+
+        Raises
+        ------
+        KeyError
+            If a powerplant is not part of the matrix.
+        """
+        positions = self.plants.get_indexer(plant_ids)
+        if (positions < 0).any():
+            raise KeyError("Unknown powerplants: {0}".format(
+                list(np.asarray(plant_ids)[positions < 0])))
+        return positions
+
+    def rows(self, index):
+        r"""
+        Rows of the given time steps as a slice if they are consecutive,
+        otherwise as an array.
+        """
+        rows = self.index.get_indexer(index)
+        if (rows < 0).any():
+            raise KeyError("The time steps are not part of the matrix.")
+        if len(rows) and (np.diff(rows) == 1).all():
+            return slice(rows[0], rows[-1] + 1)
+        return rows
+
+    def plant(self, plant_id):
+        r"""
+        Feedin of one powerplant.
+
+        Returns
+        -------
+        pandas.Series
+            A view of the memory-mapped values without copying them.
+        """
+        position = self.positions([plant_id])[0]
+        return pd.Series(self.values[:, position], index=self.index,
+                         name=plant_id, copy=False)
+
+    def to_frame(self):
+        r"""
+        All results as a pandas.DataFrame referring to the memory-mapped
+        values.
+        """
+        return pd.DataFrame(self.values, index=self.index,
+                            columns=self.plants, copy=False)
+
+    def write(self, result):
+        r"""
+        Write a block of results.
+
+        Parameters
+        ----------
+        result : pandas.DataFrame
+            The feedin with time steps of the matrix as index and ids of
+            powerplants of the matrix as columns, e.g. a block of a chunked
+            run (see :py:func:`ChunkedFeedin.run
+            <feedinlib.chunked.ChunkedFeedin.run>`).
+        """
+        rows = self.rows(result.index)
+        columns = self.positions(result.columns)
+        if isinstance(rows, slice):
+            self.values[rows, columns] = result.values
+        else:
+            self.values[rows[:, None], columns] = result.values
+
+    def write_plant(self, plant_id, feedin):
+        r"""
+        Write the feedin (pandas.Series) of one powerplant.
+        """
+        rows = self.rows(feedin.index)
+        self.values[rows, self.positions([plant_id])[0]] = feedin.values
+
+    def flush(self):
+        r"""Write the changes to disk."""
+        if hasattr(self.values, 'flush'):
+            self.values.flush()
+
+    def close(self):
+        self.flush()
+
+
+def _json_id(plant_id):
+    # numpy scalars (e.g. ids of a PlantTable) are not serializable by json
+    if isinstance(plant_id, np.generic):
+        return plant_id.item()
+    return plant_id
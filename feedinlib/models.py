@@ -4,13 +4,35 @@
 """
 
 from abc import ABC, abstractmethod
+import collections
+import functools
+import hashlib
+import itertools
+import json
 import os
+import threading
+import warnings
 import numpy as np
 import pandas as pd
 import pvlib
 from windpowerlib import basicmodel as windmodel
 import requests
 
+from . import jit
+
+# Module records, wind turbine data and power curve tables by name. They are
+# filled on first use and can be prepared in advance (see
+# :mod:`feedinlib.snapshot`).
+MODULES = {}
+TURBINES = {}
+POWER_CURVE_TABLES = {}
+
+# Methods of PvlibBased for single steps of the pv pipeline. The feedin is
+# calculated with the stages of PV_STAGES, so they are deprecated and
+# overriding them has no effect on the feedin.
+DEPRECATED_PV_METHODS = ('angle_of_incidence', 'global_in_plane_irradiation',
+                         'pv_module_output')
+
 
 class Base(ABC):
     r""" The base class of feedinlib models.
@@ -21,8 +43,41 @@ class Base(ABC):
         Containing the names of the required parameters to use the model.
 
     """
+    # Time before and after a window of the weather data the model needs to
+    # calculate the feedin of the window (see powerplants.Base.feedin). The
+    # hourly mean position of the sun of PvlibBased is sampled within each
+    # time step, so the models of the feedinlib need no padding.
+    window_padding = pd.Timedelta(0)
+
     def __init__(self, **kwargs):
         self._required = kwargs.get("required")
+        self._settings = dict(kwargs)
+
+    @property
+    def settings(self):
+        """ The keyword arguments this model was created with.
+
+        They are part of the key of cached feedin time series (see
+        :mod:`feedinlib.cache`).
+        """
+        return self._settings
+
+    def feedin_with_metadata(self, **kwargs):
+        r""" The feedin time series together with meta data of the
+        powerplant determined while calculating it.
+
+        Models must not store the results of a feedin calculation in the
+        model object, so that one model instance can be shared by many
+        powerplants and used from several threads at once. Meta data needed
+        to scale the feedin (e.g. the peak power of a pv module) is returned
+        in a dictionary instead. By default the meta data is empty.
+
+        Returns
+        -------
+        tuple
+            The feedin (pandas.Series) and a dictionary with meta data.
+        """
+        return self.feedin(**kwargs), {}
 
     @property
     @abstractmethod
@@ -58,10 +113,29 @@ class PvlibBased(Base):
     ----------
     PvlibBased.required (list of strings, optional)
         List of required parameters of the model
-
+    transposition_model : string, optional
+        Model used to transpose the diffuse horizontal irradiation to the
+        module plane. Possible values are 'isotropic', 'klucher',
+        'haydavies', 'reindl', 'king' and 'perez' (default: 'perez'). The
+        value can be overwritten for a single call by passing
+        `transposition_model` to :py:func:`feedin
+        <feedinlib.models.PvlibBased.feedin>`.
+    backend : string, optional
+        'auto' (default), 'numba' or 'numpy'. With numba the feedin of the
+        Perez model is calculated in one compiled loop (see
+        :mod:`feedinlib.jit`), unless a subclass overrides
+        :py:func:`stage <feedinlib.models.PvlibBased.stage>` or
+        :py:func:`daylight <feedinlib.models.PvlibBased.daylight>`.
 
     Notes
     -----
+    The feedin and :py:func:`get_pv_power_output
+    <feedinlib.models.PvlibBased.get_pv_power_output>` are calculated with
+    the stages of the pv pipeline (see :py:func:`stage
+    <feedinlib.models.PvlibBased.stage>`). The methods for single steps
+    (angle_of_incidence, global_in_plane_irradiation and pv_module_output)
+    are deprecated and not part of this calculation.
+
     For more information about the photovoltaic model check the documentation
     of the pvlib library.
 
@@ -84,8 +158,18 @@ class PvlibBased(Base):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.area = None
-        self.peak = None
+        self.transposition_model = kwargs.get('transposition_model', 'perez')
+        self.backend = kwargs.get('backend', 'auto')
+        jit.use(self.backend)
+        overridden = [name for name in DEPRECATED_PV_METHODS
+                      if getattr(type(self), name) is not
+                      getattr(PvlibBased, name)]
+        if overridden:
+            warnings.warn(
+                "{0} overrides {1}, which are not used to calculate the "
+                "feedin. Override stage or daylight instead.".format(
+                    type(self).__name__, ', '.join(overridden)),
+                stacklevel=2)
 
     @property
     def required(self):
@@ -125,7 +209,142 @@ class PvlibBased(Base):
         pandas.Series
             A time series of the power output for the given pv module.
         """
-        return self.get_pv_power_output(**kwargs).p_mp
+        return self.feedin_with_metadata(**kwargs)[0]
+
+    def feedin_with_metadata(self, **kwargs):
+        r"""
+        Feedin time series and meta data of the given pv module.
+
+        Parameters
+        ----------
+        see :
+            :py:func:`turbine_power_output
+            <feedinlib.models.PvlibBased.get_pv_power_output>`
+
+        Returns
+        -------
+        tuple
+            The feedin (pandas.Series) and a dictionary with the peak power
+            (`peak`) and the area (`area`) of the module.
+        """
+        module_data = self.fetch_module_data(**kwargs)
+        kwargs['module_data'] = module_data
+        model = kwargs.get('transposition_model', self.transposition_model)
+        # The compiled loop does not call the methods of the pv pipeline
+        customized = any(getattr(type(self), name) is not
+                         getattr(PvlibBased, name)
+                         for name in ('stage', 'daylight'))
+        if model == 'perez' and jit.use(self.backend) and not customized:
+            feedin = self.compiled_power_output(**kwargs)
+        else:
+            feedin = self.staged_power_output(**kwargs)
+        return (feedin, {'peak': module_data.Impo * module_data.Vmpo,
+                         'area': module_data.Area})
+
+    def stage(self, name, **kwargs):
+        r"""
+        Result of a stage of the pv pipeline.
+
+        The stages and their dependencies are defined in `PV_STAGES`:
+
+        * daylight: weather columns of the rows with daylight
+        * aoi: angle of incidence (tilt, azimuth)
+        * sky_diffuse: sky diffuse irradiation in plane (tilt, azimuth,
+          transposition_model)
+        * ground_diffuse: diffuse irradiation from ground reflection in
+          plane (tilt, albedo)
+        * plane_of_array: poa_global, poa_direct and poa_diffuse
+        * cell_temperature: temp_cell and temp_module
+        * sapm: effective irradiance and output of the module (module_name)
+
+        Each result is memoized in the weather object with the parameters of
+        the stage and of the stages before as key (see
+        :py:func:`stage_parameters <feedinlib.models.stage_parameters>`).
+        If e.g. only the module of a powerplant changes, the irradiation in
+        plane is taken from the cache and only the stage sapm is calculated.
+
+        Parameters
+        ----------
+        name : string
+            Name of the stage.
+        weather : feedinlib.weather.FeedinWeather object
+        tilt, azimuth, albedo, module_name, transposition_model :
+            The parameters of the powerplant the stage depends on (see
+            :py:func:`required <feedinlib.models.PvlibBased.required>`).
+
+        Returns
+        -------
+        numpy.array or dictionary of numpy.arrays
+            Values of the rows with daylight. They must not be modified.
+        """
+        stage = PV_STAGES[name]
+        parameters = {
+            key: kwargs.get(key, self.transposition_model)
+            if key == 'transposition_model' else kwargs[key]
+            for key in stage_parameters(name)}
+        weather = kwargs['weather']
+
+        def calculate(*args):
+            inputs = {dependency: self.stage(dependency, **kwargs)
+                      for dependency in stage.dependencies}
+            return stage.function(self, weather, inputs, parameters)
+
+        key = 'PvlibBased.stage.{0}{1!r}'.format(name, tuple(
+            (key, float(value) if isinstance(value, (int, float)) else value)
+            for key, value in sorted(parameters.items())))
+        if not parameters:
+            return weather.derived(key, calculate)
+        return weather.derived('PvlibBased.stages',
+                               lambda w: StageCache()).get(key, calculate)
+
+    def staged_power_output(self, **kwargs):
+        r"""
+        Output of the given pv module calculated with the memoized stages of
+        the pv pipeline (see :py:func:`stage
+        <feedinlib.models.PvlibBased.stage>`).
+
+        Gives the same results as the column p_mp of
+        :py:func:`get_pv_power_output
+        <feedinlib.models.PvlibBased.get_pv_power_output>`.
+
+        Returns
+        -------
+        pandas.Series
+            Output of the module (p_mp).
+        """
+        mask = self.stage('daylight', **kwargs)['mask']
+        p_mp = np.zeros(len(mask))
+        p_mp[mask] = self.stage('sapm', **kwargs)['p_mp']
+        return pd.Series(p_mp, index=self.weather_columns(**kwargs).index,
+                         name='p_mp')
+
+    def compiled_power_output(self, **kwargs):
+        r"""
+        Output of the given pv module calculated in one compiled loop.
+
+        Gives the same results as the column p_mp of
+        :py:func:`get_pv_power_output
+        <feedinlib.models.PvlibBased.get_pv_power_output>` with the Perez
+        model up to rounding but without the intermediate columns. Needs
+        numba (see :mod:`feedinlib.jit`).
+
+        Returns
+        -------
+        pandas.Series
+            Output of the module (p_mp).
+        """
+        data = self.weather_columns(**kwargs)
+        module_data = kwargs.get('module_data')
+        if module_data is None:
+            module_data = self.fetch_module_data(**kwargs)
+        p_mp = jit.pv_power(
+            data['zenith'].values, data['azimuth'].values,
+            data['dhi'].values, data['dni'].values, data['ghi'].values,
+            data['dni_extra'].values, data['airmass'].values,
+            data['temp_air'].values, data['v_wind'].values,
+            tilt=kwargs['tilt'], azimuth=kwargs['azimuth'],
+            albedo=kwargs['albedo'], module=module_data)
+        return pd.Series(p_mp, index=data.index, name='p_mp')
 
     def solarposition_hourly_mean(self, location, data, **kwargs):
         r"""
@@ -165,17 +384,14 @@ class PvlibBased(Base):
         --------
         solarposition : calculates the position of the sun at a given time
         """
-        data_5min = pd.DataFrame(
-            index=pd.date_range(data.index[0],
-                                periods=data.shape[0]*12, freq='5Min',
-                                tz=kwargs['weather'].timezone))
-
-        data_5min = pvlib.solarposition.get_solarposition(
-            time=data_5min.index, latitude=location.latitude,
-            longitude=location.longitude, method='ephemeris')
-
+        index = data.index
+        if index.tz is None:
+            index = index.tz_localize(location.tz)
+        position = solar_position_kernel(
+            index.tz_convert('UTC').tz_localize(None).asi8,
+            location.latitude, location.longitude)
         return pd.concat(
-            [data, data_5min.clip_lower(0).resample('H').mean()],
+            [data, pd.DataFrame(position, index=data.index)],
             axis=1, join='inner')
 
     def solarposition(self, location, data, **kwargs):
@@ -234,6 +450,10 @@ class PvlibBased(Base):
         r"""
         Determine the angle of incidence using the pvlib aoi funktion. [4]_
 
+        .. deprecated:: 0.0.13
+            Not used to calculate the feedin, use :py:func:`stage
+            <feedinlib.models.PvlibBased.stage>` instead.
+
         Parameters
         ----------
         data : pandas.DataFrame
@@ -257,15 +477,21 @@ class PvlibBased(Base):
         .. [4] `pvlib angle of incidence <http://pvlib-python.readthedocs.org/
                 en/latest/pvlib.html#pvlib.irradiance.aoi>`_.
         """
+        warnings.warn("PvlibBased.angle_of_incidence is deprecated, use "
+                      "PvlibBased.stage instead.", DeprecationWarning,
+                      stacklevel=2)
         return pvlib.irradiance.aoi(
             solar_azimuth=data['azimuth'], solar_zenith=data['zenith'],
-            surface_tilt=self.powerplant.tilt,
-            surface_azimuth=self.powerplant.azimuth)
+            surface_tilt=kwargs['tilt'], surface_azimuth=kwargs['azimuth'])
 
     def global_in_plane_irradiation(self, data, **kwargs):
         r"""
         Determine the global irradiaton on the tilted surface.
 
+        .. deprecated:: 0.0.13
+            Not used to calculate the feedin, use :py:func:`stage
+            <feedinlib.models.PvlibBased.stage>` instead.
+
         This method determines the global irradiation in plane knowing
         the direct and diffuse irradiation, the incident angle and the
         orientation of the surface. The method uses the
@@ -284,6 +510,10 @@ class PvlibBased(Base):
             Azimuth angle of the pv module (south=180°).
         albedo : float
             Albedo factor around the module
+        transposition_model : string, optional
+            Model to determine the sky diffuse irradiation in plane (see
+            :py:func:`sky_diffuse <feedinlib.models.PvlibBased.sky_diffuse>`).
+            Defaults to the `transposition_model` of the model object.
 
         Returns
         -------
@@ -302,58 +532,195 @@ class PvlibBased(Base):
         --------
         solarposition_hourly_mean, solarposition, angle_of_incidenc
         """
-        # Determine the extraterrestrial radiation
-        data['dni_extra'] = pvlib.irradiance.extraradiation(
-            datetime_or_doy=data.index.dayofyear)
-
-        # Determine the relative air mass
-        data['airmass'] = pvlib.atmosphere.relativeairmass(data['zenith'])
-
-        # Determine direct normal irradiation
-        data['dni'] = (data['dirhi']) / np.sin(np.radians(90 - data['zenith']))
-
-        # what for??
-        data['dni'][data['zenith'] > 88] = data['dirhi']
-
-        # Determine the sky diffuse irradiation in plane
-        # with model of Perez (modell switch would be good)
-        data['poa_sky_diffuse'] = pvlib.irradiance.perez(
-            surface_tilt=self.powerplant.tilt,
-            surface_azimuth=self.powerplant.azimuth,
-            dhi=data['dhi'],
-            dni=data['dni'],
-            dni_extra=data['dni_extra'],
-            solar_zenith=data['zenith'],
-            solar_azimuth=data['azimuth'],
-            airmass=data['airmass'])
-
-        # Set NaN values to zero
-        data['poa_sky_diffuse'][
-            pd.isnull(data['poa_sky_diffuse'])] = 0
-
-        # Determine the diffuse irradiation from ground reflection in plane
-        data['poa_ground_diffuse'] = pvlib.irradiance.grounddiffuse(
-            ghi=data['dirhi'] + data['dhi'],
-            albedo=self.powerplant.albedo,
-            surface_tilt=self.powerplant.tilt)
-
-        # Determine total in-plane irradiance
-        data = pd.concat(
-            [data, pvlib.irradiance.globalinplane(
-                aoi=data['aoi'],
-                dni=data['dni'],
-                poa_sky_diffuse=data['poa_sky_diffuse'],
-                poa_ground_diffuse=data['poa_ground_diffuse'])],
-            axis=1, join='inner')
+        warnings.warn("PvlibBased.global_in_plane_irradiation is deprecated, "
+                      "use PvlibBased.stage instead.", DeprecationWarning,
+                      stacklevel=2)
+        # Determine dni_extra, airmass and dni if they are not provided
+        data = self.derived_columns(data)
+
+        poa = plane_of_array_kernel(
+            kwargs['tilt'], kwargs['azimuth'], kwargs['albedo'],
+            data['aoi'].values, data['dhi'].values, data['dni'].values,
+            data['ghi'].values, data['dni_extra'].values,
+            data['zenith'].values, data['azimuth'].values,
+            data['airmass'].values,
+            transposition_model=kwargs.get('transposition_model',
+                                           self.transposition_model))
+        for column in ('poa_sky_diffuse', 'poa_ground_diffuse', 'poa_global',
+                       'poa_direct', 'poa_diffuse'):
+            data[column] = poa[column]
+        return data
+
+    def derived_columns(self, data, **kwargs):
+        r"""
+        Add the columns that depend only on the weather data and the position
+        of the sun.
+
+        Columns that already exist are not calculated again.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Containing the time index of the location and columns with the
+            following timeseries: (dirhi, dhi, temp_air, zenith)
 
+        Returns
+        -------
+        pandas.DataFrame
+            The DataFrame contains the following new columns: dni_extra,
+            airmass, dni, ghi, temp_air_celsius
+
+        See Also
+        --------
+        weather_columns
+        """
+        missing = [column for column in ('dni_extra', 'airmass', 'dni', 'ghi')
+                   if column not in data]
+        if missing:
+            irradiation = irradiation_kernel(
+                data['zenith'].values, data['dirhi'].values,
+                data['dhi'].values, dayofyear=(
+                    data.index.dayofyear if 'dni_extra' in missing
+                    else None))
+            for column in missing:
+                data[column] = irradiation[column]
+
+        # Temperature in degree Celsius instead of Kelvin
+        if 'temp_air_celsius' not in data:
+            data['temp_air_celsius'] = data['temp_air'] - 273.15
         return data
 
+    def solar_geometry(self, **kwargs):
+        r"""
+        All columns that only depend on the time and the location.
+
+        The result is cached in the weather object (see
+        :py:func:`FeedinWeather.derived
+        <feedinlib.weather.FeedinWeather.derived>`).
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+
+        Returns
+        -------
+        pandas.DataFrame
+            Indexed by the time steps of the weather object (see
+            :py:attr:`FeedinWeather.times
+            <feedinlib.weather.FeedinWeather.times>`) containing the position
+            of the sun (hourly mean, zenith limited to 90°), dni_extra and
+            airmass. It must not be modified.
+        """
+        def calculate(weather):
+            # Create a location object
+            location = pvlib.location.Location(
+                weather.latitude, weather.longitude, weather.timezone)
+
+            # Determine the position of the sun
+            data = self.solarposition_hourly_mean(
+                location, pd.DataFrame(index=weather.times), **kwargs)
+
+            # A zenith angle greater than 90° means, that the sun is down.
+            data['zenith'] = np.minimum(data['zenith'].values, 90)
+
+            # Determine the extraterrestrial radiation and the air mass
+            irradiation = irradiation_kernel(
+                data['zenith'].values, 0, 0, dayofyear=data.index.dayofyear)
+            data['dni_extra'] = irradiation['dni_extra']
+            data['airmass'] = irradiation['airmass']
+            return data
+
+        return kwargs['weather'].derived('PvlibBased.solar_geometry',
+                                         calculate)
+
+    def weather_columns(self, **kwargs):
+        r"""
+        Weather data and all columns that do not depend on the pv module.
+
+        The result is cached in the weather object (see
+        :py:func:`FeedinWeather.derived
+        <feedinlib.weather.FeedinWeather.derived>`), so that all pv modules
+        using the same weather object share it.
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+
+        Returns
+        -------
+        pandas.DataFrame
+            The weather data with the columns of :py:func:`solar_geometry
+            <feedinlib.models.PvlibBased.solar_geometry>` and
+            :py:func:`derived_columns
+            <feedinlib.models.PvlibBased.derived_columns>`. It must not be
+            modified.
+        """
+        def calculate(weather):
+            geometry = weather.expand(self.solar_geometry(**kwargs))
+            data = pd.concat([weather.data, geometry], axis=1, join='inner')
+            return self.derived_columns(data)
+
+        return kwargs['weather'].derived('PvlibBased.weather_columns',
+                                         calculate)
+
+    def sky_diffuse(self, data, **kwargs):
+        r"""
+        Determine the sky diffuse irradiation on the tilted surface.
+
+        The diffuse horizontal irradiation is transposed to the module plane
+        using one of the sky diffuse models of pvlib.irradiance [7]_. The
+        models differ considerably in their computational costs. The isotropic
+        model is the cheapest one and is well suited for screening runs, the
+        Perez model is the most accurate and the most expensive one.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Containing the time index of the location and columns with the
+            following timeseries: (dirhi, dhi, ghi, dni, dni_extra, zenith,
+            azimuth, airmass)
+        tilt : float
+            Tilt angle of the pv module (horizontal=0°).
+        azimuth : float
+            Azimuth angle of the pv module (south=180°).
+        transposition_model : string, optional
+            One of 'isotropic', 'klucher', 'haydavies', 'reindl', 'king' or
+            'perez'. Defaults to the `transposition_model` of the model
+            object.
+
+        Returns
+        -------
+        pandas.Series
+            Sky diffuse irradiation in plane.
+
+        Raises
+        ------
+        ValueError
+            If the given transposition model is unknown.
+
+        References
+        ----------
+        .. [7] `pvlib irradiance <http://pvlib-python.readthedocs.org/en/
+                latest/pvlib.html#module-pvlib.irradiance>`_.
+
+        See Also
+        --------
+        global_in_plane_irradiation
+        """
+        return pd.Series(sky_diffuse_kernel(
+            kwargs.get('transposition_model', self.transposition_model),
+            kwargs['tilt'], kwargs['azimuth'], data['dhi'].values,
+            data['dni'].values, data['ghi'].values, data['dni_extra'].values,
+            data['zenith'].values, data['azimuth'].values,
+            data['airmass'].values), index=data.index)
+
     def fetch_module_data(self, lib='sandia-modules', **kwargs):
         r"""
         Fetch the module data from the Sandia Module library
 
         The file is saved in the ~/.oemof folder and loaded from there to save
-        time and to make it possible to work if the server is down.
+        time and to make it possible to work if the server is down. The data
+        of a module is read once per process and kept in `MODULES`.
 
         Parameters
         ----------
@@ -374,13 +741,21 @@ class PvlibBased(Base):
         >>> print(pvmodel.fetch_module_data(module_name=name).Area)
         1.7
 
+        Raises
+        ------
+        ValueError
+            If no module_name is given.
+
         See Also
         --------
         pv_module_output
         """
         if kwargs.get('module_name') is None:
-            kwargs['module_name'] = self.powerplant.module_name
-
+            raise ValueError(
+                "fetch_module_data needs the module_name, e.g. "
+                "fetch_module_data(module_name='Yingli_YL210__2008__E__').")
+        if kwargs['module_name'] in MODULES:
+            return MODULES[kwargs['module_name']]
         basic_path = os.path.join(os.path.expanduser("~"), '.oemof')
         url = 'https://sam.nrel.gov/sites/default/files/'
         filename = os.path.join(basic_path, 'sam-library-sandia-modules.csv')
@@ -396,20 +771,27 @@ class PvlibBased(Base):
         else:
             module_data = (pvlib.pvsystem.retrieve_sam(path=filename)
                            [kwargs['module_name']])
-            self.area = module_data.Area
-            self.peak = module_data.Impo * module_data.Vmpo
+            MODULES[kwargs['module_name']] = module_data
         return module_data
 
     def pv_module_output(self, data, **kwargs):
         r"""
         Determine the output of pv-system.
 
+        .. deprecated:: 0.0.13
+            Not used to calculate the feedin, use :py:func:`stage
+            <feedinlib.models.PvlibBased.stage>` instead.
+
         Using the pvlib.pvsystem.sapm function of the pvlib [8]_.
 
         Parameters
         ----------
         module_name : string
             Name of a pv module from the sam.nrel database [9]_.
+        module_data : pandas.Series, optional
+            Module data as returned by :py:func:`fetch_module_data
+            <feedinlib.models.PvlibBased.fetch_module_data>`. It is fetched
+            if not given.
         data : pandas.DataFrame
             Containing the time index of the location and columns with the
             following timeseries: (temp_air [K], v_wind, poa_global,
@@ -438,31 +820,24 @@ class PvlibBased(Base):
         --------
         global_in_plane_irradiation
         """
-        # Determine module and cell temperature
-        data['temp_air_celsius'] = data['temp_air'] - 273.15
-        data = pd.concat([data, pvlib.pvsystem.sapm_celltemp(
-            poa_global=data['poa_global'],
-            wind_speed=data['v_wind'],
-            temp_air=data['temp_air_celsius'],
-            model='Open_rack_cell_polymerback')], axis=1, join='inner')
+        warnings.warn("PvlibBased.pv_module_output is deprecated, use "
+                      "PvlibBased.stage instead.", DeprecationWarning,
+                      stacklevel=2)
+        data = self.derived_columns(data)
 
         # Retrieve the module data object
-        module_data = self.fetch_module_data(**kwargs)
-
-        data['effective_irradiance'] = pvlib.pvsystem.sapm_effective_irradiance(
-            poa_direct=data['poa_direct'], poa_diffuse=data['poa_diffuse'],
-            airmass_absolute=data['airmass'], aoi=data['aoi'],
-            module=module_data)
-
-        # Apply the Sandia PV Array Performance Model (SAPM) to get a
-        data = pd.concat([data, pvlib.pvsystem.sapm(
-            effective_irradiance=data['effective_irradiance'],
-            temp_cell=data['temp_cell'],
-            module=module_data)], axis=1, join='inner')
-
-        # Set NaN values to zero
-        data['p_mp'][
-            pd.isnull(data['p_mp'])] = 0
+        module_data = kwargs.get('module_data')
+        if module_data is None:
+            module_data = self.fetch_module_data(**kwargs)
+
+        # Apply the Sandia PV Array Performance Model (SAPM)
+        result = sapm_kernel(
+            data['poa_global'].values, data['poa_direct'].values,
+            data['poa_diffuse'].values, data['aoi'].values,
+            data['airmass'].values, data['temp_air'].values,
+            data['v_wind'].values, module_data)
+        for column, values in result.items():
+            data[column] = values
         return data
 
     def get_pv_power_output(self, **kwargs):
@@ -482,12 +857,22 @@ class PvlibBased(Base):
         See :py:func:`method required <feedinlib.models.PvlibBased.required>`
         for all required parameters of this model.
 
+        The columns are the results of the stages of the pv pipeline (see
+        :py:func:`stage <feedinlib.models.PvlibBased.stage>`), the same
+        calculation as :py:func:`feedin <feedinlib.models.PvlibBased.feedin>`.
+        They are only determined for rows with daylight (see
+        :py:func:`daylight <feedinlib.models.PvlibBased.daylight>`). All
+        other rows are set to zero.
 
         Returns
         -------
         pandas.DataFrame
-            The DataFrame contains the following new columns: p_pv_norm,
-            p_pv_norm_area and all timeseries calculated before.
+            The weather columns (see :py:func:`weather_columns
+            <feedinlib.models.PvlibBased.weather_columns>`) and the new
+            columns aoi, poa_sky_diffuse, poa_ground_diffuse, poa_global,
+            poa_direct, poa_diffuse, temp_cell, temp_module,
+            effective_irradiance and the results of `pvlib.pvsystem.sapm`
+            (e.g. p_mp).
 
         References
         ----------
@@ -498,31 +883,225 @@ class PvlibBased(Base):
 
         See Also
         --------
-        pv_module_output, feedin
+        stage, feedin
         """
-        data = kwargs['weather'].data
+        # The columns that do not depend on the pv module and the stages of
+        # the pv pipeline, calculated for the rows with daylight only
+        data = self.weather_columns(**kwargs)
+        mask = self.stage('daylight', **kwargs)['mask']
+        day = collections.OrderedDict([
+            ('aoi', self.stage('aoi', **kwargs)),
+            ('poa_sky_diffuse', self.stage('sky_diffuse', **kwargs)),
+            ('poa_ground_diffuse', self.stage('ground_diffuse', **kwargs))])
+        for name in ('plane_of_array', 'cell_temperature', 'sapm'):
+            day.update(self.stage(name, **kwargs))
+
+        # Scatter the results back and set all rows without daylight to zero
+        columns = collections.OrderedDict()
+        for column, values in day.items():
+            columns[column] = np.zeros(len(mask))
+            columns[column][mask] = values
+        return pd.concat(
+            [data, pd.DataFrame(columns, index=data.index).fillna(0)], axis=1)
+
+    def daylight(self, data):
+        r"""
+        Rows that can have an output.
 
-        # Create a location object
-        location = pvlib.location.Location(kwargs['weather'].latitude,
-                                           kwargs['weather'].longitude,
-                                           kwargs['weather'].timezone)
+        These are the rows with the sun above the horizon. Rows with
+        irradiation in the weather data set are kept as well to not change
+        the results.
 
-        # Determine the position of the sun
-        data = self.solarposition_hourly_mean(location, data, **kwargs)
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Containing the columns zenith and ghi (see
+            :py:func:`weather_columns
+            <feedinlib.models.PvlibBased.weather_columns>`).
 
-        # A zenith angle greater than 90° means, that the sun is down.
-        data['zenith'][data['zenith'] > 90] = 90
+        Returns
+        -------
+        pandas.Series
+            True for the rows with daylight.
+        """
+        return (data['zenith'] < 90) | (data['ghi'] > 0)
 
-        # Determine the angle of incidence
-        data['aoi'] = self.angle_of_incidence(data, **kwargs)
+    def orientation_sweep(self, weather, tilt, azimuth, albedo=0.2,
+                          **kwargs):
+        r"""
+        Output of a pv module for a grid of orientations.
 
-        # Determine the irradiation in plane
-        data = self.global_in_plane_irradiation(data, **kwargs)
+        All combinations of the given tilt, azimuth and albedo values are
+        calculated for one weather object. The position of the sun and the
+        other columns that do not depend on the orientation are determined
+        once. The grid points are stacked and calculated in blocks with one
+        call of each pvlib function per block.
 
-        # Determine the output of the pv module
-        data = self.pv_module_output(data, **kwargs)
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+        tilt : float or list of floats
+            Tilt angles of the pv module (horizontal=0°).
+        azimuth : float or list of floats
+            Azimuth angles of the pv module (south=180°).
+        albedo : float or list of floats, optional
+            Albedo factors around the module (default: 0.2).
+        module_name : string
+            Name of a pv module from the sam.nrel database [9]_.
+        transposition_model : string, optional
+            See :py:func:`sky_diffuse
+            <feedinlib.models.PvlibBased.sky_diffuse>`.
+        full : boolean, optional
+            Return the time series of all grid points as well (default:
+            False).
+        block_size : int, optional
+            Number of grid points calculated at once (default: 50). Larger
+            blocks are faster but need more memory.
 
-        return data
+        Returns
+        -------
+        pandas.DataFrame or tuple
+            One row per grid point with the columns tilt, azimuth, albedo,
+            energy (sum of the output of one module over the weather period
+            [Wh] for hourly data) and specific_yield (energy per peak power
+            [Wh/Wp], which are the full load hours). If `full` is True a tuple
+            of this DataFrame and a DataFrame with the output of one module
+            [W] (time x grid point) is returned.
+
+        Examples
+        --------
+        >>> from feedinlib import models
+        >>> pv_model = models.PvlibBased()
+        >>> sweep = pv_model.orientation_sweep(
+        ...     my_weather, tilt=range(0, 91, 5), azimuth=range(90, 271, 10),
+        ...     module_name='Yingli_YL210__2008__E__')  # doctest: +SKIP
+        >>> best = sweep.loc[sweep.energy.idxmax()]  # doctest: +SKIP
+
+        See Also
+        --------
+        get_pv_power_output
+        """
+        grid = pd.MultiIndex.from_product(
+            [np.atleast_1d(tilt), np.atleast_1d(azimuth),
+             np.atleast_1d(albedo)],
+            names=['tilt', 'azimuth', 'albedo']).to_frame(index=False)
+        module_data = kwargs.get('module_data')
+        if module_data is None:
+            module_data = self.fetch_module_data(**kwargs)
+        block_size = kwargs.get('block_size', 50)
+
+        # Orientation independent columns, shared by all grid points
+        data = self.weather_columns(weather=weather, **kwargs)
+        daylight = np.asarray(self.daylight(data))
+        day = data[daylight].reset_index(drop=True)
+        n_day = len(day)
+
+        energy = np.zeros(len(grid))
+        series = None
+        if kwargs.get('full'):
+            series = np.zeros((len(data), len(grid)))
+        for first in range(0, len(grid), block_size):
+            block = grid.iloc[first:first + block_size]
+            # One row per time step with daylight and grid point of the block
+            rows = day.iloc[np.tile(np.arange(n_day), len(block))]
+            rows = rows.reset_index(drop=True)
+            orientation = {
+                name: np.repeat(block[name].values, n_day)
+                for name in ('tilt', 'azimuth', 'albedo')}
+            aoi = np.asarray(pvlib.irradiance.aoi(
+                solar_azimuth=rows['azimuth'].values,
+                solar_zenith=rows['zenith'].values,
+                surface_tilt=orientation['tilt'],
+                surface_azimuth=orientation['azimuth']), dtype=float)
+            poa = plane_of_array_kernel(
+                orientation['tilt'], orientation['azimuth'],
+                orientation['albedo'], aoi, rows['dhi'].values,
+                rows['dni'].values, rows['ghi'].values,
+                rows['dni_extra'].values, rows['zenith'].values,
+                rows['azimuth'].values, rows['airmass'].values,
+                transposition_model=kwargs.get('transposition_model',
+                                               self.transposition_model))
+            p_mp = sapm_kernel(
+                poa['poa_global'], poa['poa_direct'], poa['poa_diffuse'],
+                aoi, rows['airmass'].values, rows['temp_air'].values,
+                rows['v_wind'].values, module_data)['p_mp']
+            p_mp = p_mp.reshape(len(block), n_day)
+            energy[first:first + len(block)] = p_mp.sum(axis=1)
+            if series is not None:
+                series[daylight, first:first + len(block)] = p_mp.T
+
+        peak = module_data.Impo * module_data.Vmpo
+        result = grid.assign(energy=energy, specific_yield=energy / peak)
+        if series is not None:
+            return result, pd.DataFrame(series, index=data.index)
+        return result
+
+    def fleet_feedin_with_metadata(self, weather, plants, **kwargs):
+        r"""
+        Output of many pv modules with different orientations and module
+        types on one weather object.
+
+        The irradiation in plane and the cell temperature are taken from
+        the memoized stages of each orientation (see :py:func:`stage
+        <feedinlib.models.PvlibBased.stage>`). The coefficients of all
+        modules are stacked into one (module x coefficient) matrix (see
+        :py:func:`sapm_matrix <feedinlib.models.sapm_matrix>`) and the
+        effective irradiance and the SAPM are evaluated for all powerplants
+        at once by broadcasting (see :py:func:`sapm_matrix_kernel
+        <feedinlib.models.sapm_matrix_kernel>`) or in one compiled loop with
+        numba (see :mod:`feedinlib.jit`).
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+        plants : list of dictionaries
+            The parameters tilt, azimuth, albedo and module_name (see
+            :py:func:`required <feedinlib.models.PvlibBased.required>`) and
+            optionally transposition_model of each powerplant.
+        block_size : int, optional
+            Number of powerplants calculated at once (default: 500). Larger
+            blocks are faster but need more memory.
+
+        Returns
+        -------
+        tuple
+            The feedin (numpy.array, time x powerplant), the time index and
+            a list with the meta data of each powerplant (see
+            :py:func:`feedin_with_metadata
+            <feedinlib.models.PvlibBased.feedin_with_metadata>`).
+        """
+        block_size = kwargs.get('block_size', 500)
+        day = self.stage('daylight', weather=weather)
+        mask = day['mask']
+        index = self.weather_columns(weather=weather).index
+        names = [plant['module_name'] for plant in plants]
+        modules = {name: self.fetch_module_data(module_name=name)
+                   for name in set(names)}
+        metadata = {name: {'peak': module.Impo * module.Vmpo,
+                           'area': module.Area}
+                    for name, module in modules.items()}
+        # One row of coefficients per module type
+        rows = dict(zip(modules, sapm_matrix(list(modules.values()))))
+        kernel = (jit.sapm_matrix if jit.use(self.backend) else
+                  lambda *args: sapm_matrix_kernel(*args)['p_mp'])
+        values = np.zeros((len(mask), len(plants)))
+        airmass = day['airmass'][:, None]
+        for first in range(0, len(plants), block_size):
+            block = plants[first:first + block_size]
+            stages = [dict(plant, weather=weather) for plant in block]
+            poa = [self.stage('plane_of_array', **plant) for plant in stages]
+            values[mask, first:first + len(block)] = kernel(
+                np.column_stack([p['poa_direct'] for p in poa]),
+                np.column_stack([p['poa_diffuse'] for p in poa]),
+                np.column_stack([self.stage('aoi', **plant)
+                                 for plant in stages]),
+                airmass,
+                np.column_stack([
+                    self.stage('cell_temperature', **plant)['temp_cell']
+                    for plant in stages]),
+                np.array([rows[name] for name in
+                          names[first:first + len(block)]]))
+        return values, index, [metadata[name] for name in names]
 
 
 class SimpleWindTurbine(Base):
@@ -532,6 +1111,16 @@ class SimpleWindTurbine(Base):
     ----------
     required : list of strings
         Containing the names of the required parameters to use the model.
+    power_curve_step : float, optional
+        Resolution of the wind speed in m/s (e.g. 0.01). If given, the power
+        coefficient is taken from a :class:`PowerCurveTable
+        <feedinlib.models.PowerCurveTable>` with this resolution instead of
+        interpolating the power curve. By default the power curve is
+        interpolated.
+    backend : string, optional
+        'auto' (default), 'numba' or 'numpy'. With numba the interpolated
+        power curve is evaluated in one compiled loop (see
+        :mod:`feedinlib.jit`).
 
     Examples
     --------
@@ -547,7 +1136,9 @@ class SimpleWindTurbine(Base):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.nominal_power_wind_turbine = None
+        self.power_curve_step = kwargs.get('power_curve_step')
+        self.backend = kwargs.get('backend', 'auto')
+        jit.use(self.backend)
 
     @property
     def required(self):
@@ -573,13 +1164,1414 @@ class SimpleWindTurbine(Base):
         Alias for :py:func:`turbine_power_output
         <feedinlib.models.SimpleWindTurbine.turbine_power_output>`.
         """
-        my_turbine = windmodel.SimpleWindTurbine(
-            wind_conv_type=kwargs.pop('wind_conv_type'),
-            h_hub=kwargs.pop('h_hub'), d_rotor=kwargs.pop('d_rotor'))
-        self.nominal_power_wind_turbine = my_turbine.nominal_power
-        return my_turbine.turbine_power_output(
-            weather=kwargs['weather'].data,
-            data_height=kwargs['weather'].data_height)
+        return self.feedin_with_metadata(**kwargs)[0]
+
+    def feedin_with_metadata(self, **kwargs):
+        r"""
+        Feedin time series and meta data of the given wind turbine.
+
+        Returns
+        -------
+        tuple
+            The feedin (pandas.Series) and a dictionary with the nominal
+            power of the wind turbine (`nominal_power`).
+        """
+        if self.power_curve_step is not None:
+            table = power_curve_table(kwargs['wind_conv_type'],
+                                      self.power_curve_step)
+            cp_values = functools.partial(
+                table.cp, wind_conv_type=kwargs['wind_conv_type'])
+            nominal_power = table.nominal_power[kwargs['wind_conv_type']]
+        else:
+            cp_values, nominal_power = turbine_data(kwargs['wind_conv_type'])
+        return (self.turbine_power_output(
+                    weather=kwargs['weather'], h_hub=kwargs['h_hub'],
+                    d_rotor=kwargs['d_rotor'], cp_values=cp_values,
+                    nominal_power=nominal_power),
+                {'nominal_power': nominal_power})
+
+    def rho_hub(self, weather, h_hub):
+        r"""
+        Density of the air at hub height [kg/m³].
+
+        Uses the equation of the windpowerlib
+        (:py:func:`windpowerlib.basicmodel.SimpleWindTurbine.rho_hub`). The
+        result is cached in the weather object for each hub height (see
+        :py:func:`FeedinWeather.derived
+        <feedinlib.weather.FeedinWeather.derived>`).
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+            Containing the timeseries temp_air [K] and pressure [Pa] and their
+            heights in the data_height attribute.
+        h_hub : float
+            Height of the hub of the wind turbine [m].
+
+        Returns
+        -------
+        pandas.Series
+        """
+        def calculate(weather):
+            return pd.Series(rho_hub_kernel(
+                weather.data.temp_air.values, weather.data.pressure.values,
+                h_hub, weather.data_height['temp_air'],
+                weather.data_height['pressure']), index=weather.data.index)
+
+        return weather.derived(
+            'SimpleWindTurbine.rho_hub({0!r})'.format(float(h_hub)),
+            calculate)
+
+    def v_wind_hub(self, weather, h_hub):
+        r"""
+        Wind speed at hub height [m/s].
+
+        Uses the logarithmic wind profile of the windpowerlib
+        (:py:func:`windpowerlib.basicmodel.SimpleWindTurbine.v_wind_hub`). The
+        result is cached in the weather object for each hub height (see
+        :py:func:`FeedinWeather.derived
+        <feedinlib.weather.FeedinWeather.derived>`).
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+            Containing the timeseries v_wind [m/s] and z0 [m] and the height
+            of the wind speed in the data_height attribute.
+        h_hub : float
+            Height of the hub of the wind turbine [m].
+
+        Returns
+        -------
+        pandas.Series
+        """
+        def calculate(weather):
+            return pd.Series(v_wind_hub_kernel(
+                weather.data.v_wind.values, weather.data.z0.values, h_hub,
+                weather.data_height['v_wind']), index=weather.data.index)
+
+        return weather.derived(
+            'SimpleWindTurbine.v_wind_hub({0!r})'.format(float(h_hub)),
+            calculate)
+
+    def turbine_power_output(self, weather, h_hub, d_rotor, cp_values,
+                             nominal_power):
+        r"""
+        Output of the wind turbine [W].
+
+        Gives the same results as the turbine_power_output method of
+        :py:class:`windpowerlib.basicmodel.SimpleWindTurbine` but shares the
+        density and the wind speed at hub height between all wind turbines
+        with the same hub height and weather object.
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+        h_hub : float
+            Height of the hub of the wind turbine [m].
+        d_rotor : float
+            Diameter of the rotor [m].
+        cp_values : pandas.DataFrame or callable
+            Power coefficient (column cp) with the wind speed as index or a
+            function returning the power coefficient of an array of wind
+            speeds (e.g. :py:func:`PowerCurveTable.cp
+            <feedinlib.models.PowerCurveTable.cp>`).
+        nominal_power : float
+            Nominal power of the wind turbine [W].
+
+        Returns
+        -------
+        pandas.Series
+            Electrical power of the wind turbine.
+        """
+        v_wind = self.v_wind_hub(weather, h_hub).values
+        rho = self.rho_hub(weather, h_hub).values
+        if callable(cp_values):
+            p_wpp = wind_power_kernel(v_wind, rho, d_rotor,
+                                      cp_values(v_wind), nominal_power)
+        elif jit.use(self.backend):
+            p_wpp = jit.wind_power(v_wind, rho, d_rotor, cp_values.index,
+                                   cp_values.cp, nominal_power)
+        else:
+            # The cached wind speed must not be modified
+            cp = np.interp(np.minimum(v_wind, cp_values.index.max()),
+                           cp_values.index, cp_values.cp)
+            p_wpp = wind_power_kernel(v_wind, rho, d_rotor, cp,
+                                      nominal_power)
+
+        p_wpp_series = pd.Series(data=p_wpp, index=weather.data.index,
+                                 name='feedin_wind_pp')
+        if p_wpp_series.index.nlevels == 1:
+            p_wpp_series.index.names = ['']
+        return p_wpp_series
+
+
+class PowerCurveTable:
+    r"""Power coefficient curves of wind turbines on a uniform wind speed grid.
+
+    The power curves of the wind turbine types are sampled once on a grid
+    with a constant wind speed step. The power coefficient of a wind speed is
+    then the value of the nearest grid point, which is found by array
+    indexing instead of a search in the irregular power curve. Many wind
+    turbine types can be evaluated in one gather operation.
+
+    Parameters
+    ----------
+    cp_values : dictionary
+        The names of the wind turbine types as keys and the power
+        coefficients (pandas.DataFrame with the column cp and the wind speed
+        as index, see
+        :py:func:`windpowerlib.basicmodel.SimpleWindTurbine.fetch_wpp_data`)
+        as values.
+    step : float, optional
+        Resolution of the wind speed grid in m/s (default: 0.01).
+    nominal_power : dictionary, optional
+        The nominal power of the wind turbine types [W].
+
+    Attributes
+    ----------
+    error_bound : dictionary
+        Upper limit of the absolute difference between the power coefficient
+        of the table and the linear interpolation of the power curve for each
+        wind turbine type.
+
+    Notes
+    -----
+    Wind speeds are rounded to the nearest grid point, so they differ by at
+    most half a step from the grid point. The power curve is linear between
+    its points, so the error of the power coefficient is limited by
+
+    .. math:: \Delta c_p \le \frac{\Delta v}{2} \cdot
+        \max_i\left|\frac{c_{p,i+1}-c_{p,i}}{v_{i+1}-v_i}\right|
+
+    with the step :math:`\Delta v` and the points :math:`(v_i, c_{p,i})` of
+    the power curve. The error of the power is the error of the power
+    coefficient multiplied by :math:`\rho/2 \cdot A \cdot v^3`. With a
+    step of 0.01 m/s the error bound of all power curves of the windpowerlib
+    is about 0.002. If the points of the power curve lie on the grid, the
+    values at the grid points are exact.
+
+    Wind speeds above the last point of a power curve use the power
+    coefficient of the last point, like the interpolation of the
+    windpowerlib. Negative wind speeds use the first point.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from feedinlib import models
+    >>> table = models.PowerCurveTable.from_types(
+    ...     ['ENERCON E 126 7500', 'ENERCON E 82 2000'], step=0.01)
+    >>> table.cp(np.array([3., 8.]), 'ENERCON E 126 7500').tolist()
+    [0.191, 0.478]
+    >>> fleet = np.array(['ENERCON E 126 7500', 'ENERCON E 82 2000'])
+    >>> table.cp(np.array([[8.], [9.]]), fleet).shape
+    (2, 2)
+    """
+
+    def __init__(self, cp_values, step=0.01, nominal_power=None):
+        self.step = float(step)
+        self.names = list(cp_values)
+        self.nominal_power = dict(nominal_power or {})
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self.v_max = max(float(cp.index.max()) for cp in cp_values.values())
+        grid = np.arange(int(np.ceil(self.v_max / self.step)) + 1) * self.step
+        self.table = np.empty((len(self.names), len(grid)))
+        self.error_bound = {}
+        for i, name in enumerate(self.names):
+            v_wind = np.asarray(cp_values[name].index, dtype=float)
+            cp = np.asarray(cp_values[name].cp, dtype=float)
+            self.table[i] = np.interp(np.minimum(grid, v_wind.max()),
+                                      v_wind, cp)
+            slope = np.abs(np.diff(cp) / np.diff(v_wind)) if len(cp) > 1 else 0
+            self.error_bound[name] = float(np.max(slope)) * self.step / 2
+
+    @classmethod
+    def from_types(cls, wind_conv_types, step=0.01):
+        r"""
+        Table of the power curves of the windpowerlib.
+
+        Parameters
+        ----------
+        wind_conv_types : list of strings
+            Names of the wind turbine types (see
+            :py:func:`windpowerlib.basicmodel.get_wind_pp_types`).
+        step : float, optional
+            Resolution of the wind speed grid in m/s (default: 0.01).
+
+        Returns
+        -------
+        PowerCurveTable
+        """
+        cp_values = {}
+        nominal_power = {}
+        for name in wind_conv_types:
+            cp_values[name], nominal_power[name] = turbine_data(name)
+        return cls(cp_values, step=step, nominal_power=nominal_power)
+
+    def positions(self, wind_conv_type):
+        r"""Rows of the given wind turbine types (scalar or array) in the
+        table."""
+        if np.ndim(wind_conv_type) == 0:
+            return self._positions[wind_conv_type]
+        return np.array([self._positions[name] for name in
+                         np.asarray(wind_conv_type).ravel()],
+                        dtype=int).reshape(np.shape(wind_conv_type))
+
+    def cp(self, v_wind, wind_conv_type):
+        r"""
+        Power coefficient of the given wind speeds.
+
+        Parameters
+        ----------
+        v_wind : numpy.array
+            Wind speed at hub height [m/s].
+        wind_conv_type : string or array of strings
+            Wind turbine type(s). Arrays are broadcast against the wind
+            speeds, e.g. wind speeds of shape (time, 1) and types of shape
+            (turbines,) give the power coefficients of shape (time, turbines).
+
+        Returns
+        -------
+        numpy.array
+            Power coefficients, NaN for missing wind speeds.
+        """
+        v_wind = np.asarray(v_wind, dtype=float)
+        index = np.rint(np.clip(v_wind, 0, self.v_max) / self.step)
+        missing = np.isnan(index)
+        has_missing = missing.any()
+        if has_missing:
+            index[missing] = 0
+        cp = self.table[self.positions(wind_conv_type), index.astype(int)]
+        if has_missing:
+            cp = np.where(missing, np.nan, cp)
+        return cp
+
+
+def turbine_data(wind_conv_type):
+    r"""
+    Power coefficients and nominal power of a wind turbine type of the
+    windpowerlib.
+
+    The data of a type is read once per process and kept in `TURBINES`.
+
+    Returns
+    -------
+    tuple
+        The power coefficients (pandas.DataFrame with the column cp and the
+        wind speed as index) and the nominal power [W].
+    """
+    if wind_conv_type not in TURBINES:
+        turbine = windmodel.SimpleWindTurbine(wind_conv_type=wind_conv_type)
+        TURBINES[wind_conv_type] = (turbine.cp_values, turbine.nominal_power)
+    return TURBINES[wind_conv_type]
+
+
+def power_curve_table(wind_conv_type, step):
+    r"""
+    Cached :class:`PowerCurveTable <feedinlib.models.PowerCurveTable>` of a
+    single wind turbine type of the windpowerlib (kept in
+    `POWER_CURVE_TABLES`).
+    """
+    key = (wind_conv_type, float(step))
+    if key not in POWER_CURVE_TABLES:
+        POWER_CURVE_TABLES[key] = PowerCurveTable.from_types(
+            [wind_conv_type], step=step)
+    return POWER_CURVE_TABLES[key]
+
+
+def pv_surrogate_features(tilt, azimuth, albedo):
+    r"""
+    Features of the orientation of a pv module for :class:`Surrogate`.
+
+    The direct irradiation in plane is linear in the first three features
+    (the components of the normal vector of the module), the reflection from
+    the ground in the last one.
+
+    Returns
+    -------
+    numpy.array
+        cos(tilt), sin(tilt) * cos(azimuth), sin(tilt) * sin(azimuth) and
+        albedo * (1 - cos(tilt)) as columns.
+    """
+    tilt = np.radians(np.asarray(tilt, dtype=float))
+    azimuth = np.radians(np.asarray(azimuth, dtype=float))
+    return np.column_stack([
+        np.cos(tilt), np.sin(tilt) * np.cos(azimuth),
+        np.sin(tilt) * np.sin(azimuth),
+        np.asarray(albedo, dtype=float) * (1 - np.cos(tilt))])
+
+
+def wind_surrogate_features(h_hub, d_rotor):
+    r"""
+    Features of a wind turbine for :class:`Surrogate`: the logarithm of the
+    hub height (the wind speed at hub height is linear in it) and the rotor
+    diameter, both relative to 100 m.
+    """
+    return np.column_stack([
+        np.log(np.asarray(h_hub, dtype=float) / 100.),
+        np.asarray(d_rotor, dtype=float) / 100.])
+
+
+# Varied parameters, fixed parameters and features of the surrogates of the
+# models of the feedinlib
+SURROGATES = {
+    'PvlibBased': (('tilt', 'azimuth', 'albedo'), ('module_name',),
+                   pv_surrogate_features),
+    'SimpleWindTurbine': (('h_hub', 'd_rotor'), ('wind_conv_type',),
+                          wind_surrogate_features),
+}
+
+
+def _weather_fingerprint(weather):
+    # One hash of the weather data per time step, memoized in the weather
+    def calculate(weather):
+        data = weather.data
+        return pd.util.hash_pandas_object(
+            data[sorted(data.columns)], index=True).values
+
+    return weather.derived('Surrogate.fingerprint', calculate)
+
+
+def _weather_location(weather):
+    return [None if value is None else float(value)
+            for value in (weather.latitude, weather.longitude)]
+
+
+def _monomials(features, degree):
+    # All products of up to `degree` features, starting with the constant
+    n_samples, n_features = features.shape
+    columns = [np.ones(n_samples)]
+    for order in range(1, degree + 1):
+        for combination in itertools.combinations_with_replacement(
+                range(n_features), order):
+            columns.append(np.prod(features[:, combination], axis=1))
+    return np.column_stack(columns)
+
+
+class Surrogate(Base):
+    r"""Fast approximation of a feedin model for screening runs.
+
+    The surrogate is fitted offline per weather cell and technology (the
+    fixed parameters, e.g. the pv module or the wind turbine type) on the
+    output of a reference model. For each time step the output is a
+    polynomial of low degree of some features of the varied parameters (see
+    :py:func:`pv_surrogate_features
+    <feedinlib.models.pv_surrogate_features>` and
+    :py:func:`wind_surrogate_features
+    <feedinlib.models.wind_surrogate_features>`). The coefficients are fitted
+    by least squares on the output of the reference model for random
+    parameters within given ranges. The feedin of a powerplant is then one
+    product of a (time x coefficient) matrix with the features of the
+    powerplant, and the feedin of a whole plant table one matrix product
+    (see :py:func:`fleet_feedin_with_metadata
+    <feedinlib.models.Surrogate.fleet_feedin_with_metadata>`).
+
+    The surrogate only knows the time steps of the weather it was fitted on
+    and does not extrapolate beyond the ranges of the parameters. The fits
+    are selected by the name of the weather object, and the data (one hash
+    per time step) and the location must match the fitted weather, so
+    windows of it can be evaluated but other weather with the same name is
+    rejected. Its error against the reference model is determined on
+    independent validation samples when it is fitted (see
+    :py:func:`validation_error <feedinlib.models.Surrogate.validation_error>`).
+
+    Parameters
+    ----------
+    reference : Base object, optional
+        The model to approximate (default: PvlibBased()).
+    parameters : list of strings, optional
+        The varied parameters (default for PvlibBased: tilt, azimuth,
+        albedo; for SimpleWindTurbine: h_hub, d_rotor).
+    features : callable, optional
+        Function of the varied parameters (arrays, in the order of
+        `parameters`) returning the (sample x feature) array the polynomial
+        is built from.
+    degree : int, optional
+        Degree of the polynomial (default: 2).
+
+    Examples
+    --------
+    >>> from feedinlib import models
+    >>> surrogate = models.Surrogate(models.PvlibBased())
+    >>> surrogate.fit(
+    ...     my_weather, {'tilt': (0, 60), 'azimuth': (90, 270),
+    ...                  'albedo': (0.1, 0.3)},
+    ...     module_name='Yingli_YL210__2008__E__')  # doctest: +SKIP
+    >>> surrogate.validation_error()  # doctest: +SKIP
+    >>> feedin = surrogate.feedin(
+    ...     weather=my_weather, tilt=30, azimuth=180, albedo=0.2,
+    ...     module_name='Yingli_YL210__2008__E__')  # doctest: +SKIP
+
+    See Also
+    --------
+    Base
+    PvlibBased
+    SimpleWindTurbine
+    """
+
+    def __init__(self, reference=None, **kwargs):
+        super().__init__(**kwargs)
+        if reference is None:
+            reference = PvlibBased()
+        elif isinstance(reference, type):
+            reference = reference()
+        self.reference = reference
+        parameters, fixed, features = SURROGATES.get(
+            type(reference).__name__, (None, None, None))
+        parameters = kwargs.get('parameters', parameters)
+        features = kwargs.get('features', features)
+        if parameters is None or features is None:
+            raise ValueError(
+                "The surrogate of {0} needs parameters and features.".format(
+                    type(reference).__name__))
+        self.parameters = tuple(parameters)
+        self.features = features
+        self.fixed = tuple(k for k in reference.required
+                           if k not in self.parameters)
+        self.degree = kwargs.get('degree', 2)
+        self.fits = {}
+
+    @property
+    def settings(self):
+        r""" The keyword arguments this surrogate was created with, the
+        reference model and a digest of the fits.
+
+        A new fit (or loaded fits) changes the key of cached feedin time
+        series (see :mod:`feedinlib.cache`).
+        """
+        settings = dict(super().settings)
+        settings['features'] = '{0}.{1}'.format(
+            getattr(self.features, '__module__', None),
+            getattr(self.features, '__qualname__',
+                    type(self.features).__name__))
+        settings['reference'] = [
+            type(self.reference).__module__, type(self.reference).__name__,
+            self.reference.settings]
+        digest = hashlib.sha1()
+        for key, fit in sorted(self.fits.items(), key=lambda k: repr(k[0])):
+            digest.update(repr(key).encode())
+            digest.update(pd.util.hash_pandas_object(
+                fit['index']).values.tobytes())
+            for name in ('coefficients', 'active', 'ranges', 'fingerprint'):
+                digest.update(np.ascontiguousarray(fit[name]).tobytes())
+        settings['fits'] = digest.hexdigest()
+        return settings
+
+    @property
+    def required(self):
+        r""" The parameters of the reference model."""
+        if super().required is not None:
+            return super().required
+        return self.reference.required
+
+    def key(self, weather, **kwargs):
+        r"""
+        Key of the fit of a weather cell and technology: the name of the
+        weather object and the values of the fixed parameters.
+
+        The name only selects the fit. The data of the weather is compared
+        with the data the surrogate was fitted on when it is evaluated, so a
+        different weather with the same name is rejected.
+
+        Raises
+        ------
+        ValueError
+            If the weather object has no name.
+        """
+        if weather.name is None:
+            raise ValueError(
+                "The weather of a surrogate needs a name identifying the "
+                "weather cell.")
+        return (weather.name,) + tuple(kwargs[k] for k in self.fixed)
+
+    def fit(self, weather, ranges, n_samples=None, n_validation=20,
+            seed=None, **kwargs):
+        r"""
+        Fit the surrogate for a weather cell and technology.
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+            The weather of the cell. Its name identifies the cell.
+        ranges : dictionary
+            Lower and upper bound of each varied parameter.
+        n_samples : int, optional
+            Number of reference runs of the fit (default: four times the
+            number of coefficients).
+        n_validation : int, optional
+            Number of independent reference runs to determine the error
+            (default: 20).
+        seed : int, optional
+            Seed of the random parameters.
+        \**kwargs :
+            The fixed parameters (e.g. module_name) and further arguments of
+            the reference model.
+
+        Returns
+        -------
+        dictionary
+            The validation error, see :py:func:`validation_error
+            <feedinlib.models.Surrogate.validation_error>`.
+        """
+        random = np.random.RandomState(seed)
+        bounds = np.array([ranges[k] for k in self.parameters], dtype=float)
+        n_coefficients = _monomials(self.features(*bounds[:, :1]),
+                                    self.degree).shape[1]
+        if n_samples is None:
+            n_samples = 4 * n_coefficients
+
+        def reference_runs(n):
+            samples = random.uniform(bounds[:, 0], bounds[:, 1],
+                                     (n, len(self.parameters)))
+            values = []
+            for sample in samples:
+                arguments = dict(kwargs, weather=weather,
+                                 **dict(zip(self.parameters, sample)))
+                feedin, metadata = self.reference.feedin_with_metadata(
+                    **arguments)
+                values.append(np.asarray(feedin.values, dtype=float))
+            return samples, np.column_stack(values), feedin.index, metadata
+
+        samples, values, index, metadata = reference_runs(n_samples)
+        design = _monomials(self.features(*samples.T), self.degree)
+        coefficients = np.linalg.lstsq(design, values.T, rcond=None)[0]
+        fit = {'index': index, 'coefficients': np.ascontiguousarray(
+                   coefficients.T),
+               'active': values.max(axis=1) > 0, 'ranges': bounds,
+               'metadata': metadata,
+               'fingerprint': _weather_fingerprint(weather),
+               'location': _weather_location(weather)}
+        key = self.key(weather, **kwargs)
+        self.fits[key] = fit
+
+        samples, values, index, metadata = reference_runs(n_validation)
+        approximation = self._evaluate(fit, samples)
+        error = approximation - values
+        mean = values.mean()
+        energy = values.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fit['validation'] = {
+                'samples': int(n_samples),
+                'nrmse': float(np.sqrt((error ** 2).mean()) / mean),
+                'energy_error': float(np.abs(
+                    error.sum(axis=0) / energy).max()),
+                'mean_energy_error': float(np.abs(
+                    error.sum(axis=0) / energy).mean())}
+        return fit['validation']
+
+    def validation_error(self):
+        r"""
+        Error of the fits against the reference model.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per fit (weather cell and fixed parameters) with the
+            columns samples (number of reference runs of the fit), nrmse
+            (root mean square error of the time series divided by the mean
+            output of the reference model), energy_error and
+            mean_energy_error (largest and mean relative error of the
+            energy of the validation runs).
+        """
+        return pd.DataFrame(
+            [fit['validation'] for fit in self.fits.values()],
+            index=pd.MultiIndex.from_tuples(
+                list(self.fits), names=('weather',) + self.fixed))
+
+    def _evaluate(self, fit, samples, rows=None):
+        # Output (time x sample) of a fit for the given parameters
+        samples = np.atleast_2d(np.asarray(samples, dtype=float))
+        bounds = fit['ranges']
+        # Small tolerance for parameters at the bounds
+        tolerance = 1e-9 * np.maximum(np.abs(bounds).max(axis=1), 1)
+        if ((samples < bounds[:, 0] - tolerance) |
+                (samples > bounds[:, 1] + tolerance)).any():
+            raise ValueError(
+                "Parameters outside of the fitted ranges {0}: {1}".format(
+                    dict(zip(self.parameters, bounds.tolist())),
+                    samples.tolist()))
+        coefficients = fit['coefficients']
+        active = fit['active']
+        if rows is not None:
+            coefficients = coefficients[rows]
+            active = active[rows]
+        values = coefficients.dot(
+            _monomials(self.features(*samples.T), self.degree).T)
+        # No output at time steps without output of all reference runs
+        # (e.g. at night)
+        values[~active] = 0
+        return np.maximum(values, 0)
+
+    def _fit(self, weather, **kwargs):
+        # The fit and the rows of the time steps of the weather
+        key = self.key(weather, **kwargs)
+        if key not in self.fits:
+            raise ValueError("The surrogate is not fitted for {0}.".format(
+                dict(zip(('weather',) + self.fixed, key))))
+        fit = self.fits[key]
+        index = weather.data.index
+        rows = None
+        fingerprint = fit['fingerprint']
+        if not index.equals(fit['index']):
+            rows = fit['index'].get_indexer(index)
+            if (rows < 0).any():
+                raise ValueError(
+                    "The surrogate is not fitted for all time steps.")
+            fingerprint = fingerprint[rows]
+        if (not np.array_equal(_weather_fingerprint(weather), fingerprint) or
+                _weather_location(weather) != fit['location']):
+            raise ValueError(
+                "The weather {0} differs from the weather the surrogate "
+                "was fitted on.".format(weather.name))
+        return fit, rows, index
+
+    def feedin(self, **kwargs):
+        r"""
+        Approximated feedin of a powerplant.
+
+        Parameters
+        ----------
+        weather : feedinlib.weather.FeedinWeather object
+            The weather of a fitted cell (or a window of it).
+        \**kwargs :
+            The required parameters of the reference model.
+
+        Returns
+        -------
+        pandas.Series
+        """
+        return self.feedin_with_metadata(**kwargs)[0]
+
+    def feedin_with_metadata(self, **kwargs):
+        r"""
+        Approximated feedin and the meta data of the reference model (e.g.
+        the peak power of the pv module).
+        """
+        fit, rows, index = self._fit(**kwargs)
+        values = self._evaluate(
+            fit, [kwargs[k] for k in self.parameters], rows)[:, 0]
+        return pd.Series(values, index=index), fit['metadata']
+
+    def fleet_feedin_with_metadata(self, weather, plants, **kwargs):
+        r"""
+        Approximated feedin of many powerplants on one weather object with
+        one matrix product per technology (see :py:func:`PlantTable.feedin
+        <feedinlib.powerplants.PlantTable.feedin>`).
+
+        Returns
+        -------
+        tuple
+            The feedin (numpy.array, time x powerplant), the time index and
+            a list with the meta data of each powerplant.
+        """
+        groups = collections.OrderedDict()
+        for number, plant in enumerate(plants):
+            groups.setdefault(tuple(plant[k] for k in self.fixed),
+                              []).append(number)
+        values = None
+        metadata = [None] * len(plants)
+        for fixed, numbers in groups.items():
+            fit, rows, index = self._fit(weather,
+                                         **dict(zip(self.fixed, fixed)))
+            if values is None:
+                values = np.empty((len(index), len(plants)))
+            values[:, numbers] = self._evaluate(
+                fit, [[plants[n][k] for k in self.parameters]
+                      for n in numbers], rows)
+            for number in numbers:
+                metadata[number] = fit['metadata']
+        if values is None:
+            values = np.empty((len(weather.data), 0))
+            index = weather.data.index
+        return values, index, metadata
+
+    def save(self, filename):
+        r"""
+        Write the fits to an uncompressed npz-file.
+        """
+        arrays = {}
+        meta = []
+        for number, (key, fit) in enumerate(self.fits.items()):
+            index = fit['index']
+            timezone = None if index.tz is None else str(index.tz)
+            if index.tz is not None:
+                index = index.tz_convert('UTC').tz_localize(None)
+            for name in ('coefficients', 'active', 'ranges', 'fingerprint'):
+                arrays['{0}/{1}'.format(number, name)] = fit[name]
+            arrays['{0}/index'.format(number)] = index.asi8
+            meta.append({
+                'key': list(key), 'timezone': timezone,
+                'location': fit['location'],
+                'validation': fit['validation'],
+                'metadata': {k: float(v) for k, v in fit['metadata'].items()}})
+        arrays['meta'] = np.frombuffer(json.dumps(
+            {'parameters': self.parameters, 'degree': self.degree,
+             'fits': meta}).encode(), dtype=np.uint8)
+        with open(filename, 'wb') as f:
+            np.savez(f, **arrays)
+
+    def load(self, filename):
+        r"""
+        Read fits written by :py:func:`save
+        <feedinlib.models.Surrogate.save>`. The surrogate must have the same
+        varied parameters, features and degree.
+        """
+        with np.load(filename, allow_pickle=False) as archive:
+            meta = json.loads(archive['meta'].tobytes().decode())
+            if (tuple(meta['parameters']) != self.parameters or
+                    meta['degree'] != self.degree):
+                raise ValueError(
+                    "The file was fitted with the parameters {0} ".format(
+                        meta['parameters']) +
+                    "and the degree {0}.".format(meta['degree']))
+            for number, entry in enumerate(meta['fits']):
+                index = pd.DatetimeIndex(
+                    archive['{0}/index'.format(number)].view('M8[ns]'))
+                if entry['timezone'] is not None:
+                    index = index.tz_localize('UTC').tz_convert(
+                        entry['timezone'])
+                fit = {name: archive['{0}/{1}'.format(number, name)]
+                       for name in ('coefficients', 'active', 'ranges',
+                                    'fingerprint')}
+                fit.update(index=index, validation=entry['validation'],
+                           metadata=entry['metadata'],
+                           location=entry['location'])
+                self.fits[tuple(entry['key'])] = fit
+        return self
+
+
+# Kernel functions
+#
+# The following functions work on plain numpy arrays without time index and
+# return numpy arrays (or dictionaries of them). The model classes are thin
+# wrappers around them, adding the pandas index, the weather object and the
+# caching of derived quantities.
+
+def solar_position_kernel(times, latitude, longitude, samples=12,
+                          interval=3600):
+    r"""
+    Position of the sun as the mean of several positions per time step.
+
+    Parameters
+    ----------
+    times : numpy.array
+        Beginning of the time steps as nanoseconds since 1970-01-01 UTC
+        (int64) or as numpy.datetime64 values in UTC.
+    latitude, longitude : float
+        Location in degrees.
+    samples : int, optional
+        Number of positions per time step (default: 12, every five minutes).
+    interval : float, optional
+        Length of a time step in seconds (default: 3600).
+
+    Returns
+    -------
+    dictionary
+        The mean azimuth, zenith, elevation, apparent_zenith,
+        apparent_elevation and solar_time of each time step as numpy arrays.
+        Negative values (sun below the horizon) count as zero.
+
+    Notes
+    -----
+    The positions are calculated with the ephemeris method of
+    `pvlib.solarposition.get_solarposition` [2]_.
+    """
+    times = np.asarray(times).astype('M8[ns]').astype(np.int64)
+    offsets = (np.arange(samples) * interval * 1e9 / samples).astype(np.int64)
+    sample_times = pd.DatetimeIndex(
+        (times[:, None] + offsets).ravel().view('M8[ns]'), tz='UTC')
+    position = pvlib.solarposition.get_solarposition(
+        time=sample_times, latitude=latitude, longitude=longitude,
+        method='ephemeris')
+    return {column: np.maximum(position[column].values, 0).reshape(
+        len(times), samples).mean(axis=1) for column in position.columns}
+
+
+def irradiation_kernel(zenith, dirhi, dhi, dayofyear=None):
+    r"""
+    Irradiation quantities depending only on the weather and the position of
+    the sun.
+
+    Parameters
+    ----------
+    zenith : numpy.array
+        Zenith angle of the sun in degrees (limited to 90°).
+    dirhi, dhi : numpy.array
+        Direct and diffuse horizontal irradiation [W/m²].
+    dayofyear : numpy.array, optional
+        Day of the year of each time step. The extraterrestrial radiation is
+        only determined if it is given.
+
+    Returns
+    -------
+    dictionary
+        dni_extra (extraterrestrial radiation), airmass (relative air mass),
+        dni (direct normal irradiation, dirhi for zenith angles above 88°)
+        and ghi (global horizontal irradiation) as numpy arrays.
+    """
+    zenith = np.asarray(zenith, dtype=float)
+    dirhi = np.asarray(dirhi, dtype=float)
+    # The division is replaced by dirhi for zenith angles above 88°
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dni = np.where(zenith > 88, dirhi,
+                       dirhi / np.sin(np.radians(90 - zenith)))
+    result = {
+        'airmass': pvlib.atmosphere.relativeairmass(zenith),
+        'dni': dni,
+        'ghi': dirhi + np.asarray(dhi, dtype=float)}
+    if dayofyear is not None:
+        result['dni_extra'] = pvlib.irradiance.extraradiation(
+            datetime_or_doy=np.asarray(dayofyear))
+    return result
+
+
+def sky_diffuse_kernel(transposition_model, tilt, azimuth, dhi, dni, ghi,
+                       dni_extra, solar_zenith, solar_azimuth, airmass):
+    r"""
+    Sky diffuse irradiation in plane (numpy.array), see
+    :py:func:`PvlibBased.sky_diffuse
+    <feedinlib.models.PvlibBased.sky_diffuse>`.
+
+    Raises
+    ------
+    ValueError
+        If the given transposition model is unknown.
+    """
+    if transposition_model == 'isotropic':
+        return pvlib.irradiance.isotropic(surface_tilt=tilt, dhi=dhi)
+    elif transposition_model == 'klucher':
+        return pvlib.irradiance.klucher(
+            surface_tilt=tilt, surface_azimuth=azimuth, dhi=dhi, ghi=ghi,
+            solar_zenith=solar_zenith, solar_azimuth=solar_azimuth)
+    elif transposition_model == 'haydavies':
+        return pvlib.irradiance.haydavies(
+            surface_tilt=tilt, surface_azimuth=azimuth, dhi=dhi, dni=dni,
+            dni_extra=dni_extra, solar_zenith=solar_zenith,
+            solar_azimuth=solar_azimuth)
+    elif transposition_model == 'reindl':
+        return pvlib.irradiance.reindl(
+            surface_tilt=tilt, surface_azimuth=azimuth, dhi=dhi, dni=dni,
+            ghi=ghi, dni_extra=dni_extra, solar_zenith=solar_zenith,
+            solar_azimuth=solar_azimuth)
+    elif transposition_model == 'king':
+        return pvlib.irradiance.king(
+            surface_tilt=tilt, dhi=dhi, ghi=ghi, solar_zenith=solar_zenith)
+    elif transposition_model == 'perez':
+        return pvlib.irradiance.perez(
+            surface_tilt=tilt, surface_azimuth=azimuth, dhi=dhi, dni=dni,
+            dni_extra=dni_extra, solar_zenith=solar_zenith,
+            solar_azimuth=solar_azimuth, airmass=airmass)
+    raise ValueError(
+        "Unknown transposition model: {0}. ".format(transposition_model) +
+        "Use one of 'isotropic', 'klucher', 'haydavies', 'reindl', " +
+        "'king' or 'perez'.")
+
+
+def plane_of_array_kernel(tilt, azimuth, albedo, aoi, dhi, dni, ghi,
+                          dni_extra, solar_zenith, solar_azimuth, airmass,
+                          transposition_model='perez'):
+    r"""
+    Irradiation in the plane of the module.
+
+    Parameters
+    ----------
+    tilt, azimuth, albedo : float or numpy.array
+        Orientation of the module in degrees and albedo.
+    aoi : numpy.array
+        Angle of incidence in degrees.
+    dhi, dni, ghi, dni_extra, solar_zenith, solar_azimuth, airmass :
+        numpy.array
+        See :py:func:`irradiation_kernel
+        <feedinlib.models.irradiation_kernel>` and
+        :py:func:`solar_position_kernel
+        <feedinlib.models.solar_position_kernel>`.
+    transposition_model : string, optional
+        See :py:func:`PvlibBased.sky_diffuse
+        <feedinlib.models.PvlibBased.sky_diffuse>` (default: 'perez').
+
+    Returns
+    -------
+    dictionary
+        poa_sky_diffuse, poa_ground_diffuse, poa_global, poa_direct and
+        poa_diffuse as numpy arrays.
+    """
+    poa_sky_diffuse = np.asarray(sky_diffuse_kernel(
+        transposition_model, tilt, azimuth, dhi, dni, ghi, dni_extra,
+        solar_zenith, solar_azimuth, airmass), dtype=float)
+    poa_sky_diffuse = np.where(np.isnan(poa_sky_diffuse), 0,
+                               poa_sky_diffuse)
+    poa_ground_diffuse = pvlib.irradiance.grounddiffuse(
+        ghi=ghi, albedo=albedo, surface_tilt=tilt)
+    result = {'poa_sky_diffuse': poa_sky_diffuse,
+              'poa_ground_diffuse': np.asarray(poa_ground_diffuse)}
+    result.update((key, np.asarray(value)) for key, value in
+                  pvlib.irradiance.globalinplane(
+                      aoi=aoi, dni=dni, poa_sky_diffuse=poa_sky_diffuse,
+                      poa_ground_diffuse=poa_ground_diffuse).items())
+    return result
+
+
+def sapm_kernel(poa_global, poa_direct, poa_diffuse, aoi, airmass, temp_air,
+                v_wind, module):
+    r"""
+    Output of a pv module with the Sandia PV Array Performance Model [8]_.
+
+    Parameters
+    ----------
+    poa_global, poa_direct, poa_diffuse : numpy.array
+        Irradiation in plane [W/m²].
+    aoi : numpy.array
+        Angle of incidence in degrees.
+    airmass : numpy.array
+        Relative air mass.
+    temp_air : numpy.array
+        Air temperature [K].
+    v_wind : numpy.array
+        Wind speed [m/s].
+    module : dictionary or pandas.Series
+        Parameters of the module (see :py:func:`fetch_module_data
+        <feedinlib.models.PvlibBased.fetch_module_data>`).
+
+    Returns
+    -------
+    dictionary
+        temp_cell, temp_module, effective_irradiance and the results of
+        `pvlib.pvsystem.sapm` (p_mp with NaN set to zero) as numpy arrays.
+    """
+    result = cell_temperature_kernel(poa_global, temp_air, v_wind)
+    result.update(sapm_output_kernel(poa_direct, poa_diffuse, aoi, airmass,
+                                     result['temp_cell'], module))
+    return result
+
+
+def cell_temperature_kernel(poa_global, temp_air, v_wind):
+    r"""
+    Module and cell temperature [°C] of an open rack module with polymer
+    back (see `pvlib.pvsystem.sapm_celltemp`).
+
+    Parameters
+    ----------
+    poa_global : numpy.array
+        Global irradiation in plane [W/m²].
+    temp_air : numpy.array
+        Air temperature [K].
+    v_wind : numpy.array
+        Wind speed [m/s].
+
+    Returns
+    -------
+    dictionary
+        temp_cell and temp_module as numpy arrays.
+    """
+    poa_global = np.asarray(poa_global, dtype=float)
+    a, b, delta_t = -3.56, -.0750, 3
+    temp_module = (poa_global * np.exp(a + b * np.asarray(v_wind)) +
+                   (np.asarray(temp_air) - 273.15))
+    return {'temp_cell': temp_module + (poa_global / 1000.) * delta_t,
+            'temp_module': temp_module}
+
+
+def sapm_output_kernel(poa_direct, poa_diffuse, aoi, airmass, temp_cell,
+                       module):
+    r"""
+    Effective irradiance and output of a pv module for a given cell
+    temperature [°C], see :py:func:`sapm_kernel
+    <feedinlib.models.sapm_kernel>`.
+    """
+    result = {'effective_irradiance': np.asarray(
+        pvlib.pvsystem.sapm_effective_irradiance(
+            poa_direct=poa_direct, poa_diffuse=poa_diffuse,
+            airmass_absolute=airmass, aoi=aoi, module=module))}
+    result.update((key, np.asarray(value)) for key, value in
+                  pvlib.pvsystem.sapm(
+                      effective_irradiance=result['effective_irradiance'],
+                      temp_cell=temp_cell, module=module).items())
+    result['p_mp'] = np.where(np.isnan(result['p_mp']), 0, result['p_mp'])
+    return result
+
+
+def sapm_matrix(modules):
+    r"""
+    Stack the parameters of pv modules into a (module x coefficient) matrix.
+
+    Parameters
+    ----------
+    modules : list of dictionaries or pandas.Series
+        Parameters of the modules (see :py:func:`fetch_module_data
+        <feedinlib.models.PvlibBased.fetch_module_data>`).
+
+    Returns
+    -------
+    numpy.array
+        One row per module with the coefficients in the order of
+        `jit.SAPM_PARAMETERS`.
+    """
+    if not len(modules):
+        return np.zeros((0, len(jit.SAPM_PARAMETERS)))
+    return np.vstack([jit.module_coefficients(module) for module in modules])
+
+
+def sapm_matrix_kernel(poa_direct, poa_diffuse, aoi, airmass, temp_cell,
+                       coefficients):
+    r"""
+    Output of many pv modules with the Sandia PV Array Performance Model.
+
+    The same calculation as :py:func:`sapm_output_kernel
+    <feedinlib.models.sapm_output_kernel>` for several modules at once. The
+    coefficients of the modules are rows of a matrix, all inputs are
+    broadcast against them.
+
+    Parameters
+    ----------
+    poa_direct, poa_diffuse, aoi, airmass, temp_cell : numpy.array
+        See :py:func:`sapm_output_kernel
+        <feedinlib.models.sapm_output_kernel>`. Arrays of the shape (time x
+        module) or (time x 1) for values shared by all modules.
+    coefficients : numpy.array
+        The (module x coefficient) matrix of :py:func:`sapm_matrix
+        <feedinlib.models.sapm_matrix>`.
+
+    Returns
+    -------
+    dictionary
+        effective_irradiance and p_mp (NaN set to zero) as (time x module)
+        arrays.
+    """
+    module = {name: coefficients[:, number] for number, name in
+              enumerate(jit.SAPM_PARAMETERS)}
+    airmass = np.asarray(airmass, dtype=float)
+    aoi = np.asarray(aoi, dtype=float)
+    temp_cell = np.asarray(temp_cell, dtype=float)
+
+    # pvlib.pvsystem.sapm_effective_irradiance
+    spectral = np.zeros(())
+    for name in ('A4', 'A3', 'A2', 'A1', 'A0'):
+        spectral = spectral * airmass + module[name]
+    spectral = np.maximum(0, spectral)
+    spectral = np.where(np.isnan(spectral), 0, spectral)
+    angular = np.zeros(())
+    for name in ('B5', 'B4', 'B3', 'B2', 'B1', 'B0'):
+        angular = angular * aoi + module[name]
+    angular = np.where(aoi < 0, np.nan, np.clip(angular, 0, None))
+    effective_irradiance = spectral * (
+        np.asarray(poa_direct) * angular +
+        module['FD'] * np.asarray(poa_diffuse)) / 1000.
+
+    # pvlib.pvsystem.sapm (maximum power point)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ee = np.log(effective_irradiance)
+    delta = module['N'] * 1.38066e-23 * (temp_cell + 273.15) / 1.60218e-19
+    i_mp = module['Impo'] * (
+        module['C0'] * effective_irradiance +
+        module['C1'] * (effective_irradiance ** 2)) * (
+            1 + module['Aimp'] * (temp_cell - 25))
+    v_mp = np.maximum(0, (
+        module['Vmpo'] +
+        module['C2'] * module['Cells_in_Series'] * delta * log_ee +
+        module['C3'] * module['Cells_in_Series'] * ((delta * log_ee) ** 2) +
+        (module['Bvmpo'] + module['Mbvmp'] * (1 - effective_irradiance)) *
+        (temp_cell - 25)))
+    with np.errstate(invalid='ignore'):
+        p_mp = i_mp * v_mp
+    return {'effective_irradiance': effective_irradiance,
+            'p_mp': np.where(np.isnan(p_mp), 0, p_mp)}
+
+
+def pv_feedin_kernel(times, dhi, dirhi, temp_air, v_wind, latitude,
+                     longitude, tilt, azimuth, albedo, module,
+                     transposition_model='perez', dayofyear=None):
+    r"""
+    Output of a pv module [W] from plain arrays.
+
+    The same calculation as :py:func:`PvlibBased.get_pv_power_output
+    <feedinlib.models.PvlibBased.get_pv_power_output>` without pandas
+    objects.
+
+    Parameters
+    ----------
+    times : numpy.array
+        Beginning of the hourly time steps as nanoseconds since 1970-01-01
+        UTC (int64) or as numpy.datetime64 values in UTC.
+    dhi, dirhi : numpy.array
+        Diffuse and direct horizontal irradiation [W/m²].
+    temp_air : numpy.array
+        Air temperature [K].
+    v_wind : numpy.array
+        Wind speed [m/s].
+    latitude, longitude : float
+        Location in degrees.
+    tilt, azimuth, albedo : float
+        Orientation of the module in degrees and albedo.
+    module : dictionary or pandas.Series
+        Parameters of the module (see :py:func:`fetch_module_data
+        <feedinlib.models.PvlibBased.fetch_module_data>`).
+    transposition_model : string, optional
+        See :py:func:`PvlibBased.sky_diffuse
+        <feedinlib.models.PvlibBased.sky_diffuse>` (default: 'perez').
+    dayofyear : numpy.array, optional
+        Day of the year of each time step for the extraterrestrial
+        radiation. By default the day of the year in UTC is used.
+
+    Returns
+    -------
+    numpy.array
+        Output of the module, zero without daylight.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from feedinlib import models
+    >>> times = np.arange('2010-06-01T00', '2010-06-02T00',
+    ...                   dtype='M8[h]')
+    >>> module = models.PvlibBased().fetch_module_data(
+    ...     module_name='Yingli_YL210__2008__E__')  # doctest: +SKIP
+    >>> p_mp = models.pv_feedin_kernel(
+    ...     times, dhi=np.full(24, 100.), dirhi=np.full(24, 200.),
+    ...     temp_air=np.full(24, 290.), v_wind=np.full(24, 3.),
+    ...     latitude=52, longitude=13, tilt=30, azimuth=180, albedo=0.2,
+    ...     module=module)  # doctest: +SKIP
+    """
+    times = np.asarray(times).astype('M8[ns]')
+    dhi = np.asarray(dhi, dtype=float)
+    dirhi = np.asarray(dirhi, dtype=float)
+    solar = solar_position_kernel(times, latitude, longitude)
+    zenith = np.minimum(solar['zenith'], 90)
+    if dayofyear is None:
+        dayofyear = ((times.astype('M8[D]') - times.astype('M8[Y]')).astype(
+            int) + 1)
+    irradiation = irradiation_kernel(zenith, dirhi, dhi, dayofyear=dayofyear)
+
+    p_mp = np.zeros(len(times))
+    day = (zenith < 90) | (irradiation['ghi'] > 0)
+    aoi = pvlib.irradiance.aoi(
+        solar_azimuth=solar['azimuth'][day], solar_zenith=zenith[day],
+        surface_tilt=tilt, surface_azimuth=azimuth)
+    poa = plane_of_array_kernel(
+        tilt, azimuth, albedo, aoi, dhi[day], irradiation['dni'][day],
+        irradiation['ghi'][day], irradiation['dni_extra'][day], zenith[day],
+        solar['azimuth'][day], irradiation['airmass'][day],
+        transposition_model=transposition_model)
+    p_mp[day] = sapm_kernel(
+        poa['poa_global'], poa['poa_direct'], poa['poa_diffuse'], aoi,
+        irradiation['airmass'][day], np.asarray(temp_air)[day],
+        np.asarray(v_wind)[day], module)['p_mp']
+    return p_mp
+
+
+def rho_hub_kernel(temp_air, pressure, h_hub, h_temp_air, h_pressure):
+    r"""
+    Density of the air at hub height [kg/m³] (numpy.array) from the air
+    temperature [K] and the pressure [Pa] measured at the heights h_temp_air
+    and h_pressure [m], see :py:func:`SimpleWindTurbine.rho_hub
+    <feedinlib.models.SimpleWindTurbine.rho_hub>`.
+    """
+    temperature_hub = np.asarray(temp_air) - 0.0065 * (h_hub - h_temp_air)
+    return (np.asarray(pressure) / 100 -
+            (h_hub - h_pressure) * 1 / 8) / (2.8706 * temperature_hub)
+
+
+def v_wind_hub_kernel(v_wind, z0, h_hub, h_v_wind):
+    r"""
+    Wind speed at hub height [m/s] (numpy.array) from the wind speed
+    measured at the height h_v_wind [m] and the roughness length z0 [m], see
+    :py:func:`SimpleWindTurbine.v_wind_hub
+    <feedinlib.models.SimpleWindTurbine.v_wind_hub>`.
+    """
+    z0 = np.asarray(z0)
+    return (np.asarray(v_wind) * np.log(h_hub / z0) /
+            np.log(h_v_wind / z0))
+
+
+def wind_power_kernel(v_wind_hub, rho_hub, d_rotor, cp, nominal_power):
+    r"""
+    Output of a wind turbine [W] (numpy.array) from the wind speed [m/s] and
+    the density of the air [kg/m³] at hub height, the diameter of the rotor
+    [m], the power coefficients and the nominal power [W].
+    """
+    return np.minimum(
+        (np.asarray(rho_hub) / 2) * (((d_rotor / 2) ** 2) * np.pi) *
+        np.power(np.asarray(v_wind_hub), 3) * cp, float(nominal_power))
+
+
+def wind_feedin_kernel(v_wind, temp_air, pressure, z0, h_hub, d_rotor,
+                       cp_wind_speed, cp, nominal_power, data_height):
+    r"""
+    Output of a wind turbine [W] from plain arrays.
+
+    The same calculation as :py:func:`SimpleWindTurbine.turbine_power_output
+    <feedinlib.models.SimpleWindTurbine.turbine_power_output>` without pandas
+    objects.
+
+    Parameters
+    ----------
+    v_wind, temp_air, pressure, z0 : numpy.array
+        Wind speed [m/s], air temperature [K], pressure [Pa] and roughness
+        length [m].
+    h_hub, d_rotor : float
+        Hub height and rotor diameter [m].
+    cp_wind_speed, cp : numpy.array
+        Power curve as power coefficients at the given wind speeds.
+    nominal_power : float
+        Nominal power of the wind turbine [W].
+    data_height : dictionary
+        Heights of v_wind, temp_air and pressure [m].
+
+    Returns
+    -------
+    numpy.array
+    """
+    v_wind_hub = v_wind_hub_kernel(v_wind, z0, h_hub, data_height['v_wind'])
+    rho_hub = rho_hub_kernel(temp_air, pressure, h_hub,
+                             data_height['temp_air'], data_height['pressure'])
+    cp_wind_speed = np.asarray(cp_wind_speed, dtype=float)
+    power_coefficient = np.interp(
+        np.minimum(v_wind_hub, cp_wind_speed.max()), cp_wind_speed, cp)
+    return wind_power_kernel(v_wind_hub, rho_hub, d_rotor,
+                             power_coefficient, nominal_power)
+
+
+# Stages of the pv pipeline
+#
+# The output of a pv module is calculated in stages. Each stage depends on
+# the weather object, on the results of other stages and on some parameters
+# of the powerplant. A stage is memoized per weather object with the
+# parameters it depends on (including those of the stages before) as key, so
+# changing a parameter only recalculates the stages depending on it.
+
+Stage = collections.namedtuple('Stage', ['parameters', 'dependencies',
+                                         'function'])
+
+# Maximum number of memoized stage results per weather object
+STAGE_CACHE_SIZE = 128
+
+DAYLIGHT_COLUMNS = ('zenith', 'azimuth', 'dhi', 'dni', 'ghi', 'dni_extra',
+                    'airmass', 'temp_air', 'v_wind')
+
+
+class StageCache:
+    r"""
+    Memoized results of the pipeline stages of one weather object.
+
+    The least recently used results are dropped if the number of results
+    exceeds `max_entries`. The cache can be used from several threads.
+    """
+
+    def __init__(self, max_entries=STAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, function):
+        r"""
+        The result stored with the key. The result of the function (called
+        without arguments) is stored if the key is unknown.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = function()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+def _daylight_stage(model, weather, inputs, parameters):
+    data = model.weather_columns(weather=weather)
+    mask = np.asarray(model.daylight(data))
+    day = {column: data[column].values[mask] for column in DAYLIGHT_COLUMNS}
+    day['mask'] = mask
+    return day
+
+
+def _aoi_stage(model, weather, inputs, parameters):
+    day = inputs['daylight']
+    return np.asarray(pvlib.irradiance.aoi(
+        solar_azimuth=day['azimuth'], solar_zenith=day['zenith'],
+        surface_tilt=parameters['tilt'],
+        surface_azimuth=parameters['azimuth']), dtype=float)
+
+
+def _sky_diffuse_stage(model, weather, inputs, parameters):
+    day = inputs['daylight']
+    sky_diffuse = np.asarray(sky_diffuse_kernel(
+        parameters['transposition_model'], parameters['tilt'],
+        parameters['azimuth'], day['dhi'], day['dni'], day['ghi'],
+        day['dni_extra'], day['zenith'], day['azimuth'], day['airmass']),
+        dtype=float)
+    return np.where(np.isnan(sky_diffuse), 0, sky_diffuse)
+
+
+def _ground_diffuse_stage(model, weather, inputs, parameters):
+    return np.asarray(pvlib.irradiance.grounddiffuse(
+        ghi=inputs['daylight']['ghi'], albedo=parameters['albedo'],
+        surface_tilt=parameters['tilt']), dtype=float)
+
+
+def _plane_of_array_stage(model, weather, inputs, parameters):
+    return {key: np.asarray(value) for key, value in
+            pvlib.irradiance.globalinplane(
+                aoi=inputs['aoi'], dni=inputs['daylight']['dni'],
+                poa_sky_diffuse=inputs['sky_diffuse'],
+                poa_ground_diffuse=inputs['ground_diffuse']).items()}
+
+
+def _cell_temperature_stage(model, weather, inputs, parameters):
+    return cell_temperature_kernel(
+        inputs['plane_of_array']['poa_global'],
+        inputs['daylight']['temp_air'], inputs['daylight']['v_wind'])
+
+
+def _sapm_stage(model, weather, inputs, parameters):
+    poa = inputs['plane_of_array']
+    return sapm_output_kernel(
+        poa['poa_direct'], poa['poa_diffuse'], inputs['aoi'],
+        inputs['daylight']['airmass'],
+        inputs['cell_temperature']['temp_cell'],
+        model.fetch_module_data(module_name=parameters['module_name']))
+
+
+# The dependency graph of the pv pipeline. All arrays of a stage refer to
+# the rows with daylight (see PvlibBased.daylight).
+PV_STAGES = collections.OrderedDict([
+    ('daylight', Stage((), (), _daylight_stage)),
+    ('aoi', Stage(('tilt', 'azimuth'), ('daylight',), _aoi_stage)),
+    ('sky_diffuse', Stage(('tilt', 'azimuth', 'transposition_model'),
+                          ('daylight',), _sky_diffuse_stage)),
+    ('ground_diffuse', Stage(('tilt', 'albedo'), ('daylight',),
+                             _ground_diffuse_stage)),
+    ('plane_of_array', Stage(
+        (), ('daylight', 'aoi', 'sky_diffuse', 'ground_diffuse'),
+        _plane_of_array_stage)),
+    ('cell_temperature', Stage((), ('daylight', 'plane_of_array'),
+                               _cell_temperature_stage)),
+    ('sapm', Stage(('module_name',), ('daylight', 'aoi', 'plane_of_array',
+                                      'cell_temperature'), _sapm_stage)),
+])
+
+
+def stage_parameters(name, stages=PV_STAGES):
+    r"""
+    All parameters a stage depends on, including the parameters of the
+    stages before.
+
+    Examples
+    --------
+    >>> from feedinlib import models
+    >>> models.stage_parameters('plane_of_array')
+    ('albedo', 'azimuth', 'tilt', 'transposition_model')
+    """
+    parameters = set(stages[name].parameters)
+    for dependency in stages[name].dependencies:
+        parameters.update(stage_parameters(dependency, stages))
+    return tuple(sorted(parameters))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Monte Carlo analysis of the uncertainty of the feedin.
+
+Yield assessments (e.g. P90 values) need the feedin for thousands of
+variations of uncertain parameters. Instead of calling the feedin method of a
+powerplant once per variation, :py:func:`feedin <feedinlib.montecarlo.feedin>`
+evaluates all samples in one vectorized pass over a (time x sample) array.
+Quantities that do not depend on the sampled parameters, like the position of
+the sun, the angle of incidence or the wind speed at hub height, are
+calculated once and shared by all samples (they are taken from the memoized
+stages of the models, see :py:func:`PvlibBased.stage
+<feedinlib.models.PvlibBased.stage>`).
+
+The samples are drawn by :py:func:`sample <feedinlib.montecarlo.sample>` from
+normal distributions with a seed, so the results are reproducible. Each
+sample holds a deviation of some of the following parameters:
+
+* albedo: absolute deviation of the albedo (pv)
+* irradiance: relative bias of the direct and diffuse irradiation (pv)
+* temp_air: bias of the air temperature in K (pv and wind)
+* v_wind: relative bias of the wind speed (wind)
+* power_curve: relative deviation of the power coefficients (wind)
+* the name of a coefficient of the Sandia PV Array Performance Model, e.g.
+  Impo or Bvmpo: relative deviation of the coefficient of the module (pv)
+
+Examples
+--------
+>>> from feedinlib import montecarlo
+>>> samples = montecarlo.sample(1000, seed=42, albedo=0.05, irradiance=0.05,
+...                             Impo=0.02)
+>>> energy = montecarlo.yields(my_pv_plant, my_weather,
+...                            samples)  # doctest: +SKIP
+>>> montecarlo.p_values(energy)  # doctest: +SKIP
+"""
+
+import numpy as np
+import pandas as pd
+import pvlib
+
+from . import models
+from . import powerplants
+
+PV_PARAMETERS = ('albedo', 'irradiance', 'temp_air')
+WIND_PARAMETERS = ('power_curve', 'temp_air', 'v_wind')
+
+# Coefficients of the polynomials of the SAPM (spectral and angular losses)
+SAPM_POLYNOMIALS = (('A0', 'A1', 'A2', 'A3', 'A4'),
+                    ('B0', 'B1', 'B2', 'B3', 'B4', 'B5'))
+
+# Default number of samples evaluated in one pass
+SAMPLE_CHUNK = 256
+
+
+def sample(n_samples, seed=None, **uncertainties):
+    r"""
+    Draw samples of the deviations of uncertain parameters.
+
+    Parameters
+    ----------
+    n_samples : int
+        Number of samples.
+    seed : int, optional
+        Seed of the random numbers. The same seed and uncertainties give the
+        same samples, independent of the order of the keyword arguments.
+    \**uncertainties :
+        The names of the parameters (see :mod:`feedinlib.montecarlo`) as
+        keys and the standard deviations of their normal distributions as
+        values.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The deviation of each parameter (columns) for each sample (index).
+
+    Examples
+    --------
+    >>> from feedinlib import montecarlo
+    >>> samples = montecarlo.sample(3, seed=1, albedo=0.05)
+    >>> samples.shape
+    (3, 1)
+    """
+    names = sorted(uncertainties)
+    random = np.random.RandomState(seed)
+    deviations = random.standard_normal((int(n_samples), len(names)))
+    deviations *= np.array([uncertainties[name] for name in names],
+                           dtype=float)
+    return pd.DataFrame(deviations, columns=names,
+                        index=pd.RangeIndex(int(n_samples), name='sample'))
+
+
+def _factor(deviation):
+    # Relative deviations must not change the sign of a quantity
+    return np.maximum(1 + np.asarray(deviation, dtype=float), 0)
+
+
+def _pv_chunks(model, samples, chunk, **kwargs):
+    # Output of the pv module for chunks of samples
+    module = model.fetch_module_data(**kwargs)
+    coefficients = [name for name in samples.columns
+                    if name not in PV_PARAMETERS]
+    unknown = [name for name in coefficients if name not in module.index]
+    if unknown:
+        raise ValueError("Unknown parameters of a pv module: {0}".format(
+            unknown))
+
+    # Independent of the samples
+    day = model.stage('daylight', **kwargs)
+    aoi = model.stage('aoi', **kwargs)[:, None]
+    n_times = len(day['mask'])
+    tilt = kwargs['tilt']
+
+    def column(name):
+        return day[name][:, None]
+
+    for first in range(0, len(samples), chunk):
+        part = samples.iloc[first:first + chunk]
+        if 'irradiance' in part:
+            factor = _factor(part['irradiance'].values)
+            dhi = column('dhi') * factor
+            dni = column('dni') * factor
+            ghi = column('ghi') * factor
+            sky_diffuse = np.asarray(models.sky_diffuse_kernel(
+                kwargs.get('transposition_model', model.transposition_model),
+                tilt, kwargs['azimuth'], dhi, dni, ghi, column('dni_extra'),
+                column('zenith'), column('azimuth'), column('airmass')),
+                dtype=float)
+            sky_diffuse = np.where(np.isnan(sky_diffuse), 0, sky_diffuse)
+        else:
+            dni = column('dni')
+            ghi = column('ghi')
+            sky_diffuse = model.stage('sky_diffuse', **kwargs)[:, None]
+        albedo = kwargs['albedo']
+        if 'albedo' in part:
+            albedo = np.clip(albedo + part['albedo'].values, 0, 1)
+        ground_diffuse = np.asarray(pvlib.irradiance.grounddiffuse(
+            ghi=ghi, albedo=albedo, surface_tilt=tilt), dtype=float)
+        poa = pvlib.irradiance.globalinplane(
+            aoi=aoi, dni=dni, poa_sky_diffuse=sky_diffuse,
+            poa_ground_diffuse=ground_diffuse)
+        temp_air = column('temp_air')
+        if 'temp_air' in part:
+            temp_air = temp_air + part['temp_air'].values
+        temp_cell = models.cell_temperature_kernel(
+            poa['poa_global'], temp_air, column('v_wind'))['temp_cell']
+        sampled = dict(module)
+        for name in coefficients:
+            sampled[name] = float(module[name]) * _factor(part[name].values)
+        # All coefficients of a polynomial need the same shape
+        for group in SAPM_POLYNOMIALS:
+            if any(name in coefficients for name in group):
+                for name in group:
+                    sampled[name] = np.broadcast_to(
+                        sampled[name], (len(part),)).astype(float)
+        p_mp = np.broadcast_to(models.sapm_output_kernel(
+            poa['poa_direct'], poa['poa_diffuse'], aoi, column('airmass'),
+            temp_cell, sampled)['p_mp'], (len(aoi), len(part)))
+        result = np.zeros((n_times, len(part)))
+        result[day['mask']] = p_mp
+        yield part.index, result
+
+
+def _wind_chunks(model, samples, chunk, **kwargs):
+    # Output of the wind turbine for chunks of samples
+    unknown = [name for name in samples.columns
+               if name not in WIND_PARAMETERS]
+    if unknown:
+        raise ValueError("Unknown parameters of a wind turbine: {0}".format(
+            unknown))
+    weather = kwargs['weather']
+    h_hub = kwargs['h_hub']
+    cp_values, nominal_power = models.turbine_data(kwargs['wind_conv_type'])
+    if model.power_curve_step is not None:
+        table = models.power_curve_table(kwargs['wind_conv_type'],
+                                         model.power_curve_step)
+
+        def power_coefficient(v_wind):
+            return table.cp(v_wind.ravel(),
+                            kwargs['wind_conv_type']).reshape(v_wind.shape)
+    else:
+        def power_coefficient(v_wind):
+            return np.interp(np.minimum(v_wind, cp_values.index.max()),
+                             cp_values.index, cp_values.cp)
+
+    # Independent of the samples
+    v_wind_hub = model.v_wind_hub(weather, h_hub).values[:, None]
+    rho_hub = model.rho_hub(weather, h_hub).values[:, None]
+
+    for first in range(0, len(samples), chunk):
+        part = samples.iloc[first:first + chunk]
+        v_wind = v_wind_hub
+        if 'v_wind' in part:
+            v_wind = v_wind_hub * _factor(part['v_wind'].values)
+        rho = rho_hub
+        if 'temp_air' in part:
+            rho = models.rho_hub_kernel(
+                weather.data.temp_air.values[:, None] +
+                part['temp_air'].values,
+                weather.data.pressure.values[:, None], h_hub,
+                weather.data_height['temp_air'],
+                weather.data_height['pressure'])
+        cp = power_coefficient(np.broadcast_to(
+            v_wind, (len(v_wind_hub), len(part))))
+        if 'power_curve' in part:
+            cp = cp * _factor(part['power_curve'].values)
+        yield part.index, models.wind_power_kernel(
+            v_wind, rho, kwargs['d_rotor'], cp, nominal_power)
+
+
+def _chunks(powerplant, weather, samples, chunk=SAMPLE_CHUNK, **kwargs):
+    # Scaled feedin of the powerplant for chunks of samples
+    combined = {k: getattr(powerplant, k) for k in powerplant.model.required}
+    combined.update(kwargs)
+    combined['weather'] = weather
+    model = powerplant.model
+    if isinstance(model, models.PvlibBased):
+        module = model.fetch_module_data(**combined)
+        metadata = {'peak': module.Impo * module.Vmpo, 'area': module.Area}
+        chunks = _pv_chunks(model, samples, chunk, **combined)
+    elif isinstance(model, models.SimpleWindTurbine):
+        metadata = {'nominal_power': models.turbine_data(
+            combined['wind_conv_type'])[1]}
+        chunks = _wind_chunks(model, samples, chunk, **combined)
+    else:
+        raise TypeError(
+            "Monte Carlo runs need a PvlibBased or SimpleWindTurbine model, "
+            "not {0}.".format(type(model).__name__))
+    factor = 1.
+    for name, reference in powerplants.SCALING:
+        if kwargs.get(name, None) is not None:
+            factor = float(kwargs[name]) / reference(model, metadata)
+            break
+    for index, values in chunks:
+        yield index, values * factor
+
+
+def feedin(powerplant, weather, samples, **kwargs):
+    r"""
+    Feedin of a powerplant for each sample.
+
+    Parameters
+    ----------
+    powerplant : powerplant object
+        A powerplant with the model PvlibBased or SimpleWindTurbine (see
+        :mod:`feedinlib.powerplants`).
+    weather : FeedinWeather object
+    samples : pandas.DataFrame
+        The deviations of the parameters, see :py:func:`sample
+        <feedinlib.montecarlo.sample>`.
+    chunk : int, optional
+        Number of samples evaluated in one pass (default: 256). Limits the
+        memory of the intermediate (time x sample) arrays.
+    \**kwargs :
+        Parameters of the powerplant overwriting its attributes and scaling
+        keywords (e.g. peak_power or number), see :py:func:`Base.feedin
+        <feedinlib.powerplants.Base.feedin>`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The feedin with the time steps as index and the samples as columns.
+    """
+    parts = list(_chunks(powerplant, weather, samples, **kwargs))
+    values = (np.hstack([values for index, values in parts]) if parts else
+              np.zeros((len(weather.data), 0)))
+    return pd.DataFrame(values, index=weather.data.index,
+                        columns=samples.index)
+
+
+def yields(powerplant, weather, samples, **kwargs):
+    r"""
+    Energy of a powerplant for each sample.
+
+    The feedin is summed up chunk by chunk, so the (time x sample) array of
+    all samples is never stored.
+
+    Parameters
+    ----------
+    see :
+        :py:func:`feedin <feedinlib.montecarlo.feedin>`.
+    interval : float, optional
+        Length of a time step in hours. By default it is taken from the
+        first two time steps of the weather data (one hour for a single
+        time step).
+
+    Returns
+    -------
+    pandas.Series
+        The energy (feedin x hours) of each sample.
+    """
+    times = weather.data.index.get_level_values(-1)
+    interval = kwargs.pop('interval', None)
+    if interval is None:
+        interval = 1.
+        if len(times) > 1:
+            interval = (times[1] - times[0]) / np.timedelta64(1, 'h')
+    energy = pd.Series(np.nan, index=samples.index, name='energy')
+    for index, values in _chunks(powerplant, weather, samples, **kwargs):
+        energy[index] = values.sum(axis=0) * interval
+    return energy
+
+
+def p_values(energy, p=(50, 75, 90)):
+    r"""
+    Energy exceeded with the given probabilities.
+
+    Parameters
+    ----------
+    energy : pandas.Series
+        The energy of each sample, see :py:func:`yields
+        <feedinlib.montecarlo.yields>`.
+    p : list of numbers, optional
+        Probabilities of exceedance in percent (default: 50, 75, 90).
+
+    Returns
+    -------
+    pandas.Series
+        The energy with the labels P50, P75, ... as index.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> from feedinlib import montecarlo
+    >>> montecarlo.p_values(pd.Series(range(101)), p=[90]).tolist()
+    [10.0]
+    """
+    return pd.Series(
+        np.quantile(np.asarray(energy, dtype=float),
+                    [1 - value / 100. for value in p]),
+        index=['P{0}'.format(value) for value in p])
@@ -11,39 +11,42 @@ attribute.`
 """
 
 from abc import ABC, abstractmethod
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
 
 from . import models
 
 
 class Base(ABC):
-    # TODO: properly link/highlight the terms model and powerplant as they are
-    #       referring to feedinlib internals.
     def __init__(self, **attributes):
         r""" The base class of feedinlib powerplants.
 
-        The most prominent shared functionality between powerplants is the fact
-        that they instantiate their model class upon construction, in order to
-        get a unique model instance for each powerplant instance.
+        The most prominent shared functionality between *powerplants* (the
+        subclasses of this class, e.g. :class:`Photovoltaic`) is the fact
+        that they instantiate their *model* class (a subclass of
+        :class:`feedinlib.models.Base`) upon construction, in order to get a
+        model instance for each powerplant instance.
 
         Parameters
         ----------
         model : A model class or an instance of one
           If a class (or in general, any instance of :class:`type`) is
           provided, it is used to create the model instance encapsulating the
-          actual mathematical model used to calculate the feedin provided by
-          this powerplant.
+          actual mathematical model (see :mod:`feedinlib.models`) used to
+          calculate the feedin provided by this powerplant.
 
-          In any other case, the provided object is used directly. Note though,
-          that a reference to this powerplant is saved in the provided object,
-          so sharing model instances between two powerplant objects is not a
-          good idea, as the second powerplant will overwrite the reference the
-          reference to the first.
+          In any other case, the provided object is used directly. The models
+          of the feedinlib do not keep any state of a feedin calculation, so
+          one model instance can be shared by many powerplant objects and used
+          from several threads at once.
 
           The non-class version is only provided for users who need the extra
-          flexibility of controlling model instantiation and who know what they
-          are doing. In general, you'll want to provide a class for this
-          parameter or just go with the default for the specific subclass you
-          are using.
+          flexibility of controlling model instantiation. In general, you'll
+          want to provide a class for this parameter or just go with the
+          default for the specific subclass you are using.
 
         \**attributes :
           The remaining attributes providing the technical specification of
@@ -69,7 +72,6 @@ class Base(ABC):
         model = attributes.pop("model")
         if isinstance(model, type):
             model = model()
-        model.powerplant = self
         self.model = model
         for k in attributes:
             setattr(self, k, attributes[k])
@@ -98,6 +100,29 @@ class Base(ABC):
           to calculate the feedin, it takes precedence over a matching
           attribute of this object.
 
+        cache : feedinlib.cache.FeedinCache object, optional
+          If given, the feedin is loaded from the cache if it has been
+          calculated before with the same weather, model and parameters.
+          Otherwise it is calculated and stored in the cache.
+
+        start, end : pandas.Timestamp or string, optional
+          Calculate the feedin of this window only (see
+          :py:func:`FeedinWeather.window_times
+          <feedinlib.weather.FeedinWeather.window_times>`). The model only
+          processes the weather data of the window extended by the
+          `window_padding` of the model. They are not passed to the model.
+
+        number, peak_power, area, installed_capacity : float, optional
+          Scale the feedin of a single unit (one module or one turbine) to
+          the size of the powerplant: the number of units, the peak power of
+          a pv plant in W, the module area of a pv plant in m² or the
+          installed capacity of a wind farm in W (see `SCALING`). The feedin
+          is divided by the size of one unit taken from the meta data of the
+          model (e.g. the peak power of the module) and multiplied by the
+          given value. If several of them are given, the first one of this
+          list which is not None is used. They are passed to the model as
+          well.
+
         Returns
         -------
         feedin : Pandas dataframe
@@ -105,28 +130,73 @@ class Base(ABC):
           by a :py:class:`pandas.DataFrame`.
 
         """
-        # TODO: Document semantics of special keyword arguments.
+        cache = kwargs.pop('cache', None)
+        if cache is not None:
+            key = cache.key(self, **kwargs)
+            feedin = cache.get(key)
+            if feedin is None:
+                feedin = self._feedin(**kwargs)
+                cache.set(key, feedin)
+            return feedin
+        return self._feedin(**kwargs)
+
+    def _feedin(self, **kwargs):
+        # The special keyword arguments (window and scaling) are documented
+        # in feedin
+        start = kwargs.pop('start', None)
+        end = kwargs.pop('end', None)
         combined = {k: getattr(self, k) for k in self.model.required}
         combined.update(kwargs)
-        if kwargs.get('number', None) is not None:
-            feedin = self.model.feedin(**combined) * kwargs['number']
-        elif kwargs.get('peak_power', None) is not None:
-            feedin = (self.model.feedin(**combined) /
-                      float(self.model.peak) *
-                      float(kwargs['peak_power']))
-        elif kwargs.get('area', None) is not None:
-            feedin = (self.model.feedin(**combined) / self.model.area *
-                      kwargs['area'])
-        elif kwargs.get('installed_capacity', None) is not None:
-            feedin = (self.model.feedin(**combined) /
-                      float(self.model.nominal_power_wind_turbine) *
-                      float(kwargs['installed_capacity']))
-        else:
-            feedin = self.model.feedin(**combined)
-
+        if start is not None or end is not None:
+            weather = combined['weather']
+            combined['weather'] = weather.window(
+                start, end, padding=getattr(self.model, 'window_padding',
+                                            None))
+        feedin, metadata = feedin_with_metadata(self.model, **combined)
+        if start is not None or end is not None:
+            times = weather.window_times(start, end)
+            feedin = feedin[feedin.index.get_level_values(-1).isin(times)]
+        for name, reference in SCALING:
+            if kwargs.get(name, None) is not None:
+                feedin = (feedin / reference(self.model, metadata) *
+                          float(kwargs[name]))
+                break
         return feedin
 
 
+def feedin_with_metadata(model, **kwargs):
+    r"""
+    Feedin and meta data calculated by the given model.
+
+    Models without a `feedin_with_metadata` method (see
+    :py:func:`models.Base.feedin_with_metadata
+    <feedinlib.models.Base.feedin_with_metadata>`) return empty meta data.
+    """
+    if hasattr(model, 'feedin_with_metadata'):
+        return model.feedin_with_metadata(**kwargs)
+    return model.feedin(**kwargs), {}
+
+
+def _reference(key, attribute):
+    # Size of a single unit from the meta data of the feedin or from an
+    # attribute of models storing it.
+    def reference(model, metadata):
+        if key in metadata:
+            return float(metadata[key])
+        return float(getattr(model, attribute))
+    return reference
+
+
+# Keyword arguments scaling the feedin of a single unit in the order of their
+# precedence and the functions returning the size of a single unit.
+SCALING = [
+    ('number', lambda model, metadata: 1),
+    ('peak_power', _reference('peak', 'peak')),
+    ('area', _reference('area', 'area')),
+    ('installed_capacity',
+     _reference('nominal_power', 'nominal_power_wind_turbine'))]
+
+
 class Photovoltaic(Base):
     def __init__(self, model=models.PvlibBased, **attributes):
         r"""
@@ -167,3 +237,347 @@ class WindPowerPlant(Base):
 
     def feedin(self, **kwargs):
         return super().feedin(**kwargs)
+
+
+class PlantTable:
+    def __init__(self, columns, model, ids=None):
+        r"""
+        Columnar table of many powerplants sharing one model.
+
+        Instead of one Python object with its own model instance per
+        powerplant, the attributes of all powerplants are stored as typed
+        columns (structure of arrays) and a single model instance is used. The
+        attributes required by the model are validated once per column.
+
+        Parameters
+        ----------
+        columns : pandas.DataFrame or dictionary
+            One column per attribute with one row per powerplant. String
+            columns are stored as categoricals.
+        model : A model class or an instance of one
+            The model used to calculate the feedin of all powerplants (see
+            :class:`Base`). A class is instantiated once.
+        ids : string or array-like, optional
+            Name of the column holding the ids of the powerplants or the ids
+            themselves. Defaults to the positions of the powerplants.
+
+        Raises
+        ------
+        AttributeError
+            in case a column required by the model is missing.
+        ValueError
+            in case a column required by the model contains missing values.
+
+        Examples
+        --------
+        >>> from feedinlib import models, powerplants
+        >>> table = powerplants.PlantTable.from_csv(
+        ...     'pv_plants.csv', model=models.PvlibBased,
+        ...     ids='plant_id')  # doctest: +SKIP
+        >>> feedin = table.feedin(weather=my_weather)  # doctest: +SKIP
+        """
+        if isinstance(model, type):
+            model = model()
+        self.model = model
+
+        frame = pd.DataFrame(columns)
+        if isinstance(ids, str):
+            ids = frame.pop(ids).values
+        elif ids is None:
+            ids = np.arange(len(frame))
+        self.ids = np.asarray(ids)
+
+        self.columns = {}
+        for name in frame.columns:
+            column = frame[name]
+            if column.dtype == object:
+                column = column.astype('category')
+            self.columns[name] = column.values
+
+        for k in model.required:
+            if k not in self.columns:
+                raise AttributeError(
+                    "Your model requires {k}".format(k=k) +
+                    " but it's not provided as a column.")
+            if pd.isnull(self.columns[k]).any():
+                raise ValueError(
+                    "Your model requires {k}".format(k=k) +
+                    " but the column contains missing values.")
+        self._positions = None
+
+    @classmethod
+    def from_csv(cls, filename, model, ids=None, **kwargs):
+        r"""
+        Load a table from a csv-file with one row per powerplant.
+
+        Additional keyword arguments are passed to pandas.read_csv.
+        """
+        return cls(pd.read_csv(filename, **kwargs), model=model, ids=ids)
+
+    @classmethod
+    def from_parquet(cls, filename, model, ids=None, **kwargs):
+        r"""
+        Load a table from a parquet-file with one row per powerplant.
+
+        Additional keyword arguments are passed to pandas.read_parquet, which
+        requires pyarrow or fastparquet.
+        """
+        return cls(pd.read_parquet(filename, **kwargs), model=model, ids=ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        return PlantView(self, position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield PlantView(self, position)
+
+    def plant(self, plant_id):
+        r"""View of the powerplant with the given id."""
+        if self._positions is None:
+            self._positions = {k: i for i, k in enumerate(self.ids)}
+        return PlantView(self, self._positions[plant_id])
+
+    def take(self, positions):
+        r"""New table with the powerplants at the given positions sharing the
+        model of this table."""
+        table = PlantTable.__new__(PlantTable)
+        table.model = self.model
+        table.ids = self.ids[positions]
+        table.columns = {k: v[positions] for k, v in self.columns.items()}
+        table._positions = None
+        return table
+
+    def assign(self, **columns):
+        r"""New table with added or replaced columns sharing the model and
+        the other columns of this table. This table is not changed."""
+        table = PlantTable.__new__(PlantTable)
+        table.model = self.model
+        table.ids = self.ids
+        table.columns = dict(self.columns)
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if len(values) != len(self.ids):
+                raise ValueError(
+                    "The column {0} has {1} values for {2} plants.".format(
+                        name, len(values), len(self.ids)))
+            table.columns[name] = values
+        table._positions = None
+        return table
+
+    def split(self, column):
+        r"""
+        Split the table by the values of a column, e.g. the weather cell.
+
+        Returns
+        -------
+        dictionary
+            The values of the column as keys and tables as values. The tables
+            can be passed as plants to :class:`ChunkedFeedin
+            <feedinlib.chunked.ChunkedFeedin>`.
+        """
+        groups = pd.Series(np.asarray(self.columns[column])).groupby(
+            np.asarray(self.columns[column]), sort=False).indices
+        return {k: self.take(v) for k, v in groups.items()}
+
+    def feedin(self, weather, cell_column=None, threads=None, out=None,
+               **kwargs):
+        r"""
+        Feedin of all powerplants of the table.
+
+        Powerplants with equal required attributes on the same weather cell
+        are calculated only once. Scaling columns (number, peak_power, area,
+        installed_capacity, see :py:func:`Base.feedin
+        <feedinlib.powerplants.Base.feedin>`) are applied per powerplant,
+        missing values fall back to the next scaling column.
+
+        Parameters
+        ----------
+        weather : FeedinWeather object or dictionary
+            The weather of all powerplants or a dictionary with weather
+            objects as values.
+        cell_column : string, optional
+            Name of the column holding the keys of the weather dictionary.
+            Mandatory if weather is a dictionary.
+        threads : int, optional
+            Number of threads sharing the model of the table. The NumPy
+            heavy stages of the models release the GIL. By default the
+            feedin is calculated in the calling thread.
+        out : numpy.array, optional
+            Array of the shape (time steps x powerplants) the results are
+            written to instead of allocating a new array, e.g. the values or
+            a block of rows of a memory-mapped :class:`ResultMatrix
+            <feedinlib.matrix.ResultMatrix>`. Values of powerplants without
+            weather cell are not changed.
+        start, end : pandas.Timestamp or string, optional
+            Calculate the feedin of this window only, see
+            :py:func:`Base.feedin <feedinlib.powerplants.Base.feedin>`.
+        \**kwargs :
+            Passed to the feedin method of the model. Scaling keyword
+            arguments take precedence over the scaling columns.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The time steps as index and the ids of the powerplants as columns.
+            If `out` is given, the DataFrame refers to it.
+
+        Raises
+        ------
+        ValueError
+            If the feedin of the weather cells has different time indexes.
+        """
+        start = kwargs.pop('start', None)
+        end = kwargs.pop('end', None)
+        required = list(self.model.required)
+        cells = isinstance(weather, dict)
+
+        # The windowed weather of each weather object (like Base._feedin)
+        # and the time steps of the window
+        windows = {}
+
+        def window(cell_weather):
+            if start is None and end is None:
+                return cell_weather
+            if id(cell_weather) not in windows:
+                windowed = cell_weather.window(
+                    start, end, padding=getattr(self.model, 'window_padding',
+                                                None))
+                windows[id(cell_weather)] = windowed
+                windows[id(windowed)] = cell_weather.window_times(start, end)
+            return windows[id(cell_weather)]
+
+        keys = [cell_column] + required if cells else required
+        frame = pd.DataFrame({k: self.columns[k] for k in keys})
+        groups = frame.groupby(keys, sort=False, observed=True).indices
+
+        tasks = []
+        for key, positions in groups.items():
+            if not isinstance(key, tuple):
+                key = (key,)
+            first = PlantView(self, positions[0])
+            parameters = {k: getattr(first, k) for k in required}
+            parameters.update(kwargs)
+            tasks.append((positions, dict(
+                weather=window(weather[key[0]] if cells else weather),
+                **parameters)))
+
+        fleet = getattr(self.model, 'fleet_feedin_with_metadata', None)
+        if fleet is not None:
+            # One batch of all powerplants per weather object, calculated
+            # by the model at once (e.g. with a stacked module matrix)
+            batches = collections.OrderedDict()
+            for task in tasks:
+                batches.setdefault(id(task[1]['weather']), []).append(task)
+            tasks = list(batches.values())
+
+            def run(batch):
+                values, index, metadata = fleet(
+                    batch[0][1]['weather'],
+                    [{k: v for k, v in parameters.items() if k != 'weather'}
+                     for positions, parameters in batch])
+                return [(index, values[:, number], metadata[number])
+                        for number in range(len(batch))]
+        else:
+            def run(task):
+                feedin, metadata = feedin_with_metadata(self.model, **task[1])
+                return [(feedin.index, np.asarray(feedin.values), metadata)]
+
+        if threads is not None and threads > 1:
+            # All threads share the model instance of the table.
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                results = list(executor.map(run, tasks))
+        else:
+            results = [run(task) for task in tasks]
+        if fleet is not None:
+            tasks = [task for batch in tasks for task in batch]
+        results = [result for batch in results for result in batch]
+
+        values = out
+        index = None
+        for (positions, parameters), (feedin_index, feedin, metadata) in zip(
+                tasks, results):
+            if start is not None or end is not None:
+                # Without the padding of the window
+                rows = feedin_index.get_level_values(-1).isin(
+                    windows[id(parameters['weather'])])
+                feedin_index = feedin_index[rows]
+                feedin = feedin[rows]
+            if index is None:
+                index = feedin_index
+            elif not feedin_index.equals(index):
+                raise ValueError(
+                    "The feedin of all weather cells must have the same "
+                    "time index. Align the weather data of the cells or "
+                    "calculate the tables of the cells separately.")
+            if values is None:
+                # Powerplants without weather cell remain NaN
+                values = np.full((len(index), len(self)), np.nan)
+            values[:, positions] = (
+                feedin[:, None] * self._factors(positions, metadata, **kwargs))
+        if index is None:
+            return pd.DataFrame(columns=self.ids)
+        return pd.DataFrame(values, index=index, columns=self.ids, copy=False)
+
+    def _factors(self, positions, metadata, **kwargs):
+        # Scaling factors of the given powerplants (see SCALING)
+        factors = np.ones(len(positions))
+        assigned = np.zeros(len(positions), dtype=bool)
+        for name, reference in SCALING:
+            if kwargs.get(name) is not None:
+                scale = np.full(len(positions), float(kwargs[name]))
+            elif name in self.columns:
+                scale = np.asarray(self.columns[name][positions], dtype=float)
+            else:
+                continue
+            use = ~assigned & ~np.isnan(scale)
+            if use.any():
+                factors[use] = scale[use] / reference(self.model, metadata)
+                assigned |= use
+        return factors
+
+
+class PlantView(Base):
+    def __init__(self, table, position):
+        r"""
+        Lightweight view of a single powerplant of a :class:`PlantTable`.
+
+        The attributes are read from the columns of the table and the model
+        of the table is used. The view behaves like a powerplant object.
+
+        Parameters
+        ----------
+        table : PlantTable
+        position : int
+            Position of the powerplant in the table.
+
+        Notes
+        -----
+        :py:func:`Base.__init__ <feedinlib.powerplants.Base.__init__>` is
+        deliberately not called. It instantiates the model and copies the
+        attributes to the object, whereas a view reads the model and the
+        attributes from its table. The required attributes are validated
+        once per column by :class:`PlantTable`, so a view is created without
+        any per-plant work.
+        """
+        self.table = table
+        self.position = position
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get('table').columns
+        if name in columns:
+            return columns[name][self.position]
+        raise AttributeError(name)
+
+    @property
+    def model(self):
+        return self.table.model
+
+    @property
+    def id(self):
+        return self.table.ids[self.position]
+
+    def feedin(self, **kwargs):
+        return super().feedin(**kwargs)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Resumable batch runs split into shards.
+
+A :class:`ShardedRun` partitions the weather cells, and with them the
+powerplants, into a fixed number of shards. The partition only depends on the
+ids of the cells, not on the order of the plant tables, so every process
+computes the same shards. Each shard is written to a directory of its own and
+is renamed into place when it is complete, so a shard directory always holds
+a complete result. The manifest of the run (manifest.json) is replaced
+atomically after every shard.
+
+A restarted run skips the completed shards. Several processes, also on
+different machines sharing a filesystem, can work on the same run: a process
+claims a shard with a lock file before it calculates it and the other
+processes skip it. A lock of a crashed process on the same machine is taken
+over automatically, locks of crashed processes on other machines have to be
+removed with :py:func:`release <feedinlib.sharded.ShardedRun.release>`.
+
+Layout of a run directory::
+
+    manifest.json           number of shards and completed shards
+    shard-00000/            results of shard 0 (e.g. a result matrix)
+        shard.json          summary of the shard
+        plants.json         ids of the powerplants of the shard
+    shard-00001.lock        shard 1 is calculated by another process
+    shard-00001.partial-*   incomplete results of shard 1
+
+Examples
+--------
+>>> from feedinlib import chunked, sharded
+>>> run = sharded.ShardedRun('results', n_shards=64)  # doctest: +SKIP
+>>> for number, shard in enumerate(
+...         sharded.partition(plants, 64)):  # doctest: +SKIP
+...     run.run(number, lambda path: chunked.ChunkedFeedin(
+...         shard, weather).run(chunked.CsvWriter(path)))
+"""
+
+import datetime
+import errno
+import glob
+import json
+import os
+import shutil
+import socket
+import time
+import zlib
+
+MANIFEST = 'manifest.json'
+
+
+def shard_number(key, n_shards):
+    r"""
+    Shard of a weather cell.
+
+    The shard is the crc32 checksum of the string of the key modulo the
+    number of shards. It does not depend on the hash seed of the Python
+    process, so it is the same in every process and on every machine.
+
+    Parameters
+    ----------
+    key : string or int
+        Id of the weather cell.
+    n_shards : int
+
+    Returns
+    -------
+    int
+    """
+    return zlib.crc32(str(key).encode('utf-8')) % n_shards
+
+
+def partition(plants, n_shards):
+    r"""
+    Split the powerplants of a chunked run into shards.
+
+    Parameters
+    ----------
+    plants : dictionary
+        Powerplants by weather cell, see :class:`ChunkedFeedin
+        <feedinlib.chunked.ChunkedFeedin>`. All powerplants of a cell are
+        part of the same shard, so the weather of a cell is only read by one
+        shard.
+    n_shards : int
+
+    Returns
+    -------
+    list of dictionaries
+        The powerplants by weather cell of each shard.
+    """
+    shards = [{} for number in range(n_shards)]
+    for cell, cell_plants in plants.items():
+        shards[shard_number(cell, n_shards)][cell] = cell_plants
+    return shards
+
+
+def _write_json(filename, data):
+    # Write to a temporary file and rename it, so that readers never see a
+    # partially written file
+    temporary = '{0}.{1}-{2}.tmp'.format(filename, socket.gethostname(),
+                                         os.getpid())
+    with open(temporary, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, filename)
+
+
+def _read_json(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ShardedRun:
+    r"""
+    Directory of a resumable run with a fixed number of shards.
+
+    Parameters
+    ----------
+    path : string
+        Directory of the run. It is created if it does not exist.
+    n_shards : int
+        Number of shards. A directory created with a different number of
+        shards raises a ValueError, because its completed shards belong to
+        a different partition.
+    """
+
+    def __init__(self, path, n_shards):
+        self.path = path
+        self.n_shards = int(n_shards)
+        if self.n_shards < 1:
+            raise ValueError("The number of shards must be positive.")
+        if not os.path.exists(path):
+            os.makedirs(path)
+        filename = os.path.join(path, MANIFEST)
+        if os.path.exists(filename):
+            existing = _read_json(filename)['n_shards']
+            if existing != self.n_shards:
+                raise ValueError(
+                    "The run in {0} has {1} shards, not {2}.".format(
+                        path, existing, self.n_shards))
+        else:
+            self.write_manifest()
+
+    def shard_path(self, shard):
+        r"""Directory of the results of a completed shard."""
+        return os.path.join(self.path, 'shard-{0:05d}'.format(shard))
+
+    def done(self, shard):
+        r"""True if the shard is complete."""
+        return os.path.isdir(self.shard_path(shard))
+
+    def pending(self):
+        r"""List of the shards which are not complete."""
+        return [shard for shard in range(self.n_shards)
+                if not self.done(shard)]
+
+    def claim(self, shard):
+        r"""
+        Try to lock a shard for this process.
+
+        Returns
+        -------
+        boolean
+            False if the shard is complete or locked by a running process.
+        """
+        if self.done(shard):
+            return False
+        lock = self.shard_path(shard) + '.lock'
+        owner = {'host': socket.gethostname(), 'pid': os.getpid()}
+        for attempt in range(2):
+            try:
+                descriptor = os.open(lock,
+                                     os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+                try:
+                    holder = _read_json(lock)
+                except (OSError, ValueError):
+                    # The lock is being written right now
+                    return False
+                if (holder.get('host') != owner['host'] or
+                        _process_alive(holder.get('pid'))):
+                    return False
+                # Left behind by a crashed process of this machine
+                os.remove(lock)
+                continue
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(owner, f)
+            # Another process may have finished the shard meanwhile
+            if self.done(shard):
+                self.release(shard)
+                return False
+            return True
+        return False
+
+    def release(self, shard):
+        r"""Remove the lock of a shard."""
+        try:
+            os.remove(self.shard_path(shard) + '.lock')
+        except FileNotFoundError:
+            pass
+
+    def run(self, shard, calculate, plants=None):
+        r"""
+        Calculate a shard unless it is complete or locked.
+
+        Parameters
+        ----------
+        shard : int
+        calculate : callable
+            Called with the directory the results of the shard are written
+            to, e.g. ``lambda path: runner.run(chunked.CsvWriter(path))``.
+            The directory does not exist yet. The value returned by the
+            callable is ignored.
+        plants : list, optional
+            Ids of the powerplants of the shard to record with its results.
+
+        Returns
+        -------
+        boolean
+            True if the shard was calculated by this call.
+        """
+        if not self.claim(shard):
+            return False
+        try:
+            for partial in glob.glob(self.shard_path(shard) + '.partial-*'):
+                shutil.rmtree(partial, ignore_errors=True)
+            partial = '{0}.partial-{1}-{2}'.format(
+                self.shard_path(shard), socket.gethostname(), os.getpid())
+            start = time.time()
+            calculate(partial)
+            if not os.path.exists(partial):
+                os.makedirs(partial)
+            if plants is not None:
+                _write_json(os.path.join(partial, 'plants.json'),
+                            [str(plant_id) for plant_id in plants])
+            _write_json(os.path.join(partial, 'shard.json'), {
+                'shard': shard,
+                'plants': None if plants is None else len(plants),
+                'seconds': time.time() - start,
+                'host': socket.gethostname(),
+                'finished': datetime.datetime.utcnow().isoformat()})
+            os.rename(partial, self.shard_path(shard))
+        finally:
+            self.release(shard)
+        self.write_manifest()
+        return True
+
+    def manifest(self):
+        r"""
+        Summary of the run read from the shard directories.
+
+        Returns
+        -------
+        dictionary
+            The number of shards and the summaries of the completed shards
+            by shard number.
+        """
+        shards = {}
+        for shard in range(self.n_shards):
+            filename = os.path.join(self.shard_path(shard), 'shard.json')
+            if os.path.exists(filename):
+                shards[str(shard)] = _read_json(filename)
+        return {'n_shards': self.n_shards, 'completed': len(shards),
+                'shards': shards}
+
+    def write_manifest(self):
+        r"""Replace manifest.json with the current :py:func:`manifest
+        <feedinlib.sharded.ShardedRun.manifest>`."""
+        _write_json(os.path.join(self.path, MANIFEST), self.manifest())
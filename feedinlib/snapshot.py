@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Warm-start snapshots of prepared models and weather data.
+
+A fresh worker process has to read the module library, the power curves of
+the wind turbines and the weather data and has to calculate the position of
+the sun before it can calculate any feedin. A :class:`Snapshot` stores this
+prepared state in a single local file:
+
+* the records of the pv modules
+* the power curves and nominal power of the wind turbines and the steps of
+  their lookup tables (see :class:`PowerCurveTable
+  <feedinlib.models.PowerCurveTable>`)
+* the weather data as binary arrays
+* the position of the sun, the extraterrestrial radiation and the air mass
+  of each weather object (see :py:func:`PvlibBased.solar_geometry
+  <feedinlib.models.PvlibBased.solar_geometry>`)
+
+The file is an uncompressed numpy npz-archive with the meta data as json, so
+loading it does not need to parse any text files or to unpickle objects.
+
+Examples
+--------
+Prepare the snapshot once:
+
+>>> from feedinlib import snapshot
+>>> state = snapshot.Snapshot()
+>>> state.add_modules(['Yingli_YL210__2008__E__'])  # doctest: +SKIP
+>>> state.add_turbines(['ENERCON E 126 7500'], steps=[0.01])  # doctest: +SKIP
+>>> state.add_weather('cell_1', my_weather)  # doctest: +SKIP
+>>> state.save('warm_start.npz')  # doctest: +SKIP
+
+and load it in every worker:
+
+>>> state = snapshot.Snapshot.load('warm_start.npz')  # doctest: +SKIP
+>>> state.install()  # doctest: +SKIP
+>>> my_weather = state.weather['cell_1']  # doctest: +SKIP
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import models
+from . import weather as fweather
+
+GEOMETRY = 'PvlibBased.solar_geometry'
+
+
+def _frame_arrays(prefix, frame, arrays):
+    # One array per column, so that mixed column types are kept
+    for number, column in enumerate(frame.columns):
+        arrays['{0}/{1}'.format(prefix, number)] = np.asarray(frame[column])
+    return [str(column) for column in frame.columns]
+
+
+def _frame(prefix, columns, index, archive):
+    return pd.DataFrame(
+        {column: archive['{0}/{1}'.format(prefix, number)]
+         for number, column in enumerate(columns)},
+        index=index, columns=columns)
+
+
+def _index_arrays(prefix, index, arrays):
+    timezone = None if index.tz is None else str(index.tz)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    arrays[prefix] = index.asi8
+    return timezone
+
+
+def _index(prefix, timezone, archive):
+    index = pd.DatetimeIndex(archive[prefix].view('M8[ns]'))
+    if timezone is not None:
+        index = index.tz_localize('UTC').tz_convert(timezone)
+    return index
+
+
+def _json_value(value):
+    # numpy scalars are not serializable by json
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class Snapshot:
+    r"""
+    Prepared state of models and weather data.
+
+    Attributes
+    ----------
+    modules : dictionary
+        Module records (pandas.Series) by module name.
+    turbines : dictionary
+        Power coefficients (pandas.DataFrame) and nominal power by wind
+        turbine type.
+    steps : list of floats
+        Steps of the power curve tables prepared for all wind turbines.
+    weather : dictionary
+        FeedinWeather objects by key. The solar geometry is part of their
+        cache of derived quantities.
+    """
+
+    def __init__(self):
+        self.modules = {}
+        self.turbines = {}
+        self.steps = []
+        self.weather = {}
+
+    def add_modules(self, module_names):
+        r"""
+        Add the records of pv modules (see :py:func:`fetch_module_data
+        <feedinlib.models.PvlibBased.fetch_module_data>`).
+        """
+        pv_model = models.PvlibBased()
+        for name in module_names:
+            self.modules[name] = pv_model.fetch_module_data(module_name=name)
+
+    def add_turbines(self, wind_conv_types, steps=()):
+        r"""
+        Add the power curves of wind turbine types (see
+        :py:func:`turbine_data <feedinlib.models.turbine_data>`).
+
+        Parameters
+        ----------
+        wind_conv_types : list of strings
+        steps : list of floats, optional
+            Steps of power curve tables to prepare (see the option
+            power_curve_step of :class:`SimpleWindTurbine
+            <feedinlib.models.SimpleWindTurbine>`).
+        """
+        for name in wind_conv_types:
+            self.turbines[name] = models.turbine_data(name)
+        self.steps = sorted(set(self.steps) | set(float(s) for s in steps))
+
+    def add_weather(self, key, weather, geometry=True, **kwargs):
+        r"""
+        Add a weather object.
+
+        Parameters
+        ----------
+        key : string
+            Key of the weather object in the snapshot.
+        weather : FeedinWeather object
+        geometry : boolean, optional
+            Calculate and store the solar geometry as well (default: True).
+            Requires latitude, longitude and timezone of the weather object.
+        \**kwargs :
+            Passed to :py:func:`PvlibBased.solar_geometry
+            <feedinlib.models.PvlibBased.solar_geometry>`.
+        """
+        if geometry:
+            models.PvlibBased().solar_geometry(weather=weather, **kwargs)
+        self.weather[key] = weather
+
+    def install(self):
+        r"""
+        Make the modules, turbines and power curve tables of the snapshot
+        available to the models of this process.
+        """
+        models.MODULES.update(self.modules)
+        models.TURBINES.update(self.turbines)
+        for name in self.turbines:
+            for step in self.steps:
+                models.power_curve_table(name, step)
+        return self
+
+    def save(self, filename):
+        r"""
+        Write the snapshot to an uncompressed npz-file.
+        """
+        arrays = {}
+        meta = {'modules': {}, 'turbines': {}, 'steps': self.steps,
+                'weather': []}
+        for name, module_data in self.modules.items():
+            meta['modules'][name] = {
+                key: _json_value(value) for key, value in module_data.items()}
+        for number, (name, (cp_values, nominal_power)) in enumerate(
+                self.turbines.items()):
+            arrays['turbines/{0}/v_wind'.format(number)] = np.asarray(
+                cp_values.index, dtype=float)
+            arrays['turbines/{0}/cp'.format(number)] = np.asarray(
+                cp_values.cp, dtype=float)
+            meta['turbines'][name] = {'number': number,
+                                      'nominal_power': float(nominal_power)}
+        for number, (key, weather) in enumerate(self.weather.items()):
+            prefix = 'weather/{0}'.format(number)
+            entry = {
+                'key': key, 'longitude': _json_value(weather.longitude),
+                'latitude': _json_value(weather.latitude),
+                'timezone': (str(weather.timezone)
+                             if weather.timezone is not None else None),
+                'data_height': weather.data_height, 'name': weather.name,
+                'geometry': (weather.geometry.wkt
+                             if weather.geometry is not None else None),
+                'index_timezone': _index_arrays(
+                    prefix + '/index', weather.data.index, arrays),
+                'columns': _frame_arrays(prefix + '/data', weather.data,
+                                         arrays)}
+            solar = weather._derived.get(GEOMETRY)
+            if solar is not None:
+                entry['solar_timezone'] = _index_arrays(
+                    prefix + '/solar_index', solar.index, arrays)
+                entry['solar_columns'] = _frame_arrays(
+                    prefix + '/solar', solar, arrays)
+            meta['weather'].append(entry)
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode(),
+                                       dtype=np.uint8)
+        with open(filename, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        r"""
+        Read a snapshot written by :py:func:`save
+        <feedinlib.snapshot.Snapshot.save>`.
+
+        Returns
+        -------
+        Snapshot
+            Call :py:func:`install <feedinlib.snapshot.Snapshot.install>` to
+            use its modules and turbines.
+        """
+        snapshot = cls()
+        with np.load(filename, allow_pickle=False) as archive:
+            meta = json.loads(archive['meta'].tobytes().decode())
+            snapshot.steps = meta['steps']
+            for name, record in meta['modules'].items():
+                snapshot.modules[name] = pd.Series(record, name=name)
+            for name, entry in meta['turbines'].items():
+                prefix = 'turbines/{0}'.format(entry['number'])
+                cp_values = pd.DataFrame(
+                    {'cp': archive[prefix + '/cp']},
+                    index=pd.Index(archive[prefix + '/v_wind'],
+                                   name='v_wind'))
+                snapshot.turbines[name] = (cp_values, entry['nominal_power'])
+            for number, entry in enumerate(meta['weather']):
+                prefix = 'weather/{0}'.format(number)
+                index = _index(prefix + '/index', entry['index_timezone'],
+                               archive)
+                geometry = entry['geometry']
+                if geometry is not None:
+                    from shapely import wkt
+                    geometry = wkt.loads(geometry)
+                weather = fweather.FeedinWeather(
+                    data=_frame(prefix + '/data', entry['columns'], index,
+                                archive),
+                    timezone=entry['timezone'],
+                    longitude=entry['longitude'],
+                    latitude=entry['latitude'], geometry=geometry,
+                    data_height=entry['data_height'], name=entry['name'])
+                if 'solar_columns' in entry:
+                    solar_index = _index(prefix + '/solar_index',
+                                         entry['solar_timezone'], archive)
+                    weather.derived(GEOMETRY, lambda w: _frame(
+                        prefix + '/solar', entry['solar_columns'],
+                        solar_index, archive))
+                snapshot.weather[entry['key']] = weather
+        return snapshot
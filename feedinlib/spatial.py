@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Spatial index to assign powerplants to weather cells.
+
+Looping over all weather cells for every powerplant is O(plants x cells).
+The :class:`WeatherIndex` builds a KD-tree on the coordinates of a set of
+weather objects once and assigns arrays of plant coordinates to their nearest
+or containing weather cell in one vectorized call.
+
+The KD-tree of scipy is used if scipy is installed, otherwise a blockwise
+brute-force search with numpy is used. The containment query uses the
+geometry attribute of the weather objects and requires shapely >= 2.0.
+"""
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+EARTH_RADIUS = 6371.0
+
+
+def _unit_vectors(longitude, latitude):
+    # Points on the unit sphere, so that the euclidean distance is a
+    # monotonic function of the great circle distance.
+    lon = np.radians(np.asarray(longitude, dtype=float))
+    lat = np.radians(np.asarray(latitude, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon),
+                            np.cos(lat) * np.sin(lon),
+                            np.sin(lat)])
+
+
+class WeatherIndex:
+    r"""
+    Spatial index over a set of weather objects.
+
+    Parameters
+    ----------
+    weather : list of FeedinWeather objects
+        The weather objects must have a latitude and a longitude. For the
+        containment query they need a geometry as well.
+    block_size : int, optional
+        Number of points processed at once by the brute-force search, which
+        is used if scipy is not installed (default: 10000).
+
+    Examples
+    --------
+    >>> from feedinlib import spatial
+    >>> index = spatial.WeatherIndex(weather_objects)  # doctest: +SKIP
+    >>> cells = index.query(
+    ...     plants.longitude, plants.latitude)  # doctest: +SKIP
+    """
+
+    def __init__(self, weather, block_size=10000):
+        self.weather = list(weather)
+        self.longitude = np.array([w.longitude for w in self.weather],
+                                  dtype=float)
+        self.latitude = np.array([w.latitude for w in self.weather],
+                                 dtype=float)
+        self.block_size = block_size
+        self._points = _unit_vectors(self.longitude, self.latitude)
+        self._tree = cKDTree(self._points) if cKDTree is not None else None
+        self._geometry_tree = None
+
+    def __len__(self):
+        return len(self.weather)
+
+    def nearest(self, longitude, latitude):
+        r"""
+        Nearest weather cell of each point.
+
+        Parameters
+        ----------
+        longitude, latitude : array-like
+            Coordinates of the points in degrees.
+
+        Returns
+        -------
+        tuple of numpy.arrays
+            The positions of the nearest weather objects in the list of
+            weather objects and the great circle distances in km.
+        """
+        points = _unit_vectors(longitude, latitude)
+        if self._tree is not None:
+            chord, position = self._tree.query(points)
+        else:
+            position = np.empty(len(points), dtype=int)
+            chord = np.empty(len(points))
+            for first in range(0, len(points), self.block_size):
+                block = points[first:first + self.block_size]
+                # Squared chord lengths of all pairs of the block
+                squared = 2 - 2 * block.dot(self._points.T)
+                position[first:first + len(block)] = squared.argmin(axis=1)
+                chord[first:first + len(block)] = np.sqrt(np.maximum(
+                    squared.min(axis=1), 0))
+        distance = 2 * EARTH_RADIUS * np.arcsin(np.minimum(chord / 2, 1))
+        return np.asarray(position, dtype=int), distance
+
+    def containing(self, longitude, latitude):
+        r"""
+        Weather cell whose geometry contains each point.
+
+        Parameters
+        ----------
+        longitude, latitude : array-like
+            Coordinates of the points in degrees.
+
+        Returns
+        -------
+        numpy.array
+            The positions of the containing weather objects in the list of
+            weather objects, -1 for points outside all geometries. If a point
+            lies within several geometries (e.g. on a shared border) the
+            first weather object is used.
+        """
+        if shapely is None or not hasattr(shapely, 'STRtree'):
+            raise ImportError(
+                "The containment query requires shapely >= 2.0.")
+        if self._geometry_tree is None:
+            self._geometry_tree = shapely.STRtree(
+                [w.geometry for w in self.weather])
+        points = shapely.points(np.asarray(longitude, dtype=float),
+                                np.asarray(latitude, dtype=float))
+        point_position, cell_position = self._geometry_tree.query(
+            points, predicate='intersects')
+        position = np.full(len(points), -1, dtype=int)
+        # Assign in reverse order, so that the first cell wins
+        order = np.lexsort((-cell_position, point_position))
+        position[point_position[order]] = cell_position[order]
+        return position
+
+    def query(self, longitude, latitude, how='nearest', max_distance=None):
+        r"""
+        Assign points to weather cells.
+
+        Parameters
+        ----------
+        longitude, latitude : array-like
+            Coordinates of the points in degrees.
+        how : string, optional
+            'nearest' (default) to use the weather cell with the nearest
+            coordinates, 'contains' to use the weather cell whose geometry
+            contains the point or 'contains_or_nearest' to use the nearest
+            cell for points outside all geometries.
+        max_distance : float, optional
+            Points whose nearest weather cell is further away (in km) are
+            not assigned (only used by the nearest search).
+
+        Returns
+        -------
+        numpy.array
+            Positions of the assigned weather objects in the list of weather
+            objects, -1 for unassigned points.
+        """
+        if how == 'contains':
+            return self.containing(longitude, latitude)
+        if how not in ('nearest', 'contains_or_nearest'):
+            raise ValueError("Unknown query type: {0}".format(how))
+        position, distance = self.nearest(longitude, latitude)
+        if max_distance is not None:
+            position[distance > max_distance] = -1
+        if how == 'contains_or_nearest':
+            inside = self.containing(longitude, latitude)
+            position = np.where(inside >= 0, inside, position)
+        return position
+
+    def weather_of(self, longitude, latitude, **kwargs):
+        r"""
+        Like :py:func:`query <feedinlib.spatial.WeatherIndex.query>` but
+        returns the weather objects (None for unassigned points).
+        """
+        return [self.weather[i] if i >= 0 else None
+                for i in self.query(longitude, latitude, **kwargs)]
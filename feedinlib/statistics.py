@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+
+Streaming statistics of feedin time series.
+
+Most reports only need a few numbers per powerplant: the annual energy, the
+full load hours, the capacity factor of each month, P50/P90 values and the
+duration curve. :class:`FeedinStatistics` reduces the feedin block by block
+while a batch run produces it, so the time series of all powerplants never
+have to be stored. It has the interface of a writer of
+:py:func:`ChunkedFeedin.run <feedinlib.chunked.ChunkedFeedin.run>` and of the
+``feedinlib`` command (output format 'statistics').
+
+Sums (energy per year and month) are exact. The duration curve and the
+quantiles of the power are approximate: they are taken from a histogram of
+the power relative to the capacity of each powerplant, so their error is at
+most the width of a bin (capacity / bins).
+
+The reducers are an option of the batch run, see
+:py:func:`ChunkedFeedin.statistics
+<feedinlib.chunked.ChunkedFeedin.statistics>`.
+
+Examples
+--------
+>>> from feedinlib import chunked
+>>> reducer = chunked.ChunkedFeedin(plants, weather).statistics(
+...     capacity=capacities)  # doctest: +SKIP
+>>> reducer.summary()  # doctest: +SKIP
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+MONTHS = list(range(1, 13))
+
+
+class FeedinStatistics:
+    r"""
+    One-pass reducer of the feedin of many powerplants.
+
+    The energy sums are exact. The duration curve and the quantiles of the
+    power are approximated by a histogram with `bins` bins between zero and
+    the capacity: the duration curve is only known at the edges of the
+    bins, and the quantiles are off by at most the width of a bin
+    (capacity / bins). Power above the capacity is counted in the last bin,
+    so quantiles above the capacity are underestimated.
+
+    Parameters
+    ----------
+    plants : list
+        The ids of the powerplants.
+    capacity : array-like or dictionary, optional
+        Capacity of the powerplants in the unit of the feedin (e.g. the
+        installed capacity or the peak power in W) in the order of the ids
+        or as a dictionary with the ids as keys. Without capacity the full
+        load hours, the capacity factors, the duration curve and the
+        quantiles of the power are not available (NaN).
+    interval : float, optional
+        Length of a time step in hours (default: 1).
+    bins : int, optional
+        Number of bins of the duration curve between zero and the capacity
+        (default: 100).
+    path : string, optional
+        Directory the results are saved to (see :py:func:`save
+        <feedinlib.statistics.FeedinStatistics.save>`) when the reducer is
+        closed.
+
+    Attributes
+    ----------
+    plants : pandas.Index
+        The ids of the powerplants.
+    capacity : numpy.array
+    """
+
+    def __init__(self, plants, capacity=None, interval=1., bins=100,
+                 path=None):
+        self.plants = pd.Index(plants)
+        n = len(self.plants)
+        if capacity is None:
+            capacity = np.full(n, np.nan)
+        elif isinstance(capacity, (dict, pd.Series)):
+            capacity = pd.Series(capacity).reindex(self.plants).values
+        self.capacity = np.asarray(capacity, dtype=float)
+        self.interval = float(interval)
+        self.bins = int(bins)
+        self.path = path
+        self._years = {}
+        self._month_energy = np.zeros((n, 12))
+        self._month_steps = np.zeros((n, 12), dtype=np.int64)
+        self._histogram = np.zeros((n, self.bins), dtype=np.int64)
+
+    def write(self, result):
+        r"""
+        Add a block of results.
+
+        Parameters
+        ----------
+        result : pandas.DataFrame
+            The feedin with the time steps as index and ids of the
+            powerplants as columns (see :py:func:`ChunkedFeedin.iter_results
+            <feedinlib.chunked.ChunkedFeedin.iter_results>`). Each time step
+            of a powerplant must be written once. Missing values are
+            ignored.
+        """
+        positions = self.plants.get_indexer(result.columns)
+        if (positions < 0).any():
+            raise KeyError("Unknown powerplants: {0}".format(
+                list(result.columns[positions < 0])))
+        values = np.asarray(result.values, dtype=float)
+        valid = ~np.isnan(values)
+        energy = np.where(valid, values, 0) * self.interval
+        times = result.index.get_level_values(-1)
+
+        for year in np.unique(times.year):
+            rows = times.year == year
+            if year not in self._years:
+                self._years[year] = np.zeros(len(self.plants))
+            self._years[year][positions] += energy[rows].sum(axis=0)
+
+        months = times.month - 1
+        for month in np.unique(months):
+            rows = months == month
+            self._month_energy[positions, month] += energy[rows].sum(axis=0)
+            self._month_steps[positions, month] += valid[rows].sum(axis=0)
+
+        # Histogram of the power relative to the capacity, values above the
+        # capacity count to the last bin, values below zero to the first
+        capacity = self.capacity[positions]
+        known = valid & ~np.isnan(capacity)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bins = np.floor(values / capacity * self.bins)
+        bins = np.clip(np.where(known, bins, 0), 0, self.bins - 1).astype(
+            np.int64)
+        columns = np.broadcast_to(np.arange(len(positions)), values.shape)
+        counts = np.bincount((columns * self.bins + bins)[known],
+                             minlength=len(positions) * self.bins)
+        self._histogram[positions] += counts.reshape(len(positions),
+                                                     self.bins)
+
+    def close(self):
+        r"""Save the results if a path is given."""
+        if self.path is not None:
+            self.save(self.path)
+
+    def annual_energy(self):
+        r"""
+        Energy of each calendar year (feedin x hours).
+
+        Returns
+        -------
+        pandas.DataFrame
+            The ids of the powerplants as index and the years as columns.
+            Years at the beginning or end of the data may be incomplete.
+        """
+        years = sorted(self._years)
+        return pd.DataFrame(
+            np.column_stack([self._years[year] for year in years])
+            if years else np.zeros((len(self.plants), 0)),
+            index=self.plants, columns=years)
+
+    def full_load_hours(self):
+        r"""
+        Full load hours of each calendar year (plant x year).
+        """
+        return self.annual_energy().div(self.capacity, axis=0)
+
+    def monthly_capacity_factor(self):
+        r"""
+        Capacity factor of each calendar month over all years.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The ids of the powerplants as index and the months (1 to 12) as
+            columns. Months without data are NaN.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = self._month_energy / (
+                self._month_steps * self.interval * self.capacity[:, None])
+        return pd.DataFrame(factor, index=self.plants, columns=MONTHS)
+
+    def duration_curve(self):
+        r"""
+        Hours with a power of at least the lower edge of each bin.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The ids of the powerplants as index and the lower edges of the
+            bins relative to the capacity as columns.
+        """
+        hours = np.cumsum(self._histogram[:, ::-1], axis=1)[:, ::-1]
+        hours = hours * self.interval
+        hours = np.where(np.isnan(self.capacity)[:, None], np.nan, hours)
+        return pd.DataFrame(hours, index=self.plants,
+                            columns=np.arange(self.bins) / self.bins)
+
+    def power_quantiles(self, q=(0.5, 0.9)):
+        r"""
+        Approximate quantiles of the power from the duration curve.
+
+        The quantiles are interpolated linearly within the bin of the
+        histogram holding them, so the error is at most the width of a bin
+        (capacity / bins) unless the power exceeds the capacity.
+
+        Parameters
+        ----------
+        q : list of floats, optional
+            The quantiles between 0 and 1 (default: 0.5, 0.9).
+
+        Returns
+        -------
+        pandas.DataFrame
+            The ids of the powerplants as index and the quantiles (in the
+            unit of the feedin, linearly interpolated within the bins) as
+            columns.
+        """
+        counts = self._histogram
+        total = counts.sum(axis=1)
+        cumulative = np.cumsum(counts, axis=1)
+        result = np.full((len(self.plants), len(q)), np.nan)
+        for column, quantile in enumerate(q):
+            target = quantile * total
+            # First bin reaching the quantile and the share of it below
+            position = (cumulative < target[:, None]).sum(axis=1)
+            position = np.minimum(position, self.bins - 1)
+            rows = np.arange(len(self.plants))
+            before = np.where(position > 0, cumulative[
+                rows, np.maximum(position - 1, 0)], 0)
+            inside = counts[rows, position]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                share = np.where(inside > 0, (target - before) / inside, 0)
+            result[:, column] = ((position + share) / self.bins *
+                                 self.capacity)
+        result[total == 0] = np.nan
+        return pd.DataFrame(result, index=self.plants, columns=list(q))
+
+    def summary(self):
+        r"""
+        Summary of each powerplant.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The ids of the powerplants as index and the columns
+            annual_energy (mean over the years), full_load_hours (mean over
+            the years), capacity_factor, P50 and P90 (annual energy exceeded
+            in 50% respectively 90% of the years).
+        """
+        annual = self.annual_energy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            capacity_factor = self._month_energy.sum(axis=1) / (
+                self._month_steps.sum(axis=1) * self.interval *
+                self.capacity)
+        if annual.shape[1]:
+            p50, p90 = np.quantile(annual.values, [0.5, 0.1], axis=1)
+        else:
+            p50 = p90 = np.full(len(self.plants), np.nan)
+        return pd.DataFrame({
+            'annual_energy': annual.mean(axis=1),
+            'full_load_hours': annual.mean(axis=1) / self.capacity,
+            'capacity_factor': capacity_factor,
+            'P50': p50, 'P90': p90}, index=self.plants)
+
+    def save(self, path):
+        r"""
+        Write the summary, the annual energy, the monthly capacity factors
+        and the duration curves as csv-files to a directory.
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.summary().to_csv(os.path.join(path, 'summary.csv'))
+        self.annual_energy().to_csv(os.path.join(path, 'annual_energy.csv'))
+        self.monthly_capacity_factor().to_csv(
+            os.path.join(path, 'monthly_capacity_factor.csv'))
+        self.duration_curve().to_csv(
+            os.path.join(path, 'duration_curve.csv'))
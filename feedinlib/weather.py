@@ -5,8 +5,18 @@ Created on Fri Oct  9 16:01:02 2015
 @author: uwe
 """
 
+import copy
+import io
+import json
+import logging
+import os
+
+import numpy as np
 import pandas as pd
 
+# Suffix of the sidecar files with the byte offsets of feedinlib csv-files
+CSV_INDEX_SUFFIX = '.index.json'
+
 
 class FeedinWeather:
     def __init__(self, **kwargs):
@@ -37,6 +47,10 @@ class FeedinWeather:
         Depending on the used feedin modell some of the optional parameters
         might be mandatory.
 
+        Columns derived from the weather data (see :py:func:`derived
+        <feedinlib.weather.FeedinWeather.derived>`) are cached until the data
+        attribute is replaced.
+
         References
         ----------
         .. [40] `IANA time zone database <http://www.iana.org/time-zones>`_.
@@ -53,7 +67,162 @@ class FeedinWeather:
         self.data_height = kwargs.get('data_height', None)
         self.name = kwargs.get('name', None)
 
-    def read_feedinlib_csv(self, filename, overwrite=True):
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self.clear_derived()
+
+    def derived(self, name, function):
+        r"""
+        Memoized time series derived from the weather data only.
+
+        Quantities like the extraterrestrial radiation or the position of the
+        sun depend only on the weather cell and not on the powerplant. They
+        are calculated once and shared by all powerplants using this weather
+        object. The cache is cleared if the data attribute is replaced.
+
+        Parameters
+        ----------
+        name : string
+            Key of the derived quantity. It must contain all parameters the
+            quantity depends on apart from the weather object.
+        function : callable
+            Called with the weather object to calculate the quantity if it is
+            not cached.
+
+        Returns
+        -------
+        The cached result of the function.
+
+        Notes
+        -----
+        Modifying the data in place is not detected. Call
+        :py:func:`clear_derived
+        <feedinlib.weather.FeedinWeather.clear_derived>` after changing the
+        data in place.
+
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> from feedinlib import weather
+        >>> my_weather = weather.FeedinWeather(data=pd.DataFrame(
+        ...     {'dirhi': [0., 100.], 'dhi': [0., 50.]}))
+        >>> ghi = my_weather.derived(
+        ...     'ghi', lambda w: w.data.dirhi + w.data.dhi)
+        >>> print(ghi.tolist())
+        [0.0, 150.0]
+        """
+        if name not in self._derived:
+            self._derived[name] = function(self)
+        return self._derived[name]
+
+    def clear_derived(self):
+        r"""Remove all cached derived quantities."""
+        self._derived = {}
+
+    @property
+    def times(self):
+        r"""The time steps of the weather data (without duplicates)."""
+        return self.data.index
+
+    def window_times(self, start=None, end=None):
+        r"""
+        Time steps of the weather data between start and end.
+
+        Parameters
+        ----------
+        start, end : pandas.Timestamp or string, optional
+            First and last time of the window (both inclusive). Strings are
+            interpreted like the partial string indexing of pandas, e.g.
+            end='2010-01' includes all time steps of January 2010. Times
+            without time zone refer to the time zone of the data. By default
+            the window is open.
+
+        Returns
+        -------
+        pandas.DatetimeIndex
+        """
+        times = self.times
+        return times[times.slice_indexer(_timestamp(start, times.tz),
+                                         _timestamp(end, times.tz))]
+
+    def window(self, start=None, end=None, padding=None):
+        r"""
+        Weather object with the data between start and end only.
+
+        Parameters
+        ----------
+        start, end : pandas.Timestamp or string, optional
+            See :py:func:`window_times
+            <feedinlib.weather.FeedinWeather.window_times>`.
+        padding : pandas.Timedelta, optional
+            Extend the window by this time on both sides.
+
+        Returns
+        -------
+        FeedinWeather object
+            A shallow copy of the weather object (of the same class) with the
+            selected rows. The derived quantities are not copied.
+        """
+        times = self.window_times(start, end)
+        if padding is not None and len(times):
+            times = self.window_times(times[0] - padding, times[-1] + padding)
+        rows = self.data.index.get_level_values(-1)
+        windowed = copy.copy(self)
+        windowed.data = self.data[rows.isin(times)]
+        return windowed
+
+    def expand(self, data):
+        r"""
+        Align data indexed by time with the rows of the weather data.
+
+        Quantities depending only on the time (e.g. the position of the sun)
+        are calculated for :py:attr:`times
+        <feedinlib.weather.FeedinWeather.times>`. Weather objects whose rows
+        repeat the time steps (see :class:`EnsembleWeather
+        <feedinlib.ensemble.EnsembleWeather>`) override this method.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame or pandas.Series
+            Indexed by the time steps.
+
+        Returns
+        -------
+        pandas.DataFrame or pandas.Series
+            The data with the index of the weather data.
+        """
+        return data
+
+    @classmethod
+    def from_arrow(cls, table, time_column='time'):
+        r"""
+        Create a weather object from a pyarrow.Table or pyarrow.RecordBatch
+        without copying the numeric columns.
+
+        See :py:func:`weather_from_arrow
+        <feedinlib.arrow.weather_from_arrow>` for details.
+        """
+        from . import arrow
+        return arrow.weather_from_arrow(table, time_column=time_column)
+
+    def to_arrow(self, time_column='time'):
+        r"""
+        Convert the weather object to a pyarrow.Table keeping the meta data
+        in the schema meta data.
+
+        See :py:func:`weather_to_arrow <feedinlib.arrow.weather_to_arrow>`
+        for details.
+        """
+        from . import arrow
+        return arrow.weather_to_arrow(self, time_column=time_column)
+
+    def read_feedinlib_csv(self, filename, overwrite=True, start=None,
+                           end=None):
         r"""
         Reading a csv-file with a header containg the meta data of the time
         series.
@@ -88,6 +257,13 @@ class FeedinWeather:
             If False the only class attributes of NoneType will be overwritten
             with the data of the csv file. If True all class attributes will
             be overwriten with the data of the csv-file.
+        start, end : pandas.Timestamp or string, optional
+            Read only the time steps of this window (see
+            :py:func:`window_times
+            <feedinlib.weather.FeedinWeather.window_times>`). The reader seeks
+            to the window using the byte offsets of the sidecar index of the
+            file (see :py:func:`csv_index <feedinlib.weather.csv_index>`),
+            which is created on first use.
 
         Raises
         ------
@@ -122,10 +298,16 @@ class FeedinWeather:
 
         # Read weather data
         if self.data is None or overwrite:
-            df = pd.read_csv(filename, skiprows=skiprows)
+            if start is None and end is None:
+                df = pd.read_csv(filename, skiprows=skiprows)
+            else:
+                df = _read_csv_window(filename, start, end,
+                                      meta_dict.get('timezone'))
             self.data = df.set_index(
-                pd.to_datetime(df['Unnamed: 0'])).tz_localize(
-                'UTC').tz_convert(self.timezone).drop('Unnamed: 0', 1)
+                pd.to_datetime(df['Unnamed: 0'], utc=True)).tz_convert(
+                self.timezone).drop('Unnamed: 0', 1)
+            if start is not None or end is not None:
+                self.data = self.data.loc[self.window_times(start, end)]
 
         # Define height dict
         self.data_height = {}
@@ -133,3 +315,124 @@ class FeedinWeather:
             self.data_height[key] = float(
                 meta_dict.get('data_height' + key, 0))
         return self
+
+
+def _timestamp(value, timezone):
+    # Times without time zone refer to the given time zone, strings are kept
+    # for the partial string indexing of pandas
+    if value is None or isinstance(value, str):
+        return value
+    value = pd.Timestamp(value)
+    if value.tz is None and timezone is not None:
+        value = value.tz_localize(timezone)
+    return value
+
+
+def build_csv_index(filename, freq='D'):
+    r"""
+    Create the sidecar index of a feedinlib csv-file.
+
+    The index stores the byte offset of the first row of each period (day
+    or month) of the file. It is written as json to the file filename +
+    `CSV_INDEX_SUFFIX` if the directory is writable.
+
+    Parameters
+    ----------
+    filename : string
+        A feedinlib csv-file (see :py:func:`FeedinWeather.read_feedinlib_csv
+        <feedinlib.weather.FeedinWeather.read_feedinlib_csv>`).
+    freq : string, optional
+        'D' (default) for one offset per day or 'M' for one per month (UTC).
+
+    Returns
+    -------
+    dictionary
+        The size and modification time of the csv-file, the offsets of the
+        header line (`header`) and of the first row (`data`), the start of
+        the periods (`periods`, nanoseconds since 1970-01-01 UTC) and the
+        offsets of their first rows (`offsets`).
+    """
+    stat = os.stat(filename)
+    offset = 0
+    times, offsets = [], []
+    with open(filename, 'rb') as f:
+        # The meta data ends with a blank line followed by the header line
+        for line in f:
+            offset += len(line)
+            if not line[2:].strip():
+                break
+        header = offset
+        offset += len(f.readline())
+        data = offset
+        for line in f:
+            times.append(line.split(b',', 1)[0].decode())
+            offsets.append(offset)
+            offset += len(line)
+    times = pd.DatetimeIndex(pd.to_datetime(times, utc=True))
+    periods = times.tz_convert('UTC').tz_localize(None).to_period(
+        freq).to_timestamp().asi8
+    first = np.flatnonzero(np.r_[True, np.diff(periods) != 0])
+    index = {'size': stat.st_size, 'mtime': stat.st_mtime, 'freq': freq,
+             'header': header, 'data': data,
+             'periods': periods[first].tolist(),
+             'offsets': np.asarray(offsets, dtype=np.int64)[first].tolist()}
+    try:
+        with open(filename + CSV_INDEX_SUFFIX, 'w') as f:
+            json.dump(index, f)
+    except OSError:
+        logging.warning("The index of {0} could not be written.".format(
+            filename))
+    return index
+
+
+def csv_index(filename, freq='D'):
+    r"""
+    Sidecar index of a feedinlib csv-file.
+
+    The index is read from the sidecar file if it belongs to the current
+    version of the csv-file (same size and modification time), otherwise it
+    is created (see :py:func:`build_csv_index
+    <feedinlib.weather.build_csv_index>`).
+
+    Examples
+    --------
+    >>> from feedinlib import weather
+    >>> index = weather.csv_index('weather.csv')  # doctest: +SKIP
+    >>> my_weather = weather.FeedinWeather()
+    >>> my_weather.read_feedinlib_csv(
+    ...     'weather.csv', start='2010-06', end='2010-06')  # doctest: +SKIP
+    """
+    stat = os.stat(filename)
+    try:
+        with open(filename + CSV_INDEX_SUFFIX) as f:
+            index = json.load(f)
+        if (index['size'] == stat.st_size and
+                index['mtime'] == stat.st_mtime):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return build_csv_index(filename, freq=freq)
+
+
+def _read_csv_window(filename, start, end, timezone):
+    # Read the header line and the rows of all periods touching the window
+    index = csv_index(filename)
+    periods = pd.DatetimeIndex(np.asarray(
+        index['periods'], dtype=np.int64).view('M8[ns]')).tz_localize('UTC')
+    if timezone is not None:
+        periods = periods.tz_convert(timezone)
+    offsets = index['offsets'] + [index['size']]
+    first, last = 0, len(periods)
+    if start is not None:
+        # One period more than necessary if the window starts with a period
+        first = max(periods.slice_indexer(
+            _timestamp(start, periods.tz), None).start - 1, 0)
+    if end is not None:
+        last = periods.slice_indexer(
+            None, _timestamp(end, periods.tz)).stop
+    with open(filename, 'rb') as f:
+        f.seek(index['header'])
+        header = f.read(index['data'] - index['header'])
+        f.seek(offsets[first])
+        rows = f.read(max(offsets[last] - offsets[first], 0))
+    return pd.read_csv(io.BytesIO(header + rows))
@@ -5,10 +5,16 @@
 
 import sys
 import os
+import re
 from setuptools import setup
 
+# The version is defined in feedinlib/__init__.py only
+with open(os.path.join(os.path.dirname(__file__), 'feedinlib',
+                       '__init__.py')) as f:
+    version = re.search(r'__version__ = "(.*)"', f.read()).group(1)
+
 setup(name='feedinlib',
-      version='0.0.12',
+      version=version,
       description='Creating time series from pv or wind power plants.',
       url='http://github.com/oemof/feedinlib',
       author='oemof developing group',
@@ -16,8 +22,10 @@ setup(name='feedinlib',
       license='GPL3',
       packages=['feedinlib'],
       zip_safe=False,
-      install_requires=['numpy >= 1.7.0',
-                        'pandas >= 0.13.1',
+      entry_points={
+          'console_scripts': ['feedinlib = feedinlib.cli:main']},
+      install_requires=['numpy >= 1.15',
+                        'pandas >= 0.23',
                         'pvlib >= 0.4.0',
                         'windpowerlib == 0.0.4',
                         'requests'])
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import unittest
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import arrow
+from feedinlib import weather
+
+
+class Arrow_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        if arrow.pa is None:
+            raise unittest.SkipTest('pyarrow is not installed.')
+        timezone = 'Europe/Berlin'
+        n = 48
+        weather_df = pandas.DataFrame(index=pandas.date_range(
+            pandas.datetime(2010, 1, 1, 0), periods=n, freq='H',
+            tz=timezone))
+        weather_df['temp_air'] = 280.5 * numpy.ones(n)
+        weather_df['v_wind'] = numpy.linspace(2, 14, n)
+        self.weather = weather.FeedinWeather(
+            data=weather_df, timezone=timezone, latitude=52, longitude=12,
+            data_height={'temp_air': 2, 'v_wind': 10}, name='cell')
+
+    def round_trip_test(self):
+        table = self.weather.to_arrow()
+        my_weather = weather.FeedinWeather.from_arrow(table)
+        nt.ok_(my_weather.data.equals(self.weather.data))
+        nt.eq_(str(my_weather.timezone), 'Europe/Berlin')
+        nt.eq_(my_weather.latitude, 52)
+        nt.eq_(my_weather.data_height, {'temp_air': 2, 'v_wind': 10})
+        nt.eq_(my_weather.name, 'cell')
+
+    def zero_copy_test(self):
+        table = self.weather.to_arrow()
+        my_weather = weather.FeedinWeather.from_arrow(table.to_batches()[0])
+        nt.ok_(numpy.shares_memory(
+            my_weather.data['v_wind'].values,
+            table.column('v_wind').chunk(0).to_numpy()))
+
+    def feedin_to_arrow_test(self):
+        feedin = pandas.DataFrame({'a': numpy.ones(48), 'b': numpy.zeros(48)},
+                                  index=self.weather.data.index)
+        table = arrow.feedin_to_arrow(feedin)
+        nt.eq_(table.column_names, ['time', 'a', 'b'])
+        nt.eq_(table.num_rows, 48)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import nose.tools as nt
+import os
+import shutil
+import tempfile
+import pandas
+import numpy
+
+from feedinlib import cache
+from feedinlib import ensemble
+from feedinlib import powerplants as plant
+from feedinlib import weather
+
+
+class FeedinCache_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        timezone = 'Europe/Berlin'
+        n = 240
+        weather_df = pandas.DataFrame(index=pandas.date_range(
+            pandas.datetime(2010, 1, 1, 0), periods=n, freq='H',
+            tz=timezone))
+        weather_df['temp_air'] = 280.5 * numpy.ones(n)
+        weather_df['pressure'] = 100168 * numpy.ones(n)
+        weather_df['v_wind'] = numpy.linspace(2, 14, n)
+        weather_df['z0'] = 0.15 * numpy.ones(n)
+        self.weather = weather.FeedinWeather(
+            data=weather_df, timezone=timezone, latitude=52, longitude=12,
+            data_height={'temp_air': 2, 'pressure': 0, 'v_wind': 10})
+        self.plant = plant.WindPowerPlant(
+            h_hub=135, d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def cached_feedin_test(self):
+        my_cache = cache.FeedinCache(self.path)
+        first = self.plant.feedin(weather=self.weather, cache=my_cache)
+        nt.eq_(len(my_cache.entries()), 1)
+        second = self.plant.feedin(weather=self.weather, cache=my_cache)
+        nt.eq_(len(my_cache.entries()), 1)
+        nt.ok_(first.equals(second))
+        nt.eq_(str(second.index.tz), 'Europe/Berlin')
+
+    def key_test(self):
+        my_cache = cache.FeedinCache(self.path)
+        key = my_cache.key(self.plant, weather=self.weather)
+        nt.eq_(key, my_cache.key(self.plant, weather=self.weather))
+        nt.ok_(key != my_cache.key(self.plant, weather=self.weather,
+                                   number=2))
+        other_plant = plant.WindPowerPlant(
+            h_hub=100, d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+        nt.ok_(key != my_cache.key(other_plant, weather=self.weather))
+
+    def eviction_test(self):
+        my_cache = cache.FeedinCache(self.path)
+        for number in range(3):
+            self.plant.feedin(weather=self.weather, cache=my_cache,
+                              number=number + 1)
+        entry_size = my_cache.size() // 3
+        my_cache.max_size = 2 * entry_size
+        my_cache.evict()
+        nt.eq_(len(my_cache.entries()), 2)
+        nt.ok_(my_cache.size() <= my_cache.max_size)
+        nt.ok_(not os.path.isfile(my_cache.filename(my_cache.key(
+            self.plant, weather=self.weather, number=1))))
+
+    def replace_entry_test(self):
+        my_cache = cache.FeedinCache(self.path)
+        feedin = self.plant.feedin(weather=self.weather)
+        for number in range(3):
+            my_cache.set('entry', feedin)
+        nt.eq_(my_cache.size(), sum(e[1] for e in my_cache.entries()))
+
+    def stable_key_test(self):
+        my_cache = cache.FeedinCache(self.path)
+        key = my_cache.key(self.plant, weather=self.weather,
+                           start=pandas.Timestamp('2010-01-02'))
+        nt.eq_(key, my_cache.key(self.plant, weather=self.weather,
+                                 start=pandas.Timestamp('2010-01-02')))
+        # Objects without a stable representation are rejected
+        nt.assert_raises(TypeError, my_cache.key, self.plant,
+                         weather=self.weather, scaling=object())
+
+    def ensemble_test(self):
+        my_cache = cache.FeedinCache(self.path)
+        forecast = ensemble.EnsembleWeather.from_members(
+            {'low': self.weather, 'high': self.weather})
+        first = self.plant.feedin(weather=forecast, cache=my_cache)
+        second = self.plant.feedin(weather=forecast, cache=my_cache)
+        nt.eq_(len(my_cache.entries()), 1)
+        nt.ok_(first.equals(second))
+        nt.ok_(second.index.equals(first.index))
+        nt.eq_(list(second.index.names), list(first.index.names))
+        nt.eq_(str(second.index.get_level_values(-1).tz), 'Europe/Berlin')
+        nt.ok_(cache.weather_digest(forecast) !=
+               cache.weather_digest(self.weather))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import chunked
+from feedinlib import powerplants as plant
+from feedinlib import weather
+
+
+class ChunkedFeedin_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        timezone = 'Europe/Berlin'
+        n = 240
+        weather_df = pandas.DataFrame(index=pandas.date_range(
+            pandas.datetime(2010, 1, 1, 0), periods=n, freq='H',
+            tz=timezone))
+        weather_df['temp_air'] = 280.5 * numpy.ones(n)
+        weather_df['pressure'] = 100168 * numpy.ones(n)
+        weather_df['v_wind'] = numpy.linspace(2, 14, n)
+        weather_df['z0'] = 0.15 * numpy.ones(n)
+        self.weather = weather.FeedinWeather(
+            data=weather_df, timezone=timezone, latitude=52, longitude=12,
+            data_height={'temp_air': 2, 'pressure': 0, 'v_wind': 10})
+        self.plant = plant.WindPowerPlant(
+            h_hub=135, d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+        self.plants = {'cell_a': {'wka_1': self.plant, 'wka_2': self.plant},
+                       'cell_b': {'wka_3': self.plant}}
+        self.sources = {'cell_a': self.weather, 'cell_b': self.weather}
+
+    def parse_memory_test(self):
+        nt.eq_(chunked.parse_memory('2GB'), 2 * 1024 ** 3)
+        nt.eq_(chunked.parse_memory(1000), 1000)
+
+    def blocks_test(self):
+        runner = chunked.ChunkedFeedin(self.plants, self.sources,
+                                       memory_limit=100000)
+        blocks = runner.blocks()
+        nt.ok_(len(blocks) > 2)
+        for start, end, cells in blocks:
+            rows = len(self.weather.data.loc[start:end])
+            nt.ok_(rows * runner.row_bytes(cells) <= runner.memory_limit)
+
+    @nt.raises(ValueError)
+    def test_memory_limit_too_small(self):
+        chunked.ChunkedFeedin(self.plants, self.sources,
+                              memory_limit=10).blocks()
+
+    def chunked_result_test(self):
+        runner = chunked.ChunkedFeedin(self.plants, self.sources,
+                                       time_chunk=100)
+        result = pandas.concat(list(runner.iter_results()))
+        nt.eq_(sorted(result.columns), ['wka_1', 'wka_2', 'wka_3'])
+        nt.eq_(len(result), len(self.weather.data))
+        expected = self.plant.feedin(weather=self.weather)
+        nt.ok_(numpy.allclose(result['wka_3'], expected))
+
+    def statistics_test(self):
+        runner = chunked.ChunkedFeedin(self.plants, self.sources,
+                                       time_chunk=50)
+        reducer = runner.statistics(capacity={'wka_1': 7.5e6, 'wka_2': 7.5e6,
+                                              'wka_3': 7.5e6})
+        feedin = self.plant.feedin(weather=self.weather)
+        nt.eq_(sorted(reducer.plants), ['wka_1', 'wka_2', 'wka_3'])
+        numpy.testing.assert_allclose(
+            reducer.annual_energy().loc['wka_3', 2010], feedin.sum())
+        numpy.testing.assert_allclose(
+            reducer.power_quantiles([0.5]).loc['wka_1', 0.5],
+            feedin.quantile(0.5), atol=7.5e6 / reducer.bins)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import cli
+from feedinlib import gridded
+from feedinlib import matrix
+from feedinlib import models
+from feedinlib import powerplants as plant
+
+
+class CommandLine_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        if gridded.xr is None:
+            raise unittest.SkipTest('xarray is not installed.')
+        times = pandas.date_range('2010-01-01', periods=48, freq='H')
+        shape = (48, 2, 2)
+        v_wind = numpy.linspace(2, 14, 48 * 4).reshape(shape)
+        dataset = gridded.xr.Dataset(
+            {'ws10': (('time', 'lat', 'lon'), v_wind),
+             't2m': (('time', 'lat', 'lon'), numpy.full(shape, 280.5)),
+             'sp': (('time', 'lat', 'lon'), numpy.full(shape, 100168.)),
+             'fsr': (('time', 'lat', 'lon'), numpy.full(shape, 0.15))},
+            coords={'time': times, 'lat': [51., 52.], 'lon': [12., 13.]})
+        self.path = tempfile.mkdtemp()
+        dataset.to_netcdf(os.path.join(self.path, 'weather.nc'))
+        pandas.DataFrame(
+            {'id': ['wka_1', 'wka_2'], 'longitude': [12.1, 12.9],
+             'latitude': [51.9, 51.1], 'h_hub': [135, 100],
+             'd_rotor': [127, 127],
+             'wind_conv_type': ['ENERCON E 126 7500'] * 2}).to_csv(
+            os.path.join(self.path, 'wind.csv'), index=False)
+        self.config = {
+            'plants': [{'path': os.path.join(self.path, 'wind.csv'),
+                        'technology': 'wind', 'id_column': 'id'}],
+            'weather': {'type': 'netcdf',
+                        'path': os.path.join(self.path, 'weather.nc'),
+                        'variables': {'v_wind': 'ws10', 'temp_air': 't2m',
+                                      'pressure': 'sp', 'z0': 'fsr'},
+                        'data_height': {'v_wind': 10, 'temp_air': 2,
+                                        'pressure': 0, 'z0': 0}},
+            'output': {'path': os.path.join(self.path, 'results')},
+            'run': {'time_chunk': 24}}
+        self.filename = os.path.join(self.path, 'run.json')
+        with open(self.filename, 'w') as f:
+            json.dump(self.config, f)
+
+    @classmethod
+    def tearDownClass(self):
+        shutil.rmtree(self.path)
+
+    def run_test(self):
+        nt.eq_(cli.main([self.filename, '--quiet']), 0)
+        results = matrix.ResultMatrix(os.path.join(self.path, 'results'))
+        nt.eq_(list(results.plants), ['wka_1', 'wka_2'])
+        nt.eq_(results.values.shape, (48, 2))
+        options = self.config['weather']
+        reader = gridded.GriddedWeather(
+            options['path'], variables=options['variables'],
+            data_height=options['data_height'])
+        wind = plant.WindPowerPlant(
+            h_hub=100, d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+        expected = wind.feedin(weather=reader.weather((0, 1)))
+        reader.close()
+        nt.ok_(numpy.allclose(results['wka_2'], expected))
+
+    @nt.raises(ValueError)
+    def test_unknown_technology(self):
+        cli.load_plants({'plants': [{'path': 'plants.csv',
+                                     'technology': 'tidal'}]})
+
+    def sources_test(self):
+        table = plant.PlantTable.from_csv(
+            os.path.join(self.path, 'wind.csv'),
+            model=models.SimpleWindTurbine, ids='id')
+        columns = dict(table.columns)
+        options = self.config['weather']
+        source = cli.NetcdfWeather(options['path'],
+                                   variables=options['variables'],
+                                   data_height=options['data_height'])
+        plants, sources = source.sources(table, None)
+        nt.eq_(sorted(sources), sorted(plants))
+        nt.eq_(sum(len(cell_plants) for cell_plants in plants.values()), 2)
+        # The table of the caller is not changed
+        nt.eq_(sorted(table.columns), sorted(columns))
+        source.reader.close()
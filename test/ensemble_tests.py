@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import ensemble
+from feedinlib import powerplants as plant
+from feedinlib import weather
+
+
+class Ensemble_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        timezone = 'Europe/Berlin'
+        n = 48
+        index = pandas.date_range(pandas.datetime(2010, 6, 1, 0), periods=n,
+                                  freq='H', tz=timezone)
+        self.members = []
+        for factor in (0.8, 1.0, 1.2):
+            weather_df = pandas.DataFrame(index=index)
+            weather_df['temp_air'] = 290.5 * numpy.ones(n)
+            weather_df['pressure'] = 100168 * numpy.ones(n)
+            weather_df['v_wind'] = factor * numpy.linspace(2, 14, n)
+            weather_df['z0'] = 0.15 * numpy.ones(n)
+            weather_df['dhi'] = factor * 100 * numpy.sin(
+                numpy.arange(n) * numpy.pi / 24) ** 2
+            weather_df['dirhi'] = 2 * weather_df['dhi']
+            self.members.append(weather.FeedinWeather(
+                data=weather_df, timezone=timezone, latitude=52,
+                longitude=12, data_height={'temp_air': 2, 'pressure': 0,
+                                           'v_wind': 10, 'dhi': 0,
+                                           'dirhi': 0}))
+        self.ensemble = ensemble.EnsembleWeather.from_members(self.members)
+
+    def members_test(self):
+        nt.eq_(list(self.ensemble.members), [0, 1, 2])
+        nt.eq_(len(self.ensemble.times), 48)
+        nt.eq_(str(self.ensemble.timezone), 'Europe/Berlin')
+        nt.ok_(numpy.allclose(self.ensemble.member(2).data.values,
+                              self.members[2].data.values))
+
+    def wind_test(self):
+        wind = plant.WindPowerPlant(
+            h_hub=135, d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+        feedin = ensemble.feedin(wind, self.ensemble)
+        nt.eq_(feedin.shape, (48, 3))
+        for name, member in enumerate(self.members):
+            nt.ok_(numpy.allclose(feedin[name],
+                                  wind.feedin(weather=member)))
+
+    def pv_test(self):
+        pv = plant.Photovoltaic(
+            module_name='Yingli_YL210__2008__E__', azimuth=180, tilt=30,
+            albedo=0.2)
+        feedin = ensemble.feedin(pv, self.ensemble)
+        for name, member in enumerate(self.members):
+            nt.ok_(numpy.allclose(feedin[name], pv.feedin(weather=member)))
+        # The position of the sun is calculated once for all members
+        nt.eq_(len(self.ensemble.derived('PvlibBased.solar_geometry', None)),
+               48)
+
+    def from_arrays_test(self):
+        arrays = {column: numpy.column_stack(
+            [member.data[column].values for member in self.members])
+            for column in self.members[0].data.columns}
+        ensemble_weather = ensemble.EnsembleWeather.from_arrays(
+            self.members[0].data.index, members=['a', 'b', 'c'],
+            timezone='Europe/Berlin', **arrays)
+        nt.ok_(numpy.allclose(ensemble_weather.member('b').data.values,
+                              self.members[1].data.values))
+
+    def quantiles_test(self):
+        feedin = pandas.DataFrame(numpy.arange(12.).reshape(3, 4))
+        result = ensemble.quantiles(feedin, q=[0, 0.5, 1])
+        nt.eq_(list(result.columns), [0, 0.5, 1])
+        nt.eq_(result[0.5].tolist(), [1.5, 5.5, 9.5])
+        nt.eq_(result[1].tolist(), [3, 7, 11])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import gridded
+
+
+class GriddedWeather_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        if gridded.xr is None:
+            raise unittest.SkipTest('xarray is not installed.')
+        times = pandas.date_range('2010-01-01', periods=48, freq='H')
+        shape = (48, 3, 2)
+        self.v_wind = numpy.arange(48 * 6, dtype=float).reshape(shape)
+        dataset = gridded.xr.Dataset(
+            {'ws10': (('time', 'lat', 'lon'), self.v_wind),
+             't2m': (('time', 'lat', 'lon'), numpy.full(shape, 280.))},
+            coords={'time': times, 'lat': [51., 52., 53.],
+                    'lon': [12., 13.]})
+        dataset['ws10'].attrs['height'] = 10
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'weather.nc')
+        dataset.to_netcdf(self.filename)
+        self.reader = gridded.GriddedWeather(
+            self.filename, variables={'v_wind': 'ws10', 'temp_air': 't2m'},
+            data_height={'temp_air': 2})
+
+    @classmethod
+    def tearDownClass(self):
+        self.reader.close()
+        shutil.rmtree(self.path)
+
+    def select_test(self):
+        nt.eq_(self.reader.shape, (3, 2))
+        nt.eq_(self.reader.select(bbox=(12.5, 51.5, 13.5, 53)),
+               [(1, 1), (2, 1)])
+        nt.eq_(self.reader.select(index=[0, 5, (1, 1)]),
+               [(0, 0), (2, 1), (1, 1)])
+        nt.eq_(len(self.reader.select()), 6)
+
+    def data_height_test(self):
+        nt.eq_(self.reader.data_height, {'v_wind': 10, 'temp_air': 2})
+
+    def lazy_weather_test(self):
+        my_weather = self.reader.weather((2, 1), start='2010-01-01 05:00',
+                                         end='2010-01-01 10:00')
+        nt.ok_(not my_weather.loaded)
+        nt.eq_(my_weather.latitude, 53)
+        nt.eq_(my_weather.longitude, 13)
+        nt.eq_(len(my_weather.data), 6)
+        nt.ok_(my_weather.loaded)
+        nt.ok_(numpy.array_equal(my_weather.data['v_wind'].values,
+                                 self.v_wind[5:11, 2, 1]))
+
+    def single_time_step_test(self):
+        data = self.reader.read((1, 0), start='2010-01-01 07:00',
+                                end='2010-01-01 07:00')
+        nt.eq_(len(data), 1)
+        nt.eq_(data['v_wind'].iloc[0], self.v_wind[7, 1, 0])
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import unittest
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import jit
+from feedinlib import models as model
+from feedinlib import powerplants as plant
+from feedinlib import weather
+
+
+class Jit_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        timezone = 'Europe/Berlin'
+        n = 96
+        weather_df = pandas.DataFrame(index=pandas.date_range(
+            pandas.datetime(2010, 6, 1, 0), periods=n, freq='H',
+            tz=timezone))
+        weather_df['temp_air'] = 290.5 * numpy.ones(n)
+        weather_df['pressure'] = 100168 * numpy.ones(n)
+        weather_df['dirhi'] = numpy.linspace(0, 400, n)
+        weather_df['dhi'] = numpy.linspace(150, 0, n)
+        weather_df['v_wind'] = numpy.linspace(0, 30, n)
+        weather_df['z0'] = 0.15 * numpy.ones(n)
+        self.weather = weather.FeedinWeather(
+            data=weather_df, timezone=timezone, latitude=52, longitude=12,
+            data_height={'dhi': 0, 'dirhi': 0, 'pressure': 0,
+                         'temp_air': 2, 'v_wind': 10, 'Z0': 0})
+
+    @nt.raises(ValueError)
+    def test_unknown_backend(self):
+        model.PvlibBased(backend='fortran')
+
+    def numpy_backend_test(self):
+        nt.eq_(jit.use('numpy'), False)
+
+    def compare_backends_test(self):
+        if jit.numba is None:
+            raise unittest.SkipTest("numba is not installed")
+        for name in ('Yingli_YL210__2008__E__',
+                     'Advent_Solar_Ventura_210___2008_'):
+            feedin = [plant.Photovoltaic(
+                model=model.PvlibBased(backend=backend), module_name=name,
+                tilt=30, azimuth=200, albedo=0.2).feedin(
+                weather=self.weather) for backend in ('numpy', 'numba')]
+            nt.ok_(feedin[0].sum() > 0)
+            nt.ok_(numpy.allclose(feedin[0], feedin[1]))
+            nt.ok_(feedin[0].index.equals(feedin[1].index))
+        feedin = [plant.WindPowerPlant(
+            model=model.SimpleWindTurbine(backend=backend), h_hub=135,
+            d_rotor=127, wind_conv_type='ENERCON E 126 7500').feedin(
+            weather=self.weather) for backend in ('numpy', 'numba')]
+        nt.ok_(numpy.allclose(feedin[0], feedin[1]))
+
+        coefficients = model.sapm_matrix([
+            model.PvlibBased().fetch_module_data(module_name=name) for name in
+            ('Yingli_YL210__2008__E__', 'Advent_Solar_Ventura_210___2008_')])
+        arguments = (numpy.linspace(0, 900, 10)[:, None], 80.,
+                     numpy.linspace(0, 100, 10)[:, None], 2., 30.)
+        nt.ok_(numpy.allclose(
+            jit.sapm_matrix(*arguments, coefficients),
+            model.sapm_matrix_kernel(*arguments, coefficients)['p_mp']))
+
+    def compiled_pipeline_test(self):
+        if jit.numba is None:
+            raise unittest.SkipTest("numba is not installed")
+        pv_model = model.PvlibBased(backend='numba')
+        for tilt, azimuth in ((30, 200), (0, 180), (90, 90)):
+            site = {'weather': self.weather, 'tilt': tilt,
+                    'azimuth': azimuth, 'albedo': 0.2,
+                    'module_name': 'Yingli_YL210__2008__E__'}
+            site['module_data'] = pv_model.fetch_module_data(**site)
+            compiled = pv_model.compiled_power_output(**site)
+            staged = pv_model.staged_power_output(**site)
+            nt.ok_(staged.sum() > 0)
+            numpy.testing.assert_allclose(compiled, staged, rtol=1e-9,
+                                          atol=1e-9)
+
+        # Sun perpendicular to the module: rounding must not give nan
+        zenith = numpy.linspace(1, 89, 500)
+        ones = numpy.ones(len(zenith))
+        module = pv_model.fetch_module_data(
+            module_name='Yingli_YL210__2008__E__')
+        p_mp = [jit.pv_power(
+            numpy.array([z]), 180 * ones[:1], 100 * ones[:1],
+            500 * ones[:1], 600 * ones[:1], 1367 * ones[:1], 1.5 * ones[:1],
+            290 * ones[:1], 2 * ones[:1], tilt=z, azimuth=180, albedo=0.2,
+            module=module)[0] for z in zenith]
+        nt.ok_(numpy.all(numpy.array(p_mp) > 0))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import shutil
+import tempfile
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import chunked
+from feedinlib import matrix
+from feedinlib import models as model
+from feedinlib import powerplants as plant
+from feedinlib import weather
+
+
+class ResultMatrix_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        timezone = 'Europe/Berlin'
+        n = 240
+        weather_df = pandas.DataFrame(index=pandas.date_range(
+            pandas.datetime(2010, 1, 1, 0), periods=n, freq='H',
+            tz=timezone))
+        weather_df['temp_air'] = 280.5 * numpy.ones(n)
+        weather_df['pressure'] = 100168 * numpy.ones(n)
+        weather_df['v_wind'] = numpy.linspace(2, 14, n)
+        weather_df['z0'] = 0.15 * numpy.ones(n)
+        self.weather = weather.FeedinWeather(
+            data=weather_df, timezone=timezone, latitude=52, longitude=12,
+            data_height={'temp_air': 2, 'pressure': 0, 'v_wind': 10})
+        self.plant = plant.WindPowerPlant(
+            h_hub=135, d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+        self.expected = self.plant.feedin(weather=self.weather)
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def chunked_run_test(self):
+        results = matrix.ResultMatrix.create(
+            self.path, index=self.weather.data.index,
+            plants=['wka_1', 'wka_2', 'wka_3'])
+        plants = {'cell_a': {'wka_1': self.plant, 'wka_2': self.plant}}
+        chunked.ChunkedFeedin(plants, {'cell_a': self.weather},
+                              time_chunk=100).run(results)
+        reader = matrix.ResultMatrix(self.path)
+        nt.eq_(reader.values.shape, (240, 3))
+        nt.eq_(list(reader.plants), ['wka_1', 'wka_2', 'wka_3'])
+        nt.ok_(reader.index.equals(self.weather.data.index))
+        nt.ok_(numpy.allclose(reader['wka_2'], self.expected))
+        # Powerplants that were not calculated remain NaN
+        nt.ok_(numpy.isnan(reader['wka_3']).all())
+        nt.ok_(numpy.shares_memory(reader.to_frame().values, reader.values))
+
+    def plant_table_test(self):
+        table = plant.PlantTable(
+            {'h_hub': [135, 100], 'd_rotor': [127, 127],
+             'wind_conv_type': ['ENERCON E 126 7500'] * 2},
+            model=model.SimpleWindTurbine)
+        results = matrix.ResultMatrix.create(
+            self.path, index=self.weather.data.index, plants=table.ids,
+            dtype='float32', order='F')
+        table.feedin(self.weather, out=results.values)
+        results.close()
+        reader = matrix.ResultMatrix(self.path)
+        nt.eq_(reader.values.dtype, numpy.float32)
+        nt.ok_(numpy.allclose(reader[0], self.expected, rtol=1e-6))
+
+    @nt.raises(KeyError)
+    def test_unknown_plant(self):
+        results = matrix.ResultMatrix.create(
+            self.path, index=self.weather.data.index, plants=['wka_1'])
+        results.write_plant('wka_2', self.expected)
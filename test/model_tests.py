@@ -7,9 +7,12 @@ Created on Tue Sep 22 12:41:37 2015
 
 import nose.tools as nt
 import os.path
+import tempfile
+import warnings
 import pandas
 import numpy
 
+from feedinlib import cache
 from feedinlib import models as model
 from feedinlib import powerplants as plant
 from feedinlib import weather
@@ -66,6 +69,10 @@ class ModelsPowerplantsInteraction_Tests:
             latitude=52,
             longitude=12,
             data_height=self.height_of_measurement)
+        self.cell_weather = weather.FeedinWeather(
+            data=self.weather_df, timezone=timezone, latitude=52,
+            longitude=12, data_height=self.height_of_measurement,
+            name='cell_1')
 
     @nt.raises(AttributeError)
     def test_pv_model(self):
@@ -103,3 +110,413 @@ class ModelsPowerplantsInteraction_Tests:
         pv_plant = plant.Photovoltaic(model=pv_model, **self.site)
         pv_feedin = pv_plant.feedin(weather=self.weather)
         nt.eq_(round(pv_feedin.sum() / 1000), 31.0)
+
+    def pv_transposition_model_test(self):
+        pv_model = model.PvlibBased(
+            required=list(self.required_parameter['pv_model'].keys()),
+            transposition_model='isotropic')
+        pv_plant = plant.Photovoltaic(model=pv_model, **self.site)
+        isotropic = pv_plant.feedin(weather=self.weather).sum()
+        perez = pv_plant.feedin(weather=self.weather,
+                                transposition_model='perez').sum()
+        nt.eq_(round(perez / 1000), 31.0)
+        nt.ok_(isotropic < perez)
+
+    @nt.raises(ValueError)
+    def test_unknown_transposition_model(self):
+        pv_model = model.PvlibBased(
+            required=list(self.required_parameter['pv_model'].keys()))
+        pv_plant = plant.Photovoltaic(model=pv_model, **self.site)
+        pv_plant.feedin(weather=self.weather, transposition_model='unknown')
+
+    def pv_without_daylight_test(self):
+        weather_df = self.weather_df.copy()
+        weather_df['dirhi'] = 0
+        weather_df['dhi'] = 0
+        dark_weather = weather.FeedinWeather(
+            data=weather_df, timezone='Europe/Berlin', latitude=52,
+            longitude=12, data_height=self.height_of_measurement)
+        pv_plant = plant.Photovoltaic(**self.site)
+        pv_feedin = pv_plant.feedin(weather=dark_weather)
+        nt.eq_(len(pv_feedin), len(weather_df))
+        nt.eq_(pv_feedin.abs().sum(), 0)
+
+    def pv_night_mask_test(self):
+        def diurnal_weather():
+            n = 72
+            weather_df = pandas.DataFrame(index=pandas.date_range(
+                pandas.datetime(2010, 3, 20, 0), periods=n, freq='H',
+                tz='Europe/Berlin'))
+            # Irradiation from 5 to 20 h, also before sunrise and after
+            # sunset
+            hour = numpy.arange(n) % 24
+            shape = numpy.clip(numpy.sin((hour - 5) / 15. * numpy.pi), 0,
+                               None)
+            weather_df['temp_air'] = 283 + 5 * shape
+            weather_df['pressure'] = 100168 * numpy.ones(n)
+            weather_df['dirhi'] = 500 * shape
+            weather_df['dhi'] = 100 * shape + 5 * (shape > 0)
+            weather_df['v_wind'] = 3 * numpy.ones(n)
+            weather_df['z0'] = 0.15 * numpy.ones(n)
+            return weather.FeedinWeather(
+                data=weather_df, timezone='Europe/Berlin', latitude=52,
+                longitude=12, data_height=self.height_of_measurement)
+
+        class AllRows(model.PvlibBased):
+            # The pipeline without skipping rows
+            def daylight(self, data):
+                return pandas.Series(True, index=data.index)
+
+        site = {k: self.site[k] for k in self.required_parameter['pv_model']}
+        pv_model = model.PvlibBased(backend='numpy')
+        my_weather = diurnal_weather()
+        masked = pv_model.get_pv_power_output(weather=my_weather, **site)
+        data = pv_model.weather_columns(weather=my_weather)
+        nt.ok_(((data.zenith >= 90) & (data.ghi > 0)).any())
+        nt.ok_((data.zenith >= 90).sum() > 24)
+        # Separate weather objects, the stages are memoized in the weather
+        unmasked = AllRows(backend='numpy').get_pv_power_output(
+            weather=diurnal_weather(), **site)
+        nt.ok_(masked.p_mp.sum() > 0)
+        numpy.testing.assert_allclose(masked.p_mp, unmasked.p_mp.fillna(0))
+        staged = pv_model.staged_power_output(
+            weather=my_weather, module_data=pv_model.fetch_module_data(
+                **site), **site)
+        numpy.testing.assert_allclose(staged, unmasked.p_mp.fillna(0))
+
+    def pv_single_pipeline_test(self):
+        class Night(model.PvlibBased):
+            def daylight(self, data):
+                return pandas.Series(False, index=data.index)
+
+        class OldStyle(model.PvlibBased):
+            def angle_of_incidence(self, data, **kwargs):
+                return 0 * data['zenith']
+
+        site = {k: self.site[k] for k in self.required_parameter['pv_model']}
+        my_weather = weather.FeedinWeather(
+            data=self.weather_df.copy(), timezone='Europe/Berlin',
+            latitude=52, longitude=12, data_height=self.height_of_measurement)
+        # The methods of the pipeline are used with all backends
+        nt.eq_(Night().feedin(weather=my_weather, **site).sum(), 0)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            OldStyle()
+            model.PvlibBased().angle_of_incidence(
+                self.weather_df.assign(zenith=0, azimuth=180), tilt=30,
+                azimuth=180)
+        nt.eq_(len(caught), 2)
+        nt.ok_('angle_of_incidence' in str(caught[0].message))
+        nt.ok_(issubclass(caught[1].category, DeprecationWarning))
+
+    def plant_table_test(self):
+        table = plant.PlantTable(
+            {'plant_id': ['a', 'b', 'c'],
+             'h_hub': [135, 135, 100],
+             'd_rotor': [127, 127, 127],
+             'wind_conv_type': ['ENERCON E 126 7500'] * 3,
+             'number': [1, 2, numpy.nan]},
+            model=model.SimpleWindTurbine, ids='plant_id')
+        nt.eq_(len(table), 3)
+        nt.eq_(table.plant('c').h_hub, 100)
+        feedin = table.feedin(weather=self.weather)
+        nt.eq_(list(feedin.columns), ['a', 'b', 'c'])
+        single = plant.WindPowerPlant(**self.site).feedin(weather=self.weather)
+        nt.ok_(numpy.allclose(feedin['a'], single))
+        nt.ok_(numpy.allclose(feedin['b'], 2 * single))
+        nt.ok_(numpy.allclose(table[2].feedin(weather=self.weather),
+                              feedin['c']))
+
+    @nt.raises(AttributeError)
+    def test_plant_table_missing_column(self):
+        plant.PlantTable({'h_hub': [135]}, model=model.SimpleWindTurbine)
+
+    @nt.raises(ValueError)
+    def test_plant_table_missing_value(self):
+        plant.PlantTable({'h_hub': [135, numpy.nan], 'd_rotor': [127, 127],
+                          'wind_conv_type': ['ENERCON E 126 7500'] * 2},
+                         model=model.SimpleWindTurbine)
+
+    @nt.raises(ValueError)
+    def test_plant_table_misaligned_cells(self):
+        table = plant.PlantTable(
+            {'cell': ['x', 'y'], 'h_hub': [135, 135], 'd_rotor': [127, 127],
+             'wind_conv_type': ['ENERCON E 126 7500'] * 2},
+            model=model.SimpleWindTurbine)
+        shorter = weather.FeedinWeather(
+            data=self.weather_df.iloc[:100], timezone='Europe/Berlin',
+            latitude=52, longitude=12, data_height=self.height_of_measurement)
+        table.feedin({'x': self.weather, 'y': shorter}, cell_column='cell')
+
+    def shared_model_test(self):
+        shared = model.SimpleWindTurbine()
+        site = dict(self.site, h_hub=100)
+        plant_a = plant.WindPowerPlant(model=shared, **self.site)
+        plant_b = plant.WindPowerPlant(model=shared, **site)
+        feedin_a = plant_a.feedin(weather=self.weather,
+                                  installed_capacity=15 * 10 ** 6)
+        plant_b.feedin(weather=self.weather)
+        nt.ok_(numpy.allclose(
+            feedin_a, plant.WindPowerPlant(**self.site).feedin(
+                weather=self.weather, installed_capacity=15 * 10 ** 6)))
+        nt.ok_(not hasattr(shared, 'powerplant'))
+        feedin, metadata = shared.feedin_with_metadata(
+            weather=self.weather, **self.site)
+        nt.eq_(metadata['nominal_power'], 7500000.0)
+
+    def derived_weather_columns_test(self):
+        my_weather = weather.FeedinWeather(
+            data=self.weather.data.copy(), timezone=self.weather.timezone,
+            latitude=self.weather.latitude, longitude=self.weather.longitude,
+            data_height=self.weather.data_height)
+        wind = plant.WindPowerPlant(**self.site)
+        feedin = wind.feedin(weather=my_weather)
+        rho = my_weather.derived('SimpleWindTurbine.rho_hub(135.0)', None)
+        nt.ok_(numpy.allclose(feedin, wind.feedin(weather=self.weather)))
+        # A second plant with the same hub height reuses the columns
+        plant.WindPowerPlant(**dict(self.site, d_rotor=100)).feedin(
+            weather=my_weather)
+        nt.ok_(my_weather.derived('SimpleWindTurbine.rho_hub(135.0)',
+                                  None) is rho)
+        # Replacing the data clears the cache
+        my_weather.data = my_weather.data * 1.1
+        nt.eq_(my_weather._derived, {})
+        nt.ok_(not numpy.allclose(wind.feedin(weather=my_weather), feedin))
+
+    def power_curve_table_test(self):
+        name = 'ENERCON E 126 7500'
+        table = model.PowerCurveTable.from_types([name], step=0.01)
+        cp_values = model.windmodel.SimpleWindTurbine(name).cp_values
+        v_wind = numpy.linspace(-1, 30, 1001)
+        reference = numpy.interp(
+            numpy.minimum(v_wind, cp_values.index.max()), cp_values.index,
+            cp_values.cp)
+        nt.ok_(numpy.abs(table.cp(v_wind, name) - reference).max() <=
+               table.error_bound[name])
+        nt.ok_(numpy.isnan(table.cp(numpy.array([numpy.nan]), name)[0]))
+        wind_model = model.SimpleWindTurbine(power_curve_step=0.01)
+        feedin = plant.WindPowerPlant(model=wind_model, **self.site).feedin(
+            weather=self.weather)
+        nt.ok_(numpy.allclose(
+            feedin, plant.WindPowerPlant(**self.site).feedin(
+                weather=self.weather), rtol=1e-2))
+
+    def orientation_sweep_test(self):
+        pv_model = model.PvlibBased()
+        sweep, series = pv_model.orientation_sweep(
+            self.weather, tilt=[0, 30], azimuth=[90, 180], albedo=0.2,
+            module_name=self.site['module_name'], full=True, block_size=3)
+        nt.eq_(len(sweep), 4)
+        nt.eq_(series.shape, (876, 4))
+        for position, row in sweep.iterrows():
+            feedin = plant.Photovoltaic(
+                module_name=self.site['module_name'], tilt=row.tilt,
+                azimuth=row.azimuth, albedo=row.albedo).feedin(
+                weather=self.weather)
+            nt.ok_(numpy.allclose(series[position], feedin))
+            nt.ok_(numpy.isclose(row.energy, feedin.sum()))
+
+    def kernel_test(self):
+        data = self.weather_df
+        times = data.index.tz_convert('UTC').tz_localize(None).values
+        pv_model = model.PvlibBased()
+        p_mp = model.pv_feedin_kernel(
+            times, data.dhi.values, data.dirhi.values, data.temp_air.values,
+            data.v_wind.values, latitude=52, longitude=12,
+            tilt=self.site['tilt'], azimuth=self.site['azimuth'],
+            albedo=self.site['albedo'],
+            module=pv_model.fetch_module_data(
+                module_name=self.site['module_name']),
+            dayofyear=data.index.dayofyear)
+        pv_feedin = plant.Photovoltaic(**self.site).feedin(
+            weather=self.weather)
+        nt.ok_(numpy.allclose(p_mp, pv_feedin))
+
+        cp_values, nominal_power = model.turbine_data(
+            self.site['wind_conv_type'])
+        p_wpp = model.wind_feedin_kernel(
+            data.v_wind.values, data.temp_air.values, data.pressure.values,
+            data.z0.values, h_hub=self.site['h_hub'],
+            d_rotor=self.site['d_rotor'], cp_wind_speed=cp_values.index,
+            cp=cp_values.cp.values, nominal_power=nominal_power,
+            data_height=self.height_of_measurement)
+        wind_feedin = plant.WindPowerPlant(**self.site).feedin(
+            weather=self.weather)
+        nt.ok_(numpy.allclose(p_wpp, wind_feedin))
+
+    def pipeline_stages_test(self):
+        my_weather = weather.FeedinWeather(
+            data=self.weather_df.copy(), timezone='Europe/Berlin',
+            latitude=52, longitude=12, data_height=self.height_of_measurement)
+        pv_model = model.PvlibBased(backend='numpy')
+        site = dict(self.site, weather=my_weather)
+        feedin = pv_model.feedin(**site)
+        reference = pv_model.get_pv_power_output(**site).p_mp
+        nt.ok_(numpy.allclose(feedin, reference))
+
+        aoi = pv_model.stage('aoi', **site)
+        sky_diffuse = pv_model.stage('sky_diffuse', **site)
+        ground_diffuse = pv_model.stage('ground_diffuse', **site)
+        poa = pv_model.stage('plane_of_array', **site)
+
+        # A new module only recalculates the stage sapm
+        site['module_name'] = 'Advent_Solar_Ventura_210___2008_'
+        pv_model.feedin(**site)
+        nt.ok_(pv_model.stage('aoi', **site) is aoi)
+        nt.ok_(pv_model.stage('plane_of_array', **site) is poa)
+
+        # A new albedo recalculates the ground diffuse irradiation
+        site['albedo'] = 0.3
+        pv_model.feedin(**site)
+        nt.ok_(pv_model.stage('sky_diffuse', **site) is sky_diffuse)
+        nt.ok_(pv_model.stage('ground_diffuse', **site) is not
+               ground_diffuse)
+        nt.ok_(pv_model.stage('plane_of_array', **site) is not poa)
+        nt.eq_(model.stage_parameters('sapm'),
+               ('albedo', 'azimuth', 'module_name', 'tilt',
+                'transposition_model'))
+
+    def module_fleet_test(self):
+        names = ['Yingli_YL210__2008__E__', 'Advent_Solar_Ventura_210___2008_']
+        table = plant.PlantTable(
+            {'plant_id': ['a', 'b', 'c'], 'module_name': names + names[:1],
+             'tilt': [30, 30, 20], 'azimuth': [180, 180, 200],
+             'albedo': [0.2, 0.2, 0.2], 'peak_power': [1000, 2000, 1000]},
+            model=model.PvlibBased(backend='numpy'), ids='plant_id')
+        feedin = table.feedin(weather=self.weather)
+        for view in table:
+            single = plant.Photovoltaic(
+                model=model.PvlibBased(backend='numpy'),
+                module_name=view.module_name, tilt=view.tilt,
+                azimuth=view.azimuth, albedo=view.albedo).feedin(
+                weather=self.weather, peak_power=view.peak_power)
+            nt.ok_(numpy.allclose(feedin[view.id], single))
+
+        # Modules stacked into one coefficient matrix
+        pv_model = model.PvlibBased()
+        modules = [pv_model.fetch_module_data(module_name=n) for n in names]
+        poa_direct = numpy.array([[0.], [300.], [800.]])
+        aoi = numpy.array([[10.], [40.], [95.]])
+        result = model.sapm_matrix_kernel(
+            poa_direct, 100., aoi, 1.5, 25., model.sapm_matrix(modules))
+        nt.eq_(result['p_mp'].shape, (3, 2))
+        for number, module in enumerate(modules):
+            nt.ok_(numpy.allclose(result['p_mp'][:, number],
+                                  model.sapm_output_kernel(
+                                      poa_direct[:, 0], 100., aoi[:, 0],
+                                      1.5, 25., module)['p_mp']))
+
+    def surrogate_test(self):
+        surrogate = model.Surrogate(model.PvlibBased(backend='numpy'))
+        ranges = {'tilt': (20, 40), 'azimuth': (150, 210),
+                  'albedo': (0.1, 0.3)}
+        error = surrogate.fit(self.cell_weather, ranges, seed=1,
+                              module_name='Yingli_YL210__2008__E__')
+        nt.ok_(error['energy_error'] < 0.01)
+        nt.eq_(surrogate.validation_error().energy_error.iloc[0],
+               error['energy_error'])
+        site = {k: self.site[k] for k in surrogate.required}
+        reference = model.PvlibBased(backend='numpy').feedin(
+            weather=self.cell_weather, **site)
+        feedin = surrogate.feedin(weather=self.cell_weather, **site)
+        nt.ok_(feedin.index.equals(reference.index))
+        nt.assert_almost_equal(feedin.sum() / reference.sum(), 1, places=2)
+
+        # One matrix product for a plant table
+        table = plant.PlantTable(
+            {'plant_id': ['a', 'b'], 'tilt': [30, 35], 'azimuth': [180, 200],
+             'albedo': [0.2, 0.3], 'peak_power': [1000, 2000],
+             'module_name': [site['module_name']] * 2},
+            model=surrogate, ids='plant_id')
+        single = plant.Photovoltaic(
+            model=surrogate, module_name=site['module_name'], tilt=35,
+            azimuth=200, albedo=0.3).feedin(weather=self.cell_weather,
+                                            peak_power=2000)
+        nt.ok_(numpy.allclose(table.feedin(weather=self.cell_weather)['b'],
+                              single))
+
+        filename = os.path.join(tempfile.mkdtemp(), 'surrogate.npz')
+        surrogate.save(filename)
+        loaded = model.Surrogate(model.PvlibBased()).load(filename)
+        nt.ok_(numpy.allclose(
+            loaded.feedin(weather=self.cell_weather, **site), feedin))
+
+    def wind_surrogate_test(self):
+        surrogate = model.Surrogate(model.SimpleWindTurbine())
+        surrogate.fit(self.cell_weather,
+                      {'h_hub': (80, 140), 'd_rotor': (90, 130)},
+                      seed=2, wind_conv_type='ENERCON E 126 7500')
+        nt.ok_(surrogate.validation_error().energy_error.iloc[0] < 0.01)
+        feedin = surrogate.feedin(
+            weather=self.cell_weather, h_hub=135, d_rotor=127,
+            wind_conv_type='ENERCON E 126 7500')
+        reference = model.SimpleWindTurbine().feedin(
+            weather=self.cell_weather, h_hub=135, d_rotor=127,
+            wind_conv_type='ENERCON E 126 7500')
+        nt.assert_almost_equal(feedin.sum() / reference.sum(), 1, places=2)
+
+    @nt.raises(ValueError)
+    def test_surrogate_range(self):
+        surrogate = model.Surrogate(model.SimpleWindTurbine())
+        surrogate.fit(self.cell_weather,
+                      {'h_hub': (80, 140), 'd_rotor': (90, 130)},
+                      n_samples=12, n_validation=2,
+                      wind_conv_type='ENERCON E 126 7500')
+        surrogate.feedin(weather=self.cell_weather, h_hub=160, d_rotor=127,
+                         wind_conv_type='ENERCON E 126 7500')
+
+    @nt.raises(ValueError)
+    def test_surrogate_not_fitted(self):
+        model.Surrogate(model.SimpleWindTurbine()).feedin(
+            weather=self.cell_weather, h_hub=135, d_rotor=127,
+            wind_conv_type='ENERCON E 126 7500')
+
+    def surrogate_weather_test(self):
+        surrogate = model.Surrogate(model.SimpleWindTurbine())
+        turbine = {'wind_conv_type': 'ENERCON E 126 7500'}
+        ranges = {'h_hub': (80, 140), 'd_rotor': (90, 130)}
+        nt.assert_raises(ValueError, surrogate.fit, self.weather, ranges,
+                         n_samples=12, n_validation=2, **turbine)
+        surrogate.fit(self.cell_weather, ranges, n_samples=12,
+                      n_validation=2, **turbine)
+        # A window of the fitted weather
+        window = self.cell_weather.window(
+            self.weather_df.index[10], self.weather_df.index[20])
+        nt.eq_(len(surrogate.feedin(weather=window, h_hub=135, d_rotor=127,
+                                    **turbine)), 11)
+        # Other data with the same name
+        weather_df = self.weather_df.copy()
+        weather_df['v_wind'] *= 2
+        other = weather.FeedinWeather(
+            data=weather_df, timezone='Europe/Berlin', latitude=52,
+            longitude=12, data_height=self.height_of_measurement,
+            name='cell_1')
+        nt.assert_raises(ValueError, surrogate.feedin, weather=other,
+                         h_hub=135, d_rotor=127, **turbine)
+
+    def surrogate_cache_key_test(self):
+        surrogate = model.Surrogate(model.SimpleWindTurbine())
+        turbine = plant.WindPowerPlant(
+            model=surrogate, h_hub=135, d_rotor=127,
+            wind_conv_type='ENERCON E 126 7500')
+        my_cache = cache.FeedinCache(tempfile.mkdtemp())
+        keys = [my_cache.key(turbine, weather=self.cell_weather)]
+        for seed in (1, 2):
+            surrogate.fit(self.cell_weather,
+                          {'h_hub': (80, 140), 'd_rotor': (90, 130)},
+                          n_samples=12, n_validation=2, seed=seed,
+                          wind_conv_type='ENERCON E 126 7500')
+            keys.append(my_cache.key(turbine, weather=self.cell_weather))
+        nt.eq_(len(set(keys)), 3)
+        nt.eq_(keys[-1], my_cache.key(turbine, weather=self.cell_weather))
+
+    @nt.raises(ValueError)
+    def test_surrogate_without_features(self):
+        class Custom(model.PvlibBased):
+            pass
+
+        model.Surrogate(Custom())
+
+    @nt.raises(ValueError)
+    def test_fetch_module_data_without_name(self):
+        model.PvlibBased().fetch_module_data()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import models
+from feedinlib import montecarlo
+from feedinlib import powerplants as plant
+from feedinlib import weather
+
+
+def make_weather(irradiance=1., temp_air=0., v_wind=1.):
+    timezone = 'Europe/Berlin'
+    n = 240
+    weather_df = pandas.DataFrame(index=pandas.date_range(
+        pandas.datetime(2010, 6, 1, 0), periods=n, freq='H', tz=timezone))
+    weather_df['temp_air'] = 290.5 * numpy.ones(n) + temp_air
+    weather_df['pressure'] = 100168 * numpy.ones(n)
+    weather_df['dirhi'] = numpy.linspace(0, 300, n) * irradiance
+    weather_df['dhi'] = 111 * numpy.ones(n) * irradiance
+    weather_df['v_wind'] = numpy.linspace(2, 14, n) * v_wind
+    weather_df['z0'] = 0.15 * numpy.ones(n)
+    return weather.FeedinWeather(
+        data=weather_df, timezone=timezone, latitude=52, longitude=12,
+        data_height={'dhi': 0, 'dirhi': 0, 'pressure': 0, 'temp_air': 2,
+                     'v_wind': 10, 'z0': 0})
+
+
+class MonteCarlo_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        self.weather = make_weather()
+        self.pv_plant = plant.Photovoltaic(
+            module_name='Yingli_YL210__2008__E__', azimuth=180, tilt=30,
+            albedo=0.2, model=models.PvlibBased(backend='numpy'))
+        self.wind_plant = plant.WindPowerPlant(
+            h_hub=135, d_rotor=127, wind_conv_type='ENERCON E 126 7500',
+            model=models.SimpleWindTurbine(backend='numpy'))
+
+    def sample_test(self):
+        samples = montecarlo.sample(10, seed=3, v_wind=0.1, albedo=0.05)
+        nt.eq_(list(samples.columns), ['albedo', 'v_wind'])
+        again = montecarlo.sample(10, seed=3, albedo=0.05, v_wind=0.1)
+        nt.ok_(samples.equals(again))
+
+    def pv_test(self):
+        samples = montecarlo.sample(20, seed=1, albedo=0.05,
+                                    irradiance=0.05, temp_air=1.)
+        feedin = montecarlo.feedin(self.pv_plant, self.weather, samples,
+                                   chunk=7)
+        nt.eq_(feedin.shape, (240, 20))
+        deviation = samples.iloc[4]
+        expected = self.pv_plant.feedin(
+            weather=make_weather(irradiance=1 + deviation.irradiance,
+                                 temp_air=deviation.temp_air),
+            albedo=0.2 + deviation.albedo)
+        numpy.testing.assert_allclose(feedin[4], expected, atol=1e-9)
+
+    def module_coefficient_test(self):
+        samples = montecarlo.sample(5, seed=2, Impo=0.02)
+        feedin = montecarlo.feedin(self.pv_plant, self.weather, samples)
+        nominal = self.pv_plant.feedin(weather=self.weather)
+        # The current at the maximum power point scales the output
+        numpy.testing.assert_allclose(
+            feedin.values, nominal.values[:, None] * (1 + samples.Impo.values),
+            rtol=1e-12)
+
+    def wind_test(self):
+        samples = montecarlo.sample(30, seed=4, v_wind=0.05)
+        energy = montecarlo.yields(self.wind_plant, self.weather, samples,
+                                   installed_capacity=15e6)
+        deviation = samples.v_wind.iloc[11]
+        expected = self.wind_plant.feedin(
+            weather=make_weather(v_wind=1 + deviation),
+            installed_capacity=15e6).sum()
+        nt.assert_almost_equal(energy.iloc[11] / expected, 1)
+        p_values = montecarlo.p_values(energy, p=[50, 90])
+        nt.ok_(p_values.P90 <= p_values.P50)
+
+    @nt.raises(ValueError)
+    def test_unknown_parameter(self):
+        samples = montecarlo.sample(2, seed=1, albedo=0.05)
+        montecarlo.feedin(self.wind_plant, self.weather, samples)
+
+    def single_polynomial_coefficient_test(self):
+        # Only one coefficient of the spectral polynomial is sampled
+        samples = montecarlo.sample(4, seed=5, A0=0.01)
+        feedin = montecarlo.feedin(self.pv_plant, self.weather, samples)
+        nt.eq_(feedin.shape, (240, 4))
+        nominal = self.pv_plant.feedin(weather=self.weather)
+        nt.ok_(numpy.all(numpy.isfinite(feedin.values)))
+        nt.ok_(not numpy.allclose(feedin[0], nominal))
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import chunked
+from feedinlib import powerplants as plant
+from feedinlib import sharded
+from feedinlib import weather
+
+
+class ShardedRun_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        timezone = 'Europe/Berlin'
+        n = 48
+        weather_df = pandas.DataFrame(index=pandas.date_range(
+            pandas.datetime(2010, 1, 1, 0), periods=n, freq='H',
+            tz=timezone))
+        weather_df['temp_air'] = 280.5 * numpy.ones(n)
+        weather_df['pressure'] = 100168 * numpy.ones(n)
+        weather_df['v_wind'] = numpy.linspace(2, 14, n)
+        weather_df['z0'] = 0.15 * numpy.ones(n)
+        self.weather = weather.FeedinWeather(
+            data=weather_df, timezone=timezone, latitude=52, longitude=12,
+            data_height={'temp_air': 2, 'pressure': 0, 'v_wind': 10})
+        wind = plant.WindPowerPlant(
+            h_hub=135, d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+        self.plants = {'cell_{0}'.format(cell): {
+            'wka_{0}_{1}'.format(cell, number): wind for number in range(2)}
+            for cell in range(6)}
+        self.sources = {cell: self.weather for cell in self.plants}
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def calculate(self, shard_plants):
+        return lambda path: chunked.ChunkedFeedin(
+            shard_plants, self.sources).run(chunked.CsvWriter(path))
+
+    def partition_test(self):
+        shards = sharded.partition(self.plants, 4)
+        nt.eq_(len(shards), 4)
+        nt.eq_(sorted(cell for shard in shards for cell in shard),
+               sorted(self.plants))
+        # Independent of the order of the cells
+        reverse = dict(reversed(list(self.plants.items())))
+        nt.eq_([sorted(shard) for shard in sharded.partition(reverse, 4)],
+               [sorted(shard) for shard in shards])
+
+    def resume_test(self):
+        shards = sharded.partition(self.plants, 3)
+        run = sharded.ShardedRun(self.path, 3)
+        nt.ok_(run.run(1, self.calculate(shards[1])))
+        nt.eq_(run.pending(), [0, 2])
+        # A restarted run skips the completed shard
+        run = sharded.ShardedRun(self.path, 3)
+        nt.ok_(not run.run(1, self.calculate(shards[1])))
+        for shard in run.pending():
+            run.run(shard, self.calculate(shards[shard]))
+        with open(os.path.join(self.path, sharded.MANIFEST)) as f:
+            manifest = json.load(f)
+        nt.eq_(manifest['completed'], 3)
+        files = [name for shard in range(3)
+                 for name in os.listdir(run.shard_path(shard))
+                 if name.startswith('wka')]
+        nt.eq_(len(files), 12)
+
+    def failed_shard_test(self):
+        run = sharded.ShardedRun(self.path, 2)
+
+        def fail(path):
+            os.makedirs(path)
+            raise RuntimeError('crash')
+
+        nt.assert_raises(RuntimeError, run.run, 0, fail)
+        nt.eq_(run.pending(), [0, 1])
+        # The lock is released and the partial results are replaced
+        nt.ok_(run.run(0, lambda path: None))
+        nt.eq_(run.pending(), [1])
+
+    def lock_test(self):
+        run = sharded.ShardedRun(self.path, 2)
+        lock = run.shard_path(0) + '.lock'
+        with open(lock, 'w') as f:
+            json.dump({'host': 'other-machine', 'pid': 1}, f)
+        nt.ok_(not run.run(0, lambda path: None))
+        run.release(0)
+        nt.ok_(run.run(0, lambda path: None))
+
+    @nt.raises(ValueError)
+    def test_number_of_shards(self):
+        sharded.ShardedRun(self.path, 2)
+        sharded.ShardedRun(self.path, 3)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import os
+import shutil
+import tempfile
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import models as model
+from feedinlib import powerplants as plant
+from feedinlib import snapshot
+from feedinlib import weather
+
+
+class Snapshot_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        timezone = 'Europe/Berlin'
+        n = 72
+        weather_df = pandas.DataFrame(index=pandas.date_range(
+            pandas.datetime(2010, 6, 1, 0), periods=n, freq='H',
+            tz=timezone))
+        weather_df['temp_air'] = 290.5 * numpy.ones(n)
+        weather_df['pressure'] = 100168 * numpy.ones(n)
+        weather_df['v_wind'] = numpy.linspace(2, 14, n)
+        weather_df['z0'] = 0.15 * numpy.ones(n)
+        weather_df['dhi'] = 100 * numpy.sin(
+            numpy.arange(n) * numpy.pi / 24) ** 2
+        weather_df['dirhi'] = 2 * weather_df['dhi']
+        self.weather = weather.FeedinWeather(
+            data=weather_df, timezone=timezone, latitude=52, longitude=12,
+            data_height={'temp_air': 2, 'pressure': 0, 'v_wind': 10,
+                         'dhi': 0, 'dirhi': 0})
+        self.pv = plant.Photovoltaic(
+            module_name='Yingli_YL210__2008__E__', azimuth=180, tilt=30,
+            albedo=0.2)
+        self.wind = plant.WindPowerPlant(
+            model=model.SimpleWindTurbine(power_curve_step=0.01), h_hub=135,
+            d_rotor=127, wind_conv_type='ENERCON E 126 7500')
+        self.path = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(self):
+        shutil.rmtree(self.path)
+
+    def save_load_test(self):
+        state = snapshot.Snapshot()
+        state.add_modules(['Yingli_YL210__2008__E__'])
+        state.add_turbines(['ENERCON E 126 7500'], steps=[0.01])
+        state.add_weather('cell_1', self.weather)
+        filename = os.path.join(self.path, 'warm_start.npz')
+        state.save(filename)
+
+        loaded = snapshot.Snapshot.load(filename).install()
+        nt.eq_(loaded.steps, [0.01])
+        nt.eq_(loaded.modules['Yingli_YL210__2008__E__'].Area, 1.7)
+        my_weather = loaded.weather['cell_1']
+        nt.eq_(my_weather.data_height['v_wind'], 10)
+        nt.ok_(my_weather.data.index.equals(self.weather.data.index))
+        # The solar geometry is loaded with the weather data
+        nt.ok_(my_weather.derived(snapshot.GEOMETRY, None).equals(
+            self.weather.derived(snapshot.GEOMETRY, None)))
+        nt.ok_(numpy.allclose(self.pv.feedin(weather=my_weather),
+                              self.pv.feedin(weather=self.weather)))
+        nt.ok_(numpy.allclose(self.wind.feedin(weather=my_weather),
+                              self.wind.feedin(weather=self.weather)))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import nose.tools as nt
+import numpy
+
+from feedinlib import spatial
+from feedinlib import weather
+
+
+class WeatherIndex_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        self.cells = [
+            weather.FeedinWeather(longitude=lon, latitude=lat)
+            for lon in numpy.arange(5, 15, 0.5)
+            for lat in numpy.arange(47, 55, 0.5)]
+        self.index = spatial.WeatherIndex(self.cells)
+
+    def nearest_test(self):
+        lon = numpy.array([5.1, 14.9, 10.26])
+        lat = numpy.array([47.1, 54.4, 50.01])
+        position, distance = self.index.nearest(lon, lat)
+        for i, j in enumerate(position):
+            brute = numpy.argmin((self.index.longitude - lon[i]) ** 2 +
+                                 (self.index.latitude - lat[i]) ** 2)
+            nt.eq_(j, brute)
+        nt.ok_((distance < 50).all())
+
+    def max_distance_test(self):
+        position = self.index.query([0.0, 10.0], [0.0, 50.0],
+                                    max_distance=100)
+        nt.eq_(position[0], -1)
+        nt.ok_(self.index.weather_of([10.0], [50.0])[0] is
+               self.cells[position[1]])
+
+    def brute_force_test(self):
+        tree = spatial.cKDTree
+        spatial.cKDTree = None
+        try:
+            brute = spatial.WeatherIndex(self.cells, block_size=7)
+        finally:
+            spatial.cKDTree = tree
+        lon = numpy.linspace(5, 15, 50)
+        lat = numpy.linspace(47, 55, 50)
+        nt.ok_(numpy.array_equal(brute.query(lon, lat),
+                                 self.index.query(lon, lat)))
+
+    @nt.raises(ValueError)
+    def test_unknown_query(self):
+        self.index.query([10.0], [50.0], how='unknown')
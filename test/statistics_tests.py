@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import statistics
+
+
+class FeedinStatistics_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        index = pandas.date_range(pandas.datetime(2010, 12, 1, 0),
+                                  periods=24 * 90, freq='H')
+        random = numpy.random.RandomState(3)
+        self.capacity = numpy.array([10., 20., 5.])
+        self.feedin = pandas.DataFrame(
+            random.uniform(0, 1, (len(index), 3)) * self.capacity,
+            index=index, columns=['a', 'b', 'c'])
+        self.feedin.iloc[5, 2] = numpy.nan
+        self.reducer = statistics.FeedinStatistics(
+            ['a', 'b', 'c'], capacity=self.capacity, bins=1000)
+        # Blocks of time steps and plants in any order
+        for rows in numpy.array_split(numpy.arange(len(index)), 7):
+            self.reducer.write(self.feedin.iloc[rows][['c', 'a']])
+            self.reducer.write(self.feedin.iloc[rows][['b']])
+
+    def annual_energy_test(self):
+        expected = self.feedin.groupby(self.feedin.index.year).sum().T
+        numpy.testing.assert_allclose(self.reducer.annual_energy().values,
+                                      expected.values)
+        nt.eq_(list(self.reducer.annual_energy().columns), [2010, 2011])
+
+    def monthly_capacity_factor_test(self):
+        expected = (self.feedin.groupby(self.feedin.index.month).mean() /
+                    self.capacity).T
+        result = self.reducer.monthly_capacity_factor()
+        numpy.testing.assert_allclose(result[expected.columns].values,
+                                      expected.values)
+        nt.ok_(numpy.isnan(result[6]).all())
+
+    def summary_test(self):
+        summary = self.reducer.summary()
+        annual = self.feedin.groupby(self.feedin.index.year).sum()
+        numpy.testing.assert_allclose(summary.full_load_hours,
+                                      annual.mean() / self.capacity)
+        numpy.testing.assert_allclose(summary.P50, annual.median())
+        numpy.testing.assert_allclose(summary.P90, annual.quantile(0.1))
+
+    def duration_curve_test(self):
+        curve = self.reducer.duration_curve()
+        nt.eq_(curve.loc['a', 0], self.feedin.a.count())
+        expected = (self.feedin.b >= 0.25 * 20).sum()
+        nt.eq_(curve.loc['b', 0.25], expected)
+
+    def power_quantiles_test(self):
+        result = self.reducer.power_quantiles([0.5, 0.9])
+        expected = self.feedin.quantile([0.5, 0.9]).T
+        # Exact up to the width of a bin
+        numpy.testing.assert_allclose(
+            result.values, expected.values,
+            atol=self.capacity.max() / self.reducer.bins)
+
+    def no_capacity_test(self):
+        reducer = statistics.FeedinStatistics(['a', 'b', 'c'])
+        reducer.write(self.feedin)
+        summary = reducer.summary()
+        nt.ok_(summary.full_load_hours.isnull().all())
+        nt.ok_(summary.annual_energy.notnull().all())
+        nt.ok_(reducer.duration_curve().isnull().all().all())
+
+    @nt.raises(KeyError)
+    def test_unknown_plant(self):
+        statistics.FeedinStatistics(['a']).write(self.feedin)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+@author: oemof developing group
+"""
+
+import os
+import shutil
+import tempfile
+
+import nose.tools as nt
+import pandas
+import numpy
+
+from feedinlib import models as model
+from feedinlib import powerplants as plant
+from feedinlib import weather
+
+
+class Weather_Tests:
+
+    @classmethod
+    def setUpClass(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'weather.csv')
+        n = 96
+        index = pandas.date_range(pandas.datetime(2010, 6, 1, 0), periods=n,
+                                  freq='H', tz='Europe/Berlin')
+        data = pandas.DataFrame({
+            'dhi': numpy.linspace(0, 150, n),
+            'dirhi': numpy.linspace(0, 300, n),
+            'pressure': 100168 * numpy.ones(n),
+            'temp_air': numpy.linspace(285, 295, n),
+            'v_wind': numpy.linspace(0, 20, n),
+            'z0': 0.15 * numpy.ones(n)}, index=index)
+        with open(self.filename, 'w') as f:
+            f.write('# name: test\n# longitude: 12\n# latitude: 52\n'
+                    '# timezone: Europe/Berlin\n'
+                    '# data_height temp_air: 2\n'
+                    '# data_height v_wind: 10\n\n')
+            data.to_csv(f)
+        self.weather = weather.FeedinWeather()
+        self.weather.read_feedinlib_csv(self.filename)
+
+    @classmethod
+    def tearDownClass(self):
+        shutil.rmtree(self.path)
+
+    def csv_window_test(self):
+        my_weather = weather.FeedinWeather()
+        my_weather.read_feedinlib_csv(
+            self.filename, start='2010-06-02 05:00', end='2010-06-03')
+        nt.ok_(os.path.isfile(self.filename + weather.CSV_INDEX_SUFFIX))
+        expected = self.weather.data.loc['2010-06-02 05:00':'2010-06-03']
+        nt.eq_(len(my_weather.data), 43)
+        nt.ok_(my_weather.data.index.equals(expected.index))
+        nt.ok_(numpy.allclose(my_weather.data.values, expected.values))
+        nt.eq_(my_weather.data_height['v_wind'], 10)
+
+        # Reading with the existing index
+        my_weather.read_feedinlib_csv(
+            self.filename, start=pandas.Timestamp('2010-06-01 22:00'),
+            end=pandas.Timestamp('2010-06-02 01:00'))
+        nt.eq_(len(my_weather.data), 4)
+
+    def csv_index_test(self):
+        index = weather.csv_index(self.filename)
+        # Days in UTC: the first day starts at 22:00 UTC of May 31st
+        nt.eq_(len(index['periods']), 5)
+        with open(self.filename, 'rb') as f:
+            f.seek(index['offsets'][1])
+            nt.ok_(f.readline().startswith(b'2010-06-01 02:00:00+02:00'))
+
+    def feedin_window_test(self):
+        for powerplant in (
+                plant.Photovoltaic(
+                    model=model.PvlibBased(backend='numpy'),
+                    module_name='Yingli_YL210__2008__E__', azimuth=180,
+                    tilt=30, albedo=0.2),
+                plant.WindPowerPlant(h_hub=135, d_rotor=127,
+                                     wind_conv_type='ENERCON E 126 7500')):
+            feedin = powerplant.feedin(weather=self.weather)
+            window = powerplant.feedin(weather=self.weather,
+                                       start='2010-06-02 06:00',
+                                       end='2010-06-02 18:00')
+            nt.eq_(len(window), 13)
+            nt.ok_(numpy.allclose(window, feedin.loc[window.index]))
+
+    def table_feedin_window_test(self):
+        tables = (
+            plant.PlantTable(
+                {'module_name': ['Yingli_YL210__2008__E__'] * 2,
+                 'azimuth': [180, 200], 'tilt': [30, 30],
+                 'albedo': [0.2, 0.2]},
+                model=model.PvlibBased(backend='numpy')),
+            plant.PlantTable(
+                {'h_hub': [135, 100], 'd_rotor': [127, 127],
+                 'wind_conv_type': ['ENERCON E 126 7500'] * 2},
+                model=model.SimpleWindTurbine))
+        for table in tables:
+            window = table.feedin(self.weather, start='2010-06-02 06:00',
+                                  end='2010-06-02 18:00')
+            nt.eq_(len(window), 13)
+            single = table[1].feedin(weather=self.weather,
+                                     start='2010-06-02 06:00',
+                                     end='2010-06-02 18:00')
+            nt.ok_(window.index.equals(single.index))
+            nt.ok_(numpy.allclose(window.iloc[:, 1], single))